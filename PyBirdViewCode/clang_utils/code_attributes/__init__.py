@@ -1,8 +1,21 @@
 """
-Extract code properties from code, such as structs, 
+Extract code properties from code, such as structs,
 members of structs, and so on
 """
 
+from .call_graph import ProjectCallGraph
+from .compilation_database import (
+    CompilationDatabase,
+    CompileEntry,
+    normalize_compile_args,
+)
+from .cursor_index import (
+    CursorIndex,
+    TranslationUnitIndex,
+    forget_cursor_index,
+    get_cursor_index,
+    in_macro_expansion,
+)
 from .extract_data_structure import (
     ClassDefModel,
     DefModel,
@@ -15,6 +28,7 @@ from .extract_data_structure import (
     UnionDefModel,
     VarDefModel,
     data_structure_from_file,
+    ingest_data_structures,
     iter_data_structures,
     program_model_unparse,
 )
@@ -26,26 +40,48 @@ from .extract_function_info import (
     get_var_refs,
 )
 from .extract_globals import all_globals
+from .file_manifest import ChangeSet, FileManifest
+from .flat_tu import FlatTU
+from .pch import PrecompiledHeader, get_default_pch, set_default_pch
 from .procedures import build_call_graph
+from .symbol_index import SYMBOL_KINDS, SymbolIndex, SymbolRecord
+from .token_index import FileTokens, file_contents
+from .transcoding import (
+    EncodingPolicyType,
+    get_default_encoding_policy,
+    read_source,
+    resolve_encoding,
+    set_default_encoding_policy,
+    transcode_file,
+    transcoded_unsaved_files,
+)
+from .tu_cache import TUCache, get_default_tu_cache, set_default_tu_cache
 
 # from .extract_statement_info import format_result, CProgramWalker
 from .utils import (
+    SKELETON_PARSE_OPTIONS,
     CompilerArgsType,
+    TraversalAction,
     TraversalCallbackType,
     TraversalContext,
     UnaryOpPos,
     beautified_print_ast,
+    expand_files,
+    scan_files,
     extract_ast,
     extract_literal_value,
     get_compound_assignment_operator,
     get_func_decl,
     get_func_decl_all,
+    get_token_spellings,
     is_function_definition,
     is_literal_kind,
     iter_ast,
     iter_ast_from_file,
     iter_files,
     parse_file,
+    resolve_compiler_args,
+    reuse_index,
     print_tokens,
     split_binary_operator,
     split_compound_assignment,
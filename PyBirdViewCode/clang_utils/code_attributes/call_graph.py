@@ -0,0 +1,250 @@
+"""
+Project-wide call graph, extracted per file in worker processes and resolved
+across translation units by USR (Unified Symbol Resolution).
+"""
+
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import networkx as nx
+from clang.cindex import Cursor, CursorKind
+
+from .compilation_database import CompilationDatabase
+from .cursor_index import FUNCTION_KINDS, get_cursor_index
+from .symbol_index import _FileDigestStore, _dependency_digests
+from .utils import CompilerArgsType, is_function_definition, parse_file
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS functions (
+    usr TEXT NOT NULL,
+    name TEXT NOT NULL,
+    file TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    column INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calls (
+    file TEXT NOT NULL,
+    caller TEXT NOT NULL,
+    callee TEXT NOT NULL,
+    callee_name TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    column INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS functions_usr ON functions (usr);
+CREATE INDEX IF NOT EXISTS functions_name ON functions (name);
+CREATE INDEX IF NOT EXISTS functions_file ON functions (file);
+CREATE INDEX IF NOT EXISTS calls_file ON calls (file);
+"""
+
+# Cursors that may contain function definitions
+_CONTAINER_KINDS = (
+    CursorKind.NAMESPACE,
+    CursorKind.LINKAGE_SPEC,
+    CursorKind.STRUCT_DECL,
+    CursorKind.CLASS_DECL,
+    CursorKind.CLASS_TEMPLATE,
+)
+
+_FunctionRow = Tuple[str, str, str, int, int]
+_CallRow = Tuple[str, str, str, str, int, int]
+
+
+def _function_definitions(file: str, root: Cursor) -> List[Cursor]:
+    definitions = []
+    stack = list(reversed(get_cursor_index(root).top_level))
+    while stack:
+        cursor = stack.pop()
+        location_file = cursor.location.file
+        if location_file is None or os.path.abspath(location_file.name) != file:
+            continue
+        if cursor.kind in _CONTAINER_KINDS:
+            stack.extend(reversed(list(cursor.get_children())))
+        elif cursor.kind == CursorKind.FUNCTION_DECL:
+            if is_function_definition(cursor):
+                definitions.append(cursor)
+        elif cursor.kind in FUNCTION_KINDS and cursor.is_definition():
+            definitions.append(cursor)
+    return definitions
+
+
+def _file_call_edges(
+    file: str, args: CompilerArgsType = None
+) -> Tuple[Tuple[List[_FunctionRow], List[_CallRow]], Dict[str, Optional[str]]]:
+    file = os.path.abspath(file)
+    tu = parse_file(file, args)
+    index = get_cursor_index(tu.cursor)
+    functions = []
+    calls = []
+    for definition in _function_definitions(file, tu.cursor):
+        caller = definition.get_usr()
+        location = definition.location
+        functions.append(
+            (caller, definition.spelling, file, location.line, location.column)
+        )
+        for call in index.descendants(definition, CursorKind.CALL_EXPR):
+            callee: Optional[Cursor] = call.referenced
+            # Calls through function pointers could not be resolved statically
+            if callee is None or callee.kind not in FUNCTION_KINDS:
+                continue
+            location = call.location
+            calls.append(
+                (
+                    file,
+                    caller,
+                    callee.get_usr(),
+                    callee.spelling,
+                    location.line,
+                    location.column,
+                )
+            )
+    return (functions, calls), _dependency_digests(tu)
+
+
+class ProjectCallGraph(_FileDigestStore):
+    """
+    Call graph of a project, with the functions defined and the calls made in
+    each file stored in the SQLite file ``path``.
+
+    Functions are identified by their USR, which is the same for a function
+    across translation units (and differs for ``static`` functions of the same
+    name in different files), so a call is linked to the definition in
+    another file without any name lookup. ``update`` only parses the files
+    added or modified, or including a modified file, since the last run.
+
+    .. code-block:: python
+
+        call_graph = ProjectCallGraph()
+        call_graph.update("path/to/project")
+        for component in call_graph.topological_order():
+            ...  # Analyze the functions of `component` after their callees
+
+    .. note:: Calls through function pointers are not recorded.
+    """
+
+    _schema = _SCHEMA
+    _file_tables = ("functions", "calls")
+
+    def __init__(self, path: str = ".PyBirdViewCode/call_graph.sqlite3") -> None:
+        super().__init__(path)
+        self._graph: Optional[nx.DiGraph] = None
+
+    def _insert(self, file: str, result: Tuple[List[_FunctionRow], List[_CallRow]]):
+        functions, calls = result
+        self._conn.executemany(
+            "INSERT INTO functions VALUES (?, ?, ?, ?, ?)", functions
+        )
+        self._conn.executemany("INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?)", calls)
+
+    def _delete(self, file: str):
+        super()._delete(file)
+        self._graph = None
+
+    def update(
+        self,
+        files: Union[str, Iterable[str], CompilationDatabase],
+        args: CompilerArgsType = None,
+        workers: Optional[int] = None,
+        name_filter: Optional[Callable[[str], bool]] = None,
+    ) -> List[str]:
+        """
+        Extract the calls in files added or modified since the last update
+        across worker processes.
+
+        :files: The same as ``SymbolIndex.update``
+        :return: Files that are updated.
+        """
+        return self._update(_file_call_edges, files, args, workers, name_filter)
+
+    def graph(self, include_external: bool = True) -> nx.DiGraph:
+        """
+        Get the call graph, whose nodes are USRs of functions and edges go from
+        callers to callees.
+
+        Each node has attributes ``name`` and ``defined``, and defined
+        functions have ``file``, ``line`` and ``column`` of their definitions.
+        Each edge has attribute ``sites``, the list of ``(file, line, column)``
+        of the calls.
+
+        :include_external: Whether to include functions called but not defined
+            in the project, such as library functions.
+        """
+        if self._graph is None:
+            g = nx.DiGraph()
+            for usr, name, file, line, column in self._conn.execute(
+                "SELECT * FROM functions ORDER BY rowid"
+            ):
+                if usr not in g:
+                    g.add_node(
+                        usr,
+                        name=name,
+                        defined=True,
+                        file=file,
+                        line=line,
+                        column=column,
+                    )
+            for file, caller, callee, callee_name, line, column in self._conn.execute(
+                "SELECT * FROM calls ORDER BY rowid"
+            ):
+                if callee not in g:
+                    g.add_node(callee, name=callee_name, defined=False)
+                if not g.has_edge(caller, callee):
+                    g.add_edge(caller, callee, sites=[])
+                g.edges[caller, callee]["sites"].append((file, line, column))
+            self._graph = g
+        if include_external:
+            return self._graph
+        return self._graph.subgraph(
+            usr for usr, defined in self._graph.nodes(data="defined") if defined
+        )
+
+    def usrs_named(self, name: str) -> List[str]:
+        """
+        Get USRs of the functions named ``name`` defined in the project
+        """
+        return [
+            row[0]
+            for row in self._conn.execute(
+                "SELECT DISTINCT usr FROM functions WHERE name = ? ORDER BY rowid",
+                (name,),
+            )
+        ]
+
+    def callees(self, usr: str) -> List[str]:
+        g = self.graph()
+        return list(g.successors(usr)) if usr in g else []
+
+    def callers(self, usr: str) -> List[str]:
+        g = self.graph()
+        return list(g.predecessors(usr)) if usr in g else []
+
+    def strongly_connected_components(
+        self, include_external: bool = False
+    ) -> List[Set[str]]:
+        """
+        Get the sets of mutually recursive functions. A function not in any
+        recursion is a component by itself.
+        """
+        return list(nx.strongly_connected_components(self.graph(include_external)))
+
+    def topological_order(
+        self, callees_first: bool = True, include_external: bool = False
+    ) -> List[List[str]]:
+        """
+        Order the strongly connected components of the call graph, so that a
+        component comes after all components it calls (or before, if
+        ``callees_first`` is False). This is the order of bottom-up
+        interprocedural analyses computing function summaries.
+
+        :return: Components as sorted lists of USRs
+        """
+        g = self.graph(include_external)
+        condensed = nx.condensation(g)
+        order = list(nx.topological_sort(condensed))
+        if callees_first:
+            order.reverse()
+        members: Dict[int, Set[str]] = nx.get_node_attributes(condensed, "members")
+        return [sorted(members[component]) for component in order]
@@ -0,0 +1,231 @@
+"""
+Load ``compile_commands.json`` and analyse all of its translation units
+"""
+
+import functools
+import json
+import os
+import shlex
+import warnings
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from ...utils import FileTaskResult, MelodieGenerator, parallel_map, run_file_task
+from .utils import reuse_index
+
+T = TypeVar("T")
+
+# Options whose value is a path, which should be resolved against the
+# directory of the compile command.
+_PATH_OPTIONS = (
+    "-idirafter",
+    "-imacros",
+    "-include",
+    "-iquote",
+    "-isysroot",
+    "-isystem",
+    "-I",
+)
+# Options that only concern the outputs of the compiler
+_DROPPED_OPTIONS_WITH_VALUE = {"-o", "-MF", "-MT", "-MQ"}
+_DROPPED_FLAGS = {"-c", "-S", "-E", "-M", "-MM", "-MD", "-MMD", "-MP"}
+
+
+@dataclass(frozen=True)
+class CompileEntry:
+    """
+    One translation unit from the compilation database
+
+    :file: Absolute path of the source file
+    :args: Arguments to be passed to libclang, with the compiler executable,
+        the source file and output options removed, and relative paths resolved.
+    :directory: Working directory of the compile command
+    """
+
+    file: str
+    args: Tuple[str, ...]
+    directory: str
+
+
+def _resolve(directory: str, path: str) -> str:
+    return os.path.normpath(os.path.join(directory, path))
+
+
+def normalize_compile_args(
+    argv: Sequence[str], file: str, directory: str
+) -> Tuple[str, ...]:
+    """
+    Convert a compiler command line to the arguments for libclang.
+
+    :argv: The command line including the compiler executable
+    :file: Absolute path of the compiled source file
+    :directory: Working directory of the command
+    """
+    args: List[str] = []
+    i = 1
+    while i < len(argv):
+        arg = argv[i]
+        i += 1
+        if arg in _DROPPED_FLAGS:
+            continue
+        if arg in _DROPPED_OPTIONS_WITH_VALUE:
+            i += 1
+            continue
+        if not arg.startswith("-"):
+            if _resolve(directory, arg) == file:
+                continue
+            args.append(arg)
+            continue
+        if arg.startswith("--sysroot="):
+            args.append("--sysroot=" + _resolve(directory, arg[len("--sysroot=") :]))
+            continue
+        for option in _PATH_OPTIONS:
+            if arg == option and i < len(argv):
+                args.extend([option, _resolve(directory, argv[i])])
+                i += 1
+                break
+            elif arg.startswith(option) and arg != option:
+                args.append(option + _resolve(directory, arg[len(option) :]))
+                break
+        else:
+            args.append(arg)
+    return tuple(args)
+
+
+def _run_entries(
+    func: Callable[[str, List[str]], T], entries: List[CompileEntry]
+) -> List[FileTaskResult[T]]:
+    results = []
+    with reuse_index():
+        for entry in entries:
+            result = run_file_task(
+                lambda file: func(file, list(entry.args)), entry.file
+            )
+            result.args = entry.args
+            results.append(result)
+    return results
+
+
+class CompilationDatabase:
+    """
+    Translation units loaded from a ``compile_commands.json``.
+
+    Identical entries (same file and same arguments) are merged. If one file
+    is compiled with several different argument sets, a warning is raised
+    when loading, and the variants could be inspected by ``conflicting_files``.
+    """
+
+    def __init__(self, entries: Sequence[CompileEntry]) -> None:
+        self.entries: List[CompileEntry] = list(dict.fromkeys(entries))
+        self._args_by_file: Dict[str, Tuple[str, ...]] = {}
+        for entry in self.entries:
+            self._args_by_file.setdefault(entry.file, entry.args)
+
+    @classmethod
+    def from_json(cls, path: str) -> "CompilationDatabase":
+        """
+        Load the compilation database
+
+        :path: Path of the ``compile_commands.json``, or the folder containing it
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, "compile_commands.json")
+        with open(path, "r", encoding="utf8") as f:
+            commands = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(path))
+        entries = []
+        for command in commands:
+            directory = _resolve(base_dir, command.get("directory", "."))
+            file = _resolve(directory, command["file"])
+            if "arguments" in command:
+                argv = command["arguments"]
+            else:
+                argv = shlex.split(command["command"])
+            entries.append(
+                CompileEntry(
+                    file, normalize_compile_args(argv, file, directory), directory
+                )
+            )
+        db = cls(entries)
+        conflicts = db.conflicting_files()
+        if len(conflicts) > 0:
+            warnings.warn(
+                f"{len(conflicts)} files are compiled with different arguments "
+                f"in {path}, such as {next(iter(conflicts))}"
+            )
+        return db
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[CompileEntry]:
+        return iter(self.entries)
+
+    @property
+    def files(self) -> List[str]:
+        """
+        All distinct source files
+        """
+        return list(dict.fromkeys(entry.file for entry in self.entries))
+
+    def get_args(self, file: str) -> List[str]:
+        """
+        Get the arguments of the first entry compiling ``file``.
+
+        The bound method is a picklable ``CompilerArgsType`` and can be passed to
+        ``parse_file`` or ``ingest_data_structures`` directly.
+        """
+        return list(self._args_by_file[os.path.abspath(file)])
+
+    def conflicting_files(self) -> Dict[str, List[Tuple[str, ...]]]:
+        """
+        Get the files compiled by more than one distinct argument set
+        """
+        variants: Dict[str, List[Tuple[str, ...]]] = {}
+        for entry in self.entries:
+            variants.setdefault(entry.file, []).append(entry.args)
+        return {file: args for file, args in variants.items() if len(args) > 1}
+
+    def groups(self) -> Dict[Tuple[str, ...], List[CompileEntry]]:
+        """
+        Group entries by their argument sets
+        """
+        groups: Dict[Tuple[str, ...], List[CompileEntry]] = {}
+        for entry in self.entries:
+            groups.setdefault(entry.args, []).append(entry)
+        return groups
+
+    def _iter_chunks(self, chunk_size: int):
+        for entries in self.groups().values():
+            for i in range(0, len(entries), chunk_size):
+                yield entries[i : i + chunk_size]
+
+    def map(
+        self,
+        func: Callable[[str, List[str]], T],
+        workers: Optional[int] = None,
+        chunk_size: int = 16,
+    ) -> MelodieGenerator[FileTaskResult[T]]:
+        """
+        Call ``func(file, args)`` for every entry across worker processes,
+        yielding one ``FileTaskResult`` per entry in completion order. Results
+        of a file listed with several argument sets are told apart by their
+        ``args``.
+
+        Entries sharing the same arguments are sent to workers in chunks of
+        ``chunk_size``, and each chunk is parsed with one shared ``cindex.Index``.
+
+        :func: A picklable callable. Its return value is sent back from worker
+            processes, so it should be materialized (not a lazy generator) and
+            picklable.
+        """
+
+        def _():
+            for results in parallel_map(
+                functools.partial(_run_entries, func),
+                self._iter_chunks(chunk_size),
+                workers,
+            ):
+                yield from results
+
+        return MelodieGenerator(_())
@@ -0,0 +1,356 @@
+"""
+Index cursors by kind and tokens by offset, so that queries on a translation
+unit do not traverse the cursors or tokenize through ctypes again and again.
+"""
+
+import bisect
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+from clang.cindex import Cursor, CursorKind, SourceLocation, TranslationUnit
+
+from .token_index import FileTokens
+
+# The highest bit of the raw encoding of clang's ``SourceLocation``, which is
+# set for locations inside macro expansions
+_MACRO_ID_BIT = 1 << 31
+
+
+def in_macro_expansion(location: SourceLocation) -> bool:
+    """
+    Whether ``location`` is inside a macro expansion, such as the location of
+    a literal from ``#define LIMIT 100`` or of a macro argument. The tokens
+    found at its offset are then the macro name or the macro arguments,
+    instead of the tokens spelled in the macro.
+    """
+    return bool(location.int_data & _MACRO_ID_BIT)
+
+
+FUNCTION_KINDS = (
+    CursorKind.FUNCTION_DECL,
+    CursorKind.CXX_METHOD,
+    CursorKind.CONSTRUCTOR,
+    CursorKind.DESTRUCTOR,
+    CursorKind.CONVERSION_FUNCTION,
+    CursorKind.FUNCTION_TEMPLATE,
+)
+
+
+def _detached(cursor: Cursor) -> Cursor:
+    # A copy of `cursor` without the reference to its translation unit. The
+    # indices are held by the translation unit, so the cursors stored in them
+    # must not refer back to it, or the translation unit would only be freed
+    # by the cyclic garbage collector.
+    return Cursor.from_buffer_copy(cursor)
+
+
+def _attached(cursor: Cursor, tu: TranslationUnit) -> Cursor:
+    copy = Cursor.from_buffer_copy(cursor)
+    copy._tu = tu
+    return copy
+
+
+class CursorIndex:
+    """
+    Index of all cursors in the subtree of ``root``, built in one traversal.
+
+    Cursors are stored in preorder, so the subtree of each cursor is a
+    contiguous range of positions, and the descendants of one kind are found
+    by bisection on the positions of that kind. The stored cursors do not keep
+    the translation unit alive, while the returned cursors do.
+    """
+
+    def __init__(self, root: Cursor) -> None:
+        self._tu = weakref.ref(root.translation_unit)
+        self._root = _detached(root)
+        self.cursors: List[Cursor] = []
+        self._parents: List[int] = []
+        self._by_kind: Dict[CursorKind, List[int]] = {}
+        self._by_hash: Dict[int, List[int]] = {}
+
+        stack = [(root, -1)]
+        while stack:
+            cursor, parent = stack.pop()
+            pos = len(self.cursors)
+            self.cursors.append(_detached(cursor))
+            self._parents.append(parent)
+            self._by_kind.setdefault(cursor.kind, []).append(pos)
+            self._by_hash.setdefault(cursor.hash, []).append(pos)
+            children = list(cursor.get_children())
+            for child in reversed(children):
+                stack.append((child, pos))
+
+        # The subtree of the cursor at `pos` is `cursors[pos:self._ends[pos]]`.
+        # Children always come after their parents, so visiting positions in
+        # reverse order propagates the ends upwards.
+        self._ends = list(range(1, len(self.cursors) + 1))
+        for pos in range(len(self.cursors) - 1, 0, -1):
+            parent = self._parents[pos]
+            if self._ends[pos] > self._ends[parent]:
+                self._ends[parent] = self._ends[pos]
+
+    @property
+    def root(self) -> Cursor:
+        return _attached(self._root, self._tu())
+
+    def position(self, cursor: Cursor) -> Optional[int]:
+        """
+        Get the preorder position of ``cursor``, or None if not in this index
+        """
+        for pos in self._by_hash.get(cursor.hash, ()):
+            if self.cursors[pos] == cursor:
+                return pos
+        return None
+
+    def __contains__(self, cursor: Cursor) -> bool:
+        return self.position(cursor) is not None
+
+    def _checked_position(self, cursor: Cursor) -> int:
+        pos = self.position(cursor)
+        if pos is None:
+            raise KeyError(f"Cursor {cursor.kind} {cursor.spelling} is not indexed")
+        return pos
+
+    def descendants(self, cursor: Cursor, kind: CursorKind) -> List[Cursor]:
+        """
+        Get the cursors of ``kind`` in the subtree of ``cursor`` in preorder,
+        including ``cursor`` itself, the same as filtering ``walk_preorder()``.
+        """
+        pos = self._checked_position(cursor)
+        positions = self._by_kind.get(kind, [])
+        start = bisect.bisect_left(positions, pos)
+        end = bisect.bisect_left(positions, self._ends[pos], start)
+        tu = self._tu()
+        return [_attached(self.cursors[p], tu) for p in positions[start:end]]
+
+    def children(self, cursor: Cursor) -> List[Cursor]:
+        """
+        Get the direct children of ``cursor``
+        """
+        pos = self._checked_position(cursor)
+        tu = self._tu()
+        children = []
+        child = pos + 1
+        while child < self._ends[pos]:
+            children.append(_attached(self.cursors[child], tu))
+            child = self._ends[child]
+        return children
+
+    def parent(self, cursor: Cursor) -> Optional[Cursor]:
+        """
+        Get the lexical parent of ``cursor``, None for the root of this index
+        """
+        parent = self._parents[self._checked_position(cursor)]
+        if parent < 0:
+            return None
+        return _attached(self.cursors[parent], self._tu())
+
+    def owner_function(self, cursor: Cursor) -> Optional[Cursor]:
+        """
+        Get the innermost function containing ``cursor`` (or ``cursor`` itself)
+        """
+        pos = self._checked_position(cursor)
+        while pos >= 0:
+            if self.cursors[pos].kind in FUNCTION_KINDS:
+                return _attached(self.cursors[pos], self._tu())
+            pos = self._parents[pos]
+        return None
+
+
+class TranslationUnitIndex:
+    """
+    Cursor and token indices of one translation unit.
+
+    Top-level declarations are listed on the first query, while each of them is
+    indexed by a ``CursorIndex`` on the first query inside it. So declarations from the
+    included headers are never traversed unless they are queried. Likewise,
+    each file is tokenized on the first token query in it.
+
+    The index only holds a weak reference to ``tu``, so that ``tu`` is freed
+    as soon as it is no longer used, together with its index.
+    """
+
+    def __init__(self, tu: TranslationUnit) -> None:
+        self._tu = weakref.ref(tu)
+        self._root = _detached(tu.cursor)
+        self._file_tokens: Dict[str, FileTokens] = {}
+        self._top_level: Optional[List[Cursor]] = None
+        self._top_level_by_name: Optional[Dict[Tuple[CursorKind, str], Cursor]] = None
+        # Indices containing a cursor, by the hash of the cursor
+        self._subtrees_by_hash: Dict[int, List[CursorIndex]] = {}
+
+    @property
+    def tu(self) -> TranslationUnit:
+        return self._tu()
+
+    @property
+    def root(self) -> Cursor:
+        return _attached(self._root, self._tu())
+
+    def _stored_top_level(self) -> List[Cursor]:
+        if self._top_level is None:
+            self._top_level = [_detached(c) for c in self.root.get_children()]
+        return self._top_level
+
+    @property
+    def top_level(self) -> List[Cursor]:
+        """
+        The top-level declarations
+        """
+        tu = self._tu()
+        return [_attached(c, tu) for c in self._stored_top_level()]
+
+    def top_level_of_kind(self, kind: CursorKind) -> List[Cursor]:
+        """
+        Get the top-level declarations of ``kind``
+        """
+        tu = self._tu()
+        return [_attached(c, tu) for c in self._stored_top_level() if c.kind == kind]
+
+    def top_level_named(self, kind: CursorKind, name: str) -> Optional[Cursor]:
+        """
+        Get the first top-level declaration of ``kind`` named ``name``
+        """
+        if self._top_level_by_name is None:
+            self._top_level_by_name = {}
+            for c in self._stored_top_level():
+                self._top_level_by_name.setdefault((c.kind, c.spelling), c)
+        cursor = self._top_level_by_name.get((kind, name))
+        return _attached(cursor, self._tu()) if cursor is not None else None
+
+    def subtree(self, cursor: Cursor) -> CursorIndex:
+        """
+        Get the index containing ``cursor``, indexing the subtree of
+        ``cursor`` if it is not indexed yet.
+        """
+        candidates = self._subtrees_by_hash.get(cursor.hash, ())
+        # Most queries are on functions, which are roots of the indices
+        for index in candidates:
+            if index._root == cursor:
+                return index
+        for index in candidates:
+            if cursor in index:
+                return index
+        index = CursorIndex(cursor)
+        for cursor_hash in index._by_hash:
+            self._subtrees_by_hash.setdefault(cursor_hash, []).append(index)
+        return index
+
+    def descendants(self, cursor: Cursor, kind: CursorKind) -> List[Cursor]:
+        """
+        The same as ``CursorIndex.descendants``
+        """
+        if cursor == self._root:
+            result = [cursor] if cursor.kind == kind else []
+            for child in self.top_level:
+                result.extend(self.subtree(child).descendants(child, kind))
+            return result
+        return self.subtree(cursor).descendants(cursor, kind)
+
+    def children(self, cursor: Cursor) -> List[Cursor]:
+        """
+        Get the direct children of ``cursor``
+        """
+        if cursor == self._root:
+            return self.top_level
+        return self.subtree(cursor).children(cursor)
+
+    def parent(self, cursor: Cursor) -> Optional[Cursor]:
+        """
+        Get the lexical parent of ``cursor``
+        """
+        if cursor == self._root:
+            return None
+        parent = self.subtree(cursor).parent(cursor)
+        # `cursor` is the root of its index
+        return parent if parent is not None else cursor.lexical_parent
+
+    def owner_function(self, cursor: Cursor) -> Optional[Cursor]:
+        """
+        The same as ``CursorIndex.owner_function``
+        """
+        if cursor == self._root:
+            return None
+        index = self.subtree(cursor)
+        owner = index.owner_function(cursor)
+        if owner is None:
+            parent = self.parent(index.root)
+            if parent is not None:
+                return self.owner_function(parent)
+        return owner
+
+    def token_span(self, cursor: Cursor) -> Tuple[FileTokens, int, int]:
+        """
+        Get the tokens of the file containing ``cursor``, with the start and
+        end offsets of the extent of ``cursor``.
+
+        Offsets are those of the macro expansions for cursors inside macros,
+        see ``token_spellings``.
+        """
+        extent = cursor.extent
+        start, end = extent.start, extent.end
+        file = start.file
+        if file is None:
+            raise ValueError(f"Cursor {cursor.kind} {cursor.spelling} has no source")
+        tokens = self._file_tokens.get(file.name)
+        if tokens is None or not tokens.covers(start.offset, end.offset):
+            tokens = FileTokens(self.tu, file)
+            self._file_tokens[file.name] = tokens
+        return tokens, start.offset, end.offset
+
+    def restrict_tokens(self, cursor: Cursor, end: Optional[int] = None):
+        """
+        Keep only the tokens from the start of ``cursor`` to offset ``end``
+        (by default the end of the file) in the file of ``cursor``, dropping
+        the tokens of all files tokenized before.
+
+        Used when visiting huge translation units one top-level declaration
+        at a time, so that the tokens of the whole file are never held at
+        once. Later token queries outside the kept range tokenize the whole
+        file again.
+        """
+        extent = cursor.extent
+        file = extent.start.file
+        self._file_tokens = {}
+        if file is None:
+            return
+        if end is not None:
+            end = max(end, extent.end.offset)
+        self._file_tokens[file.name] = FileTokens(
+            self.tu, file, extent.start.offset, end
+        )
+
+    def token_spellings(self, cursor: Cursor) -> List[str]:
+        """
+        Get the spellings of tokens in ``cursor``, the same as
+        ``[t.spelling for t in cursor.get_tokens()]``
+
+        The tokens of a cursor starting or ending ``in_macro_expansion`` are
+        not found in the index, so they are tokenized by libclang instead.
+        """
+        extent = cursor.extent
+        if in_macro_expansion(extent.start) or in_macro_expansion(extent.end):
+            return [t.spelling for t in cursor.get_tokens()]
+        tokens, start, end = self.token_span(cursor)
+        return tokens.spellings_between(start, end)
+
+
+def get_cursor_index(c: Cursor) -> TranslationUnitIndex:
+    """
+    Get the index of the translation unit of cursor ``c``, creating it on the
+    first call. The index lives as long as the translation unit, without
+    keeping it alive.
+    """
+    tu: TranslationUnit = c.translation_unit
+    index = getattr(tu, "_cursor_index", None)
+    if index is None:
+        index = TranslationUnitIndex(tu)
+        tu._cursor_index = index
+    return index
+
+
+def forget_cursor_index(tu: TranslationUnit):
+    """
+    Drop the cursor index of ``tu``, which must be called after ``tu.reparse()``
+    """
+    tu.__dict__.pop("_cursor_index", None)
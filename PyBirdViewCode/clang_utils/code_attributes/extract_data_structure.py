@@ -1,21 +1,53 @@
+import functools
 import json
 import os
 import warnings
-from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
-from clang.cindex import Cursor, CursorKind, SourceLocation, Type, TypeKind
+from clang.cindex import (
+    Cursor,
+    CursorKind,
+    SourceLocation,
+    TranslationUnit,
+    Type,
+    TypeKind,
+)
 
-from ...utils import MelodieGenerator, melodie_generator
-from .extract_function_info import get_var_refs
+from ...utils import (
+    FileTaskResult,
+    MelodieGenerator,
+    melodie_generator,
+    parallel_map_files,
+)
+from .compilation_database import CompilationDatabase
+from .cursor_index import get_cursor_index
 from .extract_globals import all_globals
+from .token_index import FileTokens
 from .utils import (
+    SKELETON_PARSE_OPTIONS,
     CompilerArgsType,
+    expand_files,
     extract_ast,
     extract_literal_value,
     parse_file,
     is_function_definition,
 )
 
+if TYPE_CHECKING:
+    from .symbol_index import SymbolIndex
+
 
 def extract_call_exprs(node: Cursor) -> List[Cursor]:
     """
@@ -29,24 +61,6 @@ def extract_call_exprs(node: Cursor) -> List[Cursor]:
     return callings
 
 
-def _extract_call_exprs_and_mark_visited(
-    node: Cursor, visited: Set[int]
-) -> List[Cursor]:
-    """
-    Get all CALL_EXPR from the node, and store all visited nodes
-        into set `visited` to avoid repeated visiting.
-    """
-    callings = []
-    if id(node) in visited:
-        return []
-    visited.add(id(node))
-    for c in node.walk_preorder():
-        visited.add(id(c))
-        if c.kind == CursorKind.CALL_EXPR:
-            callings.append(c)
-    return callings
-
-
 class ReprUtil:
     @classmethod
     def create_empty_instance(cls):
@@ -171,31 +185,41 @@ class FunctionDefModel(DefModel):
         """
         return MelodieGenerator(self.callings)
 
+    @classmethod
+    def signature_from_cursor(cls, node: Cursor) -> "FunctionDefModel":
+        """
+        Create the model from the signature only, without visiting the body
+        """
+        fdm = cls(node.spelling, node.type)
+        fdm.update_common_info(node)
+        for child in node.get_children():
+            if child.kind == CursorKind.PARM_DECL:
+                fdm.params.append(ParamDefModel.from_cursor(child))
+        return fdm
+
     @classmethod
     def from_cursor(cls, node: Cursor) -> Optional["FunctionDefModel"]:
         if node.kind == CursorKind.FUNCTION_DECL and not is_function_definition(node):
             return
         fdm = cls(node.spelling, node.type)
         fdm.update_common_info(node)
-        child: Cursor
-        children = list(node.walk_preorder())
-        _nodes_call_visited = set()
-        for child in children:
-
-            if child.kind == CursorKind.PARM_DECL:
-                fdm.params.append(ParamDefModel.from_cursor(child))
-            elif child.kind == CursorKind.VAR_DECL:
-                fdm.locals.append(VarDefModel.from_cursor(child))
-            elif child.kind == CursorKind.COMPOUND_STMT:
-                exprs = _extract_call_exprs_and_mark_visited(node, _nodes_call_visited)
-                for i, call_node in enumerate(exprs):
-                    fdm.callings.append(call_node.spelling)
-        global_refs = (
-            get_var_refs(node, False)
-            .filter(lambda var_ref: var_ref.spelling in context.global_vars)
-            .attributes("spelling")
-            .to_set()
-        )
+        # The subtree has been indexed by `is_function_definition`, so these
+        # queries do not traverse the cursors again.
+        index = get_cursor_index(node)
+        for child in index.descendants(node, CursorKind.PARM_DECL):
+            fdm.params.append(ParamDefModel.from_cursor(child))
+        for child in index.descendants(node, CursorKind.VAR_DECL):
+            fdm.locals.append(VarDefModel.from_cursor(child))
+        for child in index.descendants(node, CursorKind.CALL_EXPR):
+            fdm.callings.append(child.spelling)
+        global_refs: Dict[str, None] = {}
+        for child in index.descendants(node, CursorKind.DECL_REF_EXPR):
+            spelling = child.spelling
+            if (
+                spelling in context.global_vars
+                and child.type.kind != TypeKind.FUNCTIONPROTO
+            ):
+                global_refs[spelling] = None
         fdm.referenced_globals = list(global_refs)
         return fdm
 
@@ -387,11 +411,68 @@ class _Context:
 context = _Context()
 
 
-@melodie_generator
-def data_structure_from_file(
-    filename: str, args: CompilerArgsType = None
-) -> Generator[DefModel, None, None]:
-    tu = parse_file(filename, args)
+# Tokens starting the body of a function definition, i.e. `{`, or `try` and
+# the `:` of constructor initializers in C++, and tokens ending a function
+# declaration, including `= default` and `= delete`.
+_BODY_START_TOKENS = {"{", "try", ":"}
+_DECLARATION_END_TOKENS = {";", ",", "="}
+
+
+def _has_skipped_body(node: Cursor) -> bool:
+    # A skipped body is excluded from the extent of the function, so the
+    # tokens after the extent are checked. Macros expanding to nothing and
+    # unknown attributes may come before the body, so tokens in parentheses
+    # and other tokens are passed over until the body or the end of the
+    # declaration. Only a few tokens are needed, so they are tokenized in
+    # growing windows instead of the whole file.
+    tu, end = node.translation_unit, node.extent.end
+    start, window = end.offset, 64
+    depth, last = 0, -1
+    while True:
+        tokens = FileTokens(tu, end.file, start, start + window)
+        for offset, spelling in zip(tokens.offsets, tokens.spellings):
+            if offset <= last:
+                continue
+            last = offset
+            if spelling == "(":
+                depth += 1
+            elif spelling == ")":
+                depth -= 1
+            elif depth > 0:
+                continue
+            elif spelling in _BODY_START_TOKENS:
+                return True
+            elif spelling in _DECLARATION_END_TOKENS:
+                return False
+        if tokens.end < start + window:
+            return False
+        # Restart from the last token, as the window may end inside a token
+        start, window = max(start, last), window * 2
+
+
+def _parse_for_models(
+    filename: str, args: CompilerArgsType = None, function_bodies: bool = True
+) -> TranslationUnit:
+    return parse_file(
+        filename, args, options=0 if function_bodies else SKELETON_PARSE_OPTIONS
+    )
+
+
+def _iter_top_level_models(
+    filename: str,
+    args: CompilerArgsType = None,
+    function_bodies: bool = True,
+    tu: Optional[TranslationUnit] = None,
+) -> Generator[Tuple[Cursor, Optional[DefModel]], None, None]:
+    """
+    Iterate top-level cursors in ``filename`` with their models, where the
+    model is None for the cursors that are not definitions.
+
+    :tu: The translation unit of ``filename`` if already parsed by
+        ``_parse_for_models``
+    """
+    if tu is None:
+        tu = _parse_for_models(filename, args, function_bodies)
     c = tu.cursor
     for diag in tu.diagnostics:
         warnings.warn(str(diag))
@@ -403,23 +484,55 @@ def data_structure_from_file(
         CursorKind.TYPEDEF_DECL: TypeDefModel,
         CursorKind.CLASS_DECL: ClassDefModel,
     }
-    context.global_vars = all_globals(c).attributes("spelling").to_set()
+    if function_bodies:
+        context.global_vars = all_globals(c).attributes("spelling").to_set()
+    else:
+        # Not collected without function bodies, so the globals of the file
+        # extracted before are dropped instead of kept for this file
+        context.global_vars = set()
+    # Top-level cursors come from only a few files, so compare each file
+    # with `filename` once instead of calling `samefile` for every cursor.
+    is_main_file: Dict[str, bool] = {}
     for child in c.get_children():
-        if os.path.samefile(child.location.file.name, filename):
-            if child.kind in models:
-                try:
-                    method = models[child.kind].from_cursor
-                    ret = method(child)
-                    if ret is not None:
-                        yield ret
-                    else:
-                        continue
-                except:
-                    import traceback
-
-                    traceback.print_exc()
+        file = child.location.file
+        if file is None:
+            continue
+        if file.name not in is_main_file:
+            is_main_file[file.name] = os.path.samefile(file.name, filename)
+        if not is_main_file[file.name]:
+            continue
+        ret = None
+        try:
+            if child.kind not in models:
+                pass
+            elif child.kind == CursorKind.FUNCTION_DECL and not function_bodies:
+                if _has_skipped_body(child):
+                    ret = FunctionDefModel.signature_from_cursor(child)
             else:
-                continue
+                ret = models[child.kind].from_cursor(child)
+        except:
+            import traceback
+
+            traceback.print_exc()
+        yield child, ret
+
+
+@melodie_generator
+def data_structure_from_file(
+    filename: str, args: CompilerArgsType = None, function_bodies: bool = True
+) -> Generator[DefModel, None, None]:
+    """
+    Extract the models of functions, structs, unions, typedefs and classes
+    defined in ``filename``.
+
+    :function_bodies: If False, the file is parsed with ``SKELETON_PARSE_OPTIONS``
+        which skips function bodies. This is much faster when only structures
+        and function signatures are needed, while the ``FunctionDefModel`` will
+        have no ``callings``, ``locals`` or ``referenced_globals``.
+    """
+    for _, model in _iter_top_level_models(filename, args, function_bodies):
+        if model is not None:
+            yield model
 
 
 @melodie_generator
@@ -427,9 +540,85 @@ def iter_data_structures(
     folder: str, name_filter: Callable[[str], bool], args: CompilerArgsType = None
 ) -> Generator[DefModel, None, None]:
     assert os.path.exists(folder)
-    for root, _, files in os.walk(folder):
-        for file in files:
-            abspath = os.path.join(root, file)
-            print(abspath)
-            if name_filter(abspath):
-                yield from data_structure_from_file(abspath, args)
+    for abspath in expand_files(folder, name_filter):
+        yield from data_structure_from_file(abspath, args)
+
+
+def _serialized_data_structures(
+    filename: str, args: CompilerArgsType = None, function_bodies: bool = True
+) -> List[Dict[str, Any]]:
+    # DefModel holds ctypes objects from libclang, so only the serializable
+    # dicts could be sent back from worker processes.
+    return [
+        m.to_serializable_dict()
+        for m in data_structure_from_file(filename, args, function_bodies)
+    ]
+
+
+def _unparse_data_structures(
+    result: FileTaskResult[List[Dict[str, Any]]],
+) -> FileTaskResult[List[DefModel]]:
+    if result.ok:
+        result.result = [program_model_unparse(d) for d in result.result]
+    return result
+
+
+def ingest_data_structures(
+    files: Union[str, Iterable[str], CompilationDatabase],
+    args: CompilerArgsType = None,
+    workers: Optional[int] = None,
+    name_filter: Optional[Callable[[str], bool]] = None,
+    function_bodies: bool = True,
+    symbol_index: Optional["SymbolIndex"] = None,
+) -> MelodieGenerator[FileTaskResult[List[DefModel]]]:
+    """
+    Extract data structures from many files across worker processes.
+
+    Results are yielded in completion order, one ``FileTaskResult`` per file,
+    holding the list of ``DefModel`` of this file. A file failed to be analysed
+    produces a result with ``error`` set instead of aborting the whole batch.
+
+    :files: A folder, an iterable of files, or a ``CompilationDatabase`` which
+        also provides the compiler arguments of each file.
+    :args: Compiler arguments. If it is a callable, it must be picklable
+        (e.g. a module-level function, not a lambda).
+    :workers: Number of worker processes, ``os.cpu_count()`` by default.
+    :name_filter: Filter on the absolute path of files
+    :function_bodies: The same as in ``data_structure_from_file``
+    :symbol_index: If provided, the symbols of each file are extracted from
+        the same translation unit as the models, and stored into the index as
+        the results are iterated, as ``SymbolIndex.update`` would do. For a
+        file listed with several argument sets in a ``CompilationDatabase``,
+        the symbols of the last result are kept.
+    """
+    if symbol_index is None:
+        task = functools.partial(
+            _serialized_data_structures, function_bodies=function_bodies
+        )
+    else:
+        # Imported here as the symbol index is built on the models
+        from .symbol_index import _file_models_and_symbols
+
+        task = functools.partial(
+            _file_models_and_symbols, function_bodies=function_bodies
+        )
+    if isinstance(files, CompilationDatabase):
+        assert args is None, "Arguments are provided by the compilation database"
+        if name_filter is not None:
+            files = CompilationDatabase([e for e in files if name_filter(e.file)])
+        results = files.map(task, workers)
+    else:
+        results = parallel_map_files(
+            functools.partial(task, args=args),
+            expand_files(files, name_filter),
+            workers,
+        )
+    if symbol_index is not None:
+        results = results.map(
+            functools.partial(
+                symbol_index._store_ingested,
+                args=args,
+                function_bodies=function_bodies,
+            )
+        )
+    return results.map(_unparse_data_structures)
@@ -3,6 +3,7 @@ from typing import Generator
 from clang.cindex import Cursor, CursorKind, Type, TypeKind
 
 from ...utils import melodie_generator
+from .cursor_index import get_cursor_index
 
 
 @melodie_generator
@@ -12,10 +13,7 @@ def get_local_var_defs(c: Cursor) -> Generator[Cursor, None, None]:
     except variables from parameters
     """
     assert c.kind == CursorKind.FUNCTION_DECL, c
-    child: Cursor
-    for child in c.walk_preorder():
-        if child.kind == CursorKind.VAR_DECL:
-            yield child
+    yield from get_cursor_index(c).descendants(c, CursorKind.VAR_DECL)
 
 
 @melodie_generator
@@ -25,13 +23,12 @@ def get_var_refs(c: Cursor, include_funcs=False) -> Generator[Cursor, None, None
     """
     assert c.kind in (CursorKind.FUNCTION_DECL, CursorKind.CXX_METHOD), c.kind
     child: Cursor
-    for child in c.walk_preorder():
-        if child.kind == CursorKind.DECL_REF_EXPR:
-            type: Type = child.type
-            if type.kind == TypeKind.FUNCTIONPROTO and not include_funcs:
-                continue
-            else:
-                yield child
+    for child in get_cursor_index(c).descendants(c, CursorKind.DECL_REF_EXPR):
+        type: Type = child.type
+        if type.kind == TypeKind.FUNCTIONPROTO and not include_funcs:
+            continue
+        else:
+            yield child
 
 
 @melodie_generator
@@ -40,10 +37,14 @@ def get_param_decls(c: Cursor) -> Generator[Cursor, None, None]:
     Extract parameter declarations from function definition
     """
     assert c.kind == CursorKind.FUNCTION_DECL, c
-    child: Cursor
-    for child in c.walk_preorder():
-        if child.kind == CursorKind.PARM_DECL:
-            yield child
+    yield from get_cursor_index(c).descendants(c, CursorKind.PARM_DECL)
+
+
+def _global_ref_names(c: Cursor, var_refs: list) -> set:
+    all_var_refs = {var_ref.spelling for var_ref in var_refs}
+    local_var_defs = get_local_var_defs(c).attributes("spelling").to_set()
+    param_var_defs = get_param_decls(c).attributes("spelling").to_set()
+    return all_var_refs - local_var_defs - param_var_defs
 
 
 @melodie_generator
@@ -52,12 +53,10 @@ def get_global_refs(c: Cursor) -> Generator[Cursor, None, None]:
     Get all global variables referenced in one function
     """
     assert c.kind == CursorKind.FUNCTION_DECL, c
-    all_var_refs = get_var_refs(c).attributes("spelling").to_set()
-    local_var_defs = get_local_var_defs(c).attributes("spelling").to_set()
-    param_var_defs = get_param_decls(c).attributes("spelling").to_set()
-    vars = all_var_refs - local_var_defs - param_var_defs
+    var_refs = get_var_refs(c).to_list()
+    vars = _global_ref_names(c, var_refs)
     var_ref: Cursor
-    for var_ref in get_var_refs(c):
+    for var_ref in var_refs:
         if var_ref.spelling in vars:
             yield var_ref
 
@@ -68,9 +67,5 @@ def get_global_ref_names(c: Cursor) -> Generator[str, None, None]:
     Get all global variables referenced in one function
     """
     assert c.kind == CursorKind.FUNCTION_DECL, c
-    all_var_refs = get_var_refs(c).attributes("spelling").to_set()
-    local_var_defs = get_local_var_defs(c).attributes("spelling").to_set()
-    param_var_defs = get_param_decls(c).attributes("spelling").to_set()
-    vars = all_var_refs - local_var_defs - param_var_defs
-    for v in vars:
+    for v in _global_ref_names(c, get_var_refs(c).to_list()):
         yield v
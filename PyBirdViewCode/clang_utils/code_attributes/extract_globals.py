@@ -3,6 +3,7 @@ from typing import Generator
 from clang.cindex import Cursor, CursorKind
 
 from ...utils import melodie_generator
+from .cursor_index import get_cursor_index
 
 
 @melodie_generator
@@ -11,7 +12,4 @@ def all_globals(c: Cursor) -> Generator[Cursor, None, None]:
     Extract all globals from a translation unit.
     """
     assert c.kind == CursorKind.TRANSLATION_UNIT
-    child: Cursor
-    for child in c.get_children():
-        if child.kind == CursorKind.VAR_DECL:
-            yield child
+    yield from get_cursor_index(c).top_level_of_kind(CursorKind.VAR_DECL)
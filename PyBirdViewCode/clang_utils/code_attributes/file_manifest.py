@@ -0,0 +1,197 @@
+"""
+On-disk manifest of the files in a project, to find what changed since the
+last run without parsing or hashing unchanged files.
+"""
+
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Sequence, Set
+
+from .tu_cache import file_digest
+from .utils import FileTypesType, scan_files
+
+_INCLUDE_PATTERN = re.compile(rb'^[ \t]*#[ \t]*include[ \t]*([<"])([^>"\n]+)[>"]', re.M)
+
+
+@dataclass
+class ChangeSet:
+    """
+    Files changed since the last saved manifest, as absolute paths.
+
+    :dependents: Files which are not changed themselves, but include a changed
+        or deleted file directly or indirectly.
+
+    Iterating a ``ChangeSet`` gives the files to analyse again, i.e. the added,
+    modified and dependent files, so it could be passed as ``files`` to the
+    batch entry points such as ``ingest_data_structures`` and
+    ``SymbolIndex.update``.
+    """
+
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    dependents: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> List[str]:
+        return sorted(self.added + self.modified + self.dependents)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.changed)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
+
+
+class FileManifest:
+    """
+    Record of the modification time, size, content digest and included files
+    of each file, stored in the JSON file ``path``.
+
+    A file is only hashed if its modification time or size differs from the
+    record, so checking an unchanged project costs one ``stat`` per file.
+    Includes are found by scanning ``#include`` directives in the text, and
+    resolved against the folder of the including file (for ``"..."``) and
+    ``include_dirs``. Includes that could not be resolved, such as system
+    headers, are ignored.
+
+    .. code-block:: python
+
+        manifest = FileManifest(include_dirs=["path/to/project/include"])
+        changes = manifest.detect_changes("path/to/project", (".c", ".h"))
+        for result in ingest_data_structures(changes):
+            ...
+        manifest.save()
+
+    Changes are only recorded on ``save``, so a run failing before ``save``
+    reports the same changes next time.
+    """
+
+    def __init__(
+        self,
+        path: str = ".PyBirdViewCode/manifest.json",
+        include_dirs: Sequence[str] = (),
+    ) -> None:
+        self.path = os.path.abspath(path)
+        self.include_dirs = [os.path.abspath(d) for d in include_dirs]
+        # file -> {"mtime": ..., "size": ..., "digest": ..., "includes": [...]}
+        self.files: Dict[str, Dict] = {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        # Includes resolved against other folders are out of date
+        if data is not None and data.get("include_dirs") == self.include_dirs:
+            self.files = data["files"]
+
+    def save(self):
+        """
+        Write the manifest, so that the next ``detect_changes`` compares with
+        the current state.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"include_dirs": self.include_dirs, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def _resolve_includes(self, file: str) -> List[str]:
+        try:
+            with open(file, "rb") as f:
+                content = f.read()
+        except OSError:
+            return []
+        includes = []
+        for delimiter, name in _INCLUDE_PATTERN.findall(content):
+            name = os.fsdecode(name.strip())
+            folders = self.include_dirs
+            if delimiter == b'"':
+                folders = [os.path.dirname(file)] + folders
+            for folder in folders:
+                path = os.path.normpath(os.path.join(folder, name))
+                if os.path.isfile(path):
+                    includes.append(path)
+                    break
+        return includes
+
+    def detect_changes(self, folder: str, filetypes: FileTypesType = "") -> ChangeSet:
+        """
+        Compare the files inside ``folder`` with the manifest, and update the
+        manifest in memory.
+
+        :filetypes: The same as ``iter_files``. Headers should be included to
+            find the dependents of modified headers.
+        """
+        folder = os.path.abspath(folder)
+        changes = ChangeSet()
+        seen: Set[str] = set()
+        for entry in scan_files(folder, filetypes):
+            file = entry.path
+            seen.add(file)
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            record = self.files.get(file)
+            if (
+                record is not None
+                and record["mtime"] == st.st_mtime_ns
+                and record["size"] == st.st_size
+            ):
+                continue
+            digest = file_digest(file)
+            if digest is None:
+                continue
+            if record is not None and record["digest"] == digest:
+                # Touched but not modified
+                record["mtime"] = st.st_mtime_ns
+                continue
+            (changes.added if record is None else changes.modified).append(file)
+            self.files[file] = {
+                "mtime": st.st_mtime_ns,
+                "size": st.st_size,
+                "digest": digest,
+                "includes": self._resolve_includes(file),
+            }
+
+        prefix = os.path.join(folder, "")
+        for file in list(self.files):
+            if file.startswith(prefix) and file not in seen:
+                changes.deleted.append(file)
+                del self.files[file]
+
+        changed = set(changes.added + changes.modified + changes.deleted)
+        changes.dependents = [
+            f for f in self.dependents(changed) if f not in changed and f in seen
+        ]
+        for attr in ("added", "modified", "deleted"):
+            getattr(changes, attr).sort()
+        return changes
+
+    def includes(self, file: str) -> List[str]:
+        """
+        Get the files directly included by ``file``
+        """
+        record = self.files.get(os.path.abspath(file))
+        return list(record["includes"]) if record is not None else []
+
+    def dependents(self, files: Iterable[str]) -> List[str]:
+        """
+        Get the recorded files including any of ``files`` directly or
+        indirectly, excluding ``files`` themselves unless in an include cycle.
+        """
+        included_by: Dict[str, List[str]] = {}
+        for file, record in self.files.items():
+            for include in record["includes"]:
+                included_by.setdefault(include, []).append(file)
+        result: Set[str] = set()
+        stack = [os.path.abspath(f) for f in files]
+        while stack:
+            for dependent in included_by.get(stack.pop(), ()):
+                if dependent not in result:
+                    result.add(dependent)
+                    stack.append(dependent)
+        return sorted(result)
@@ -0,0 +1,214 @@
+"""
+Columnar snapshot of a Clang AST for bulk queries.
+
+Each attribute of a cursor is fetched through ctypes, so checkers reading
+``kind``, ``location``, ``spelling`` and ``type.spelling`` of every cursor
+spend most of their time in attribute fetches. ``FlatTU`` fetches them once
+into ``array.array`` columns, and queries run over the whole columns with
+C-level iteration (``map`` and ``itertools.compress``).
+"""
+
+import itertools
+import operator
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from clang.cindex import Cursor, CursorKind, TranslationUnit
+
+from .utils import CompilerArgsType, parse_file
+
+StringPredicate = Callable[[str], bool]
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def intern(self, s: Optional[str]) -> int:
+        if s is None:
+            return -1
+        string_id = self._ids.get(s)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._ids[s] = string_id
+            self.strings.append(s)
+        return string_id
+
+
+class FlatTU:
+    """
+    Cursors of an AST in preorder, stored as columns. The cursor at position
+    ``i`` is described by ``kind[i]``, ``parent[i]``, ``line[i]`` and so on.
+
+    Positions are used to refer to cursors, and -1 stands for no cursor (e.g.
+    the parent of the root) or no string (e.g. the file of the root). Strings
+    (spellings, type spellings and file names) are interned into ``strings``,
+    so string predicates are evaluated once per distinct string.
+
+    The snapshot holds no libclang object, so it could be pickled and sent to
+    worker processes.
+
+    .. code-block:: python
+
+        flat = FlatTU.from_file("demo.c")
+        positions = flat.select(
+            CursorKind.BINARY_OPERATOR,
+            type_spelling=lambda s: s.startswith("unsigned"),
+        )
+        lines = [flat.line[i] for i in positions]
+    """
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        # Ids of the interned strings, for exact string conditions
+        self._string_ids: Dict[str, int] = {}
+        self.kind = array("H")
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.file = array("i")
+        self.line = array("i")
+        self.column = array("i")
+        self.offset = array("i")
+        self.type_spelling = array("i")
+        self.spelling = array("i")
+
+    @classmethod
+    def from_cursor(cls, root: Cursor) -> "FlatTU":
+        """
+        Snapshot the subtree of ``root`` in one traversal
+        """
+        flat = cls()
+        strings = _StringTable()
+        stack: List[Tuple[Cursor, int]] = [(root, -1)]
+        # Position of the last child appended to each parent
+        last_child: Dict[int, int] = {}
+        while stack:
+            cursor, parent = stack.pop()
+            pos = len(flat.kind)
+            flat.kind.append(cursor.kind.value)
+            flat.parent.append(parent)
+            flat.first_child.append(-1)
+            flat.next_sibling.append(-1)
+            if parent >= 0:
+                prev = last_child.get(parent, -1)
+                if prev < 0:
+                    flat.first_child[parent] = pos
+                else:
+                    flat.next_sibling[prev] = pos
+                last_child[parent] = pos
+            location = cursor.location
+            file = location.file
+            flat.file.append(strings.intern(file.name if file is not None else None))
+            flat.line.append(location.line)
+            flat.column.append(location.column)
+            flat.offset.append(location.offset)
+            flat.type_spelling.append(strings.intern(cursor.type.spelling))
+            flat.spelling.append(strings.intern(cursor.spelling))
+            children = list(cursor.get_children())
+            for child in reversed(children):
+                stack.append((child, pos))
+        flat.strings = strings.strings
+        flat._string_ids = strings._ids
+        return flat
+
+    @classmethod
+    def from_tu(cls, tu: TranslationUnit) -> "FlatTU":
+        return cls.from_cursor(tu.cursor)
+
+    @classmethod
+    def from_file(cls, file: str, args: CompilerArgsType = None) -> "FlatTU":
+        return cls.from_cursor(parse_file(file, args).cursor)
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def string_ids(self, predicate: StringPredicate) -> set:
+        """
+        Get ids of the interned strings satisfying ``predicate``
+        """
+        return {i for i, s in enumerate(self.strings) if predicate(s)}
+
+    def _mask(
+        self, column: array, condition: Union[str, StringPredicate, None]
+    ) -> Optional[Iterable[bool]]:
+        if condition is None:
+            return None
+        if isinstance(condition, str):
+            string_id = self._string_ids.get(condition)
+            if string_id is None:
+                return itertools.repeat(False, len(self))
+            return map(string_id.__eq__, column)
+        return map(self.string_ids(condition).__contains__, column)
+
+    def select(
+        self,
+        kind: Optional[CursorKind] = None,
+        spelling: Union[str, StringPredicate, None] = None,
+        type_spelling: Union[str, StringPredicate, None] = None,
+        file: Union[str, StringPredicate, None] = None,
+    ) -> List[int]:
+        """
+        Get positions of cursors matching all the given conditions.
+
+        Each string condition is either the exact string, or a predicate on
+        the string.
+        """
+        masks = [
+            mask
+            for mask in (
+                map(kind.value.__eq__, self.kind) if kind is not None else None,
+                self._mask(self.spelling, spelling),
+                self._mask(self.type_spelling, type_spelling),
+                self._mask(self.file, file),
+            )
+            if mask is not None
+        ]
+        if len(masks) == 0:
+            return list(range(len(self)))
+        mask = masks[0]
+        for other in masks[1:]:
+            mask = map(operator.and_, mask, other)
+        return list(itertools.compress(range(len(self)), mask))
+
+    def children(self, pos: int) -> List[int]:
+        """
+        Get positions of the children of the cursor at ``pos``
+        """
+        children = []
+        child = self.first_child[pos]
+        while child >= 0:
+            children.append(child)
+            child = self.next_sibling[child]
+        return children
+
+    def subtree_end(self, pos: int) -> int:
+        """
+        The subtree of the cursor at ``pos`` is ``range(pos, subtree_end(pos))``
+        """
+        while pos >= 0:
+            if self.next_sibling[pos] >= 0:
+                return self.next_sibling[pos]
+            pos = self.parent[pos]
+        return len(self)
+
+    def get_kind(self, pos: int) -> CursorKind:
+        return CursorKind.from_id(self.kind[pos])
+
+    def get_spelling(self, pos: int) -> str:
+        return self.strings[self.spelling[pos]]
+
+    def get_type_spelling(self, pos: int) -> str:
+        return self.strings[self.type_spelling[pos]]
+
+    def get_location(self, pos: int) -> Tuple[Optional[str], int, int]:
+        """
+        Get (file, line, column) of the cursor at ``pos``
+        """
+        file = self.file[pos]
+        return (
+            self.strings[file] if file >= 0 else None,
+            self.line[pos],
+            self.column[pos],
+        )
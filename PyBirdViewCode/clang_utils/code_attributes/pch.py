@@ -0,0 +1,196 @@
+"""
+Precompiled header shared by all files of a project.
+
+When most files include the same (large) set of headers, these headers could be
+compiled once into a PCH, and each later ``parse_file`` call loads the PCH with
+``-include-pch`` instead of lexing and parsing the headers again.
+"""
+
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from clang import cindex
+
+from .tu_cache import _digest_of, file_digest, libclang_version
+
+
+class PrecompiledHeader:
+    """
+    A precompiled header built from ``headers`` with compiler arguments ``args``.
+
+    The PCH file is content-addressed in ``cache_dir``: it is rebuilt when any of
+    the headers, the arguments or the libclang version changes.
+
+    .. note:: The PCH is implicitly included before each source file, so the
+        headers should be protected by include guards or ``#pragma once``.
+        It is only applied to files of ``language`` parsed with exactly the
+        same ``args``, since clang rejects a PCH built under a different
+        configuration, and whose leading ``#include`` directives are the
+        ``headers`` in order, so that no other file gains their declarations.
+
+    :headers: Header files to precompile, in inclusion order
+    :args: Compiler arguments of the files which would use this PCH
+    :language: ``"c"`` or ``"c++"``
+    """
+
+    def __init__(
+        self,
+        headers: Sequence[str],
+        args: Optional[List[str]] = None,
+        language: str = "c",
+        cache_dir: str = ".PyBirdViewCode/pch",
+    ) -> None:
+        assert language in ("c", "c++"), language
+        self.headers = [os.path.abspath(header) for header in headers]
+        self.args = list(args) if args is not None else []
+        self.language = language
+        self.cache_dir = os.path.abspath(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _key(self) -> str:
+        header_digests = []
+        for header in self.headers:
+            digest = file_digest(header)
+            if digest is None:
+                raise FileNotFoundError(header)
+            header_digests.append(f"{header}:{digest}")
+        return _digest_of(
+            libclang_version(), self.language, *self.args, *header_digests
+        )
+
+    def build(self) -> str:
+        """
+        Build the PCH if it is missing or out of date.
+
+        :return: Path of the PCH file
+        """
+        key = self._key()
+        pch_path = os.path.join(self.cache_dir, key + ".pch")
+        if os.path.exists(pch_path):
+            return pch_path
+        umbrella_path = os.path.join(self.cache_dir, key + ".h")
+        with open(umbrella_path, "w", encoding="utf8") as f:
+            for header in self.headers:
+                f.write(f'#include "{header}"\n')
+        tu = cindex.Index.create().parse(
+            umbrella_path, args=self.args + ["-x", f"{self.language}-header"]
+        )
+        errors = [
+            str(diag)
+            for diag in tu.diagnostics
+            if diag.severity >= cindex.Diagnostic.Error
+        ]
+        if len(errors) > 0:
+            raise ValueError(f"Failed to precompile headers: {errors}")
+        tmp_path = pch_path + f".{os.getpid()}.tmp"
+        tu.save(tmp_path)
+        os.replace(tmp_path, pch_path)
+        return pch_path
+
+    def applies_to(self, file: str, args: Sequence[str]) -> bool:
+        """
+        Whether ``file`` parsed with ``args`` could use this PCH
+        """
+        if list(args) != self.args or _file_language(file, args) != self.language:
+            return False
+        includes = _leading_includes(file, len(self.headers))
+        if len(includes) < len(self.headers):
+            return False
+        search_dirs = _include_dirs(args)
+        for (name, angled), header in zip(includes, self.headers):
+            dirs = search_dirs if angled else [os.path.dirname(file)] + search_dirs
+            if _resolve_include(name, dirs) != header:
+                return False
+        return True
+
+    def compiler_args(self) -> List[str]:
+        """
+        Arguments to append for loading this PCH
+        """
+        return ["-include-pch", self.build()]
+
+
+_C_EXTENSIONS = {".c", ".i", ".h"}
+_CXX_EXTENSIONS = {".cpp", ".cc", ".cxx", ".c++", ".C", ".ii", ".hpp", ".hh", ".hxx"}
+_INCLUDE_PATTERN = re.compile(r'#\s*include\s*([<"])([^>"]+)[>"]')
+_COMMENT_PATTERN = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def _file_language(file: str, args: Sequence[str]) -> Optional[str]:
+    # The language given by the last `-x`, or guessed from the extension
+    language = None
+    for i, arg in enumerate(args):
+        if arg == "-x" and i + 1 < len(args):
+            language = args[i + 1]
+        elif arg.startswith("-x") and len(arg) > 2:
+            language = arg[2:]
+    if language is not None:
+        # Such as "c++-header" or "c-cpp-output"
+        for suffix in ("-header", "-cpp-output"):
+            language = language.removesuffix(suffix)
+        return language
+    ext = os.path.splitext(file)[1]
+    if ext in _C_EXTENSIONS:
+        return "c"
+    if ext in _CXX_EXTENSIONS:
+        return "c++"
+    return None
+
+
+def _leading_includes(file: str, count: int) -> List[Tuple[str, bool]]:
+    """
+    The names of the first ``count`` ``#include`` directives of ``file``, and
+    whether each is ``<angled>``, stopping at the first line of other code.
+    """
+    # Directives are ASCII, whatever the encoding of the file. Comments inside
+    # string literals could only be found after the first line of code.
+    with open(file, "r", encoding="latin-1") as f:
+        text = _COMMENT_PATTERN.sub(" ", f.read())
+    includes: List[Tuple[str, bool]] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line == "":
+            continue
+        match = _INCLUDE_PATTERN.fullmatch(line)
+        if match is None:
+            break
+        includes.append((match.group(2), match.group(1) == "<"))
+        if len(includes) >= count:
+            break
+    return includes
+
+
+def _include_dirs(args: Sequence[str]) -> List[str]:
+    dirs = []
+    for i, arg in enumerate(args):
+        for flag in ("-I", "-iquote", "-isystem"):
+            if arg == flag and i + 1 < len(args):
+                dirs.append(args[i + 1])
+            elif arg.startswith(flag) and len(arg) > len(flag):
+                dirs.append(arg[len(flag) :])
+    return dirs
+
+
+def _resolve_include(name: str, dirs: Sequence[str]) -> Optional[str]:
+    for folder in dirs:
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            return os.path.abspath(path)
+    return None
+
+
+_default_pch: Optional[PrecompiledHeader] = None
+
+
+def set_default_pch(pch: Optional[PrecompiledHeader]):
+    """
+    Make ``parse_file`` load ``pch`` for every file it applies to, see
+    ``PrecompiledHeader.applies_to``. Pass None to disable.
+    """
+    global _default_pch
+    _default_pch = pch
+
+
+def get_default_pch() -> Optional[PrecompiledHeader]:
+    return _default_pch
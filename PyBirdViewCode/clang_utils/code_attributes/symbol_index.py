@@ -0,0 +1,426 @@
+"""
+Project-level index of functions, structures and globals in a SQLite file
+"""
+
+import functools
+import json
+import os
+import sqlite3
+import warnings
+from abc import ABCMeta, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from clang.cindex import Cursor, CursorKind, StorageClass, TranslationUnit
+
+from ...utils import FileTaskResult, parallel_map_files
+from .compilation_database import CompilationDatabase
+from .extract_data_structure import (
+    DefModel,
+    FunctionDefModel,
+    _iter_top_level_models,
+    _parse_for_models,
+    program_model_unparse,
+)
+from .file_manifest import ChangeSet
+from .tu_cache import _digest_of, file_digest
+from .utils import CompilerArgsType, expand_files, resolve_compiler_args
+
+#: Kinds of top-level cursors recorded in the index
+SYMBOL_KINDS = (
+    CursorKind.FUNCTION_DECL,
+    CursorKind.VAR_DECL,
+    CursorKind.STRUCT_DECL,
+    CursorKind.UNION_DECL,
+    CursorKind.CLASS_DECL,
+    CursorKind.ENUM_DECL,
+    CursorKind.TYPEDEF_DECL,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    name TEXT NOT NULL,
+    usr TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    file TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    column INTEGER NOT NULL,
+    is_definition INTEGER NOT NULL,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name, kind);
+CREATE INDEX IF NOT EXISTS symbols_usr ON symbols (usr);
+CREATE INDEX IF NOT EXISTS symbols_file ON symbols (file);
+"""
+
+_DEPENDENCY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dependencies (
+    file TEXT NOT NULL,
+    dependency TEXT NOT NULL,
+    digest TEXT
+);
+CREATE INDEX IF NOT EXISTS dependencies_file ON dependencies (file);
+"""
+
+_SymbolRow = Tuple[str, str, str, str, int, int, int, Optional[str]]
+
+
+@dataclass(frozen=True)
+class SymbolRecord:
+    """
+    One declaration or definition in the project
+
+    :kind: Name of the ``CursorKind``, such as ``"STRUCT_DECL"``
+    :model_json: The serialized ``DefModel`` of definitions, otherwise None
+    """
+
+    name: str
+    usr: str
+    kind: str
+    file: str
+    line: int
+    column: int
+    is_definition: bool
+    model_json: Optional[str]
+
+    @property
+    def model(self) -> Optional[DefModel]:
+        """
+        The ``DefModel`` of this definition, None for declarations
+        """
+        if self.model_json is None:
+            return None
+        return program_model_unparse(json.loads(self.model_json))
+
+
+def _is_definition(cursor: Cursor, model: Optional[DefModel]) -> bool:
+    if cursor.kind == CursorKind.VAR_DECL:
+        # Tentative definitions like `int a;` are not reported as definitions
+        return cursor.storage_class != StorageClass.EXTERN
+    return cursor.is_definition() or isinstance(model, FunctionDefModel)
+
+
+def _dependency_digests(tu: TranslationUnit) -> Dict[str, Optional[str]]:
+    """
+    Digests of the files included by ``tu`` directly or indirectly
+    """
+    return {
+        os.path.abspath(inc.include.name): file_digest(inc.include.name)
+        for inc in tu.get_includes()
+    }
+
+
+def _symbol_row(
+    file: str,
+    cursor: Cursor,
+    model: Optional[DefModel],
+    serialized: Optional[Dict[str, Any]],
+) -> Optional[_SymbolRow]:
+    if cursor.kind not in SYMBOL_KINDS or cursor.spelling == "":
+        return None
+    location = cursor.location
+    return (
+        cursor.spelling,
+        cursor.get_usr(),
+        cursor.kind.name,
+        file,
+        location.line,
+        location.column,
+        int(_is_definition(cursor, model)),
+        json.dumps(serialized) if serialized is not None else None,
+    )
+
+
+def _file_symbols(
+    file: str, args: CompilerArgsType = None, function_bodies: bool = True
+) -> Tuple[List[_SymbolRow], Dict[str, Optional[str]]]:
+    _, symbols = _file_models_and_symbols(file, args, function_bodies)
+    return symbols
+
+
+def _file_models_and_symbols(
+    file: str, args: CompilerArgsType = None, function_bodies: bool = True
+) -> Tuple[List[Dict[str, Any]], Tuple[List[_SymbolRow], Dict[str, Optional[str]]]]:
+    """
+    Extract the serialized models of ``file``, the same as
+    ``data_structure_from_file``, with the symbols and the dependency digests
+    stored by ``SymbolIndex``, all from one translation unit.
+    """
+    models = []
+    rows = []
+    tu = _parse_for_models(file, args, function_bodies)
+    for cursor, model in _iter_top_level_models(file, args, function_bodies, tu):
+        serialized = model.to_serializable_dict() if model is not None else None
+        if serialized is not None:
+            models.append(serialized)
+        row = _symbol_row(file, cursor, model, serialized)
+        if row is not None:
+            rows.append(row)
+    return models, (rows, _dependency_digests(tu))
+
+
+def _file_digest(file: str, args: CompilerArgsType, salt: str) -> Optional[str]:
+    content_digest = file_digest(file)
+    if content_digest is None:
+        return None
+    return _digest_of(content_digest, salt, *resolve_compiler_args(file, args))
+
+
+class _FileDigestStore(metaclass=ABCMeta):
+    """
+    SQLite file of per-file records, each file recorded with a digest of its
+    content and compiler arguments, and with the digests of the files it
+    includes, so that only the files added or modified, or including a
+    modified file, since the last update are parsed again.
+
+    Subclasses provide ``_schema`` with a ``files`` table, the names of tables
+    holding per-file rows in ``_file_tables``, and ``_insert``.
+    """
+
+    _schema = ""
+    _file_tables: Tuple[str, ...] = ()
+
+    def __init__(self, path: str) -> None:
+        if path != ":memory:":
+            path = os.path.abspath(path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(self._schema + _DEPENDENCY_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _stored_digest(self, file: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT digest FROM files WHERE file = ?", (file,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def _dependencies_changed(self, file: str) -> bool:
+        rows = self._conn.execute(
+            "SELECT dependency, digest FROM dependencies WHERE file = ?", (file,)
+        )
+        return any(file_digest(dependency) != digest for dependency, digest in rows)
+
+    @abstractmethod
+    def _insert(self, file: str, result: Any):
+        """
+        Insert the rows of ``file`` extracted by a worker
+        """
+        pass
+
+    def _delete(self, file: str):
+        for table in self._file_tables + ("dependencies",):
+            self._conn.execute(f"DELETE FROM {table} WHERE file = ?", (file,))
+        self._conn.execute("DELETE FROM files WHERE file = ?", (file,))
+
+    def _store(
+        self,
+        file: str,
+        digest: str,
+        result: Any,
+        dependencies: Dict[str, Optional[str]],
+    ):
+        with self._conn:
+            self._delete(file)
+            self._insert(file, result)
+            self._conn.executemany(
+                "INSERT INTO dependencies VALUES (?, ?, ?)",
+                [(file, path, dep_digest) for path, dep_digest in dependencies.items()],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?)", (file, digest)
+            )
+
+    def remove_file(self, file: str):
+        """
+        Remove the records of ``file``, e.g. when it is deleted
+        """
+        with self._conn:
+            self._delete(os.path.abspath(file))
+
+    def _update(
+        self,
+        func: Callable[..., Any],
+        files: Union[str, Iterable[str], CompilationDatabase],
+        args: CompilerArgsType,
+        workers: Optional[int],
+        name_filter: Optional[Callable[[str], bool]],
+        salt: str = "",
+        **kwargs,
+    ) -> List[str]:
+        # `func(file, args=args, **kwargs)` runs in worker processes and
+        # returns what `_insert` stores, with the `_dependency_digests` of the
+        # translation unit. Every file of a `ChangeSet` is parsed again, as its
+        # dependents are listed for a change in the headers they include.
+        force = isinstance(files, ChangeSet)
+        if isinstance(files, CompilationDatabase):
+            assert args is None, "Arguments are provided by the compilation database"
+            args = files.get_args
+            files = files.files
+        elif isinstance(files, ChangeSet):
+            for file in files.deleted:
+                self.remove_file(file)
+        digests = {}
+        for file in expand_files(files, name_filter):
+            file = os.path.abspath(file)
+            digest = _file_digest(file, args, salt)
+            if digest is None:
+                continue
+            if (
+                force
+                or digest != self._stored_digest(file)
+                or self._dependencies_changed(file)
+            ):
+                digests[file] = digest
+
+        updated = []
+        for result in parallel_map_files(
+            functools.partial(func, args=args, **kwargs), list(digests), workers
+        ):
+            if result.ok:
+                extracted, dependencies = result.result
+                self._store(result.file, digests[result.file], extracted, dependencies)
+                updated.append(result.file)
+            else:
+                warnings.warn(f"Failed to index {result.file}:\n{result.error}")
+        return updated
+
+    def files(self) -> List[str]:
+        """
+        All files in the index
+        """
+        return [row[0] for row in self._conn.execute("SELECT file FROM files")]
+
+
+class SymbolIndex(_FileDigestStore):
+    """
+    Index of top-level symbols of a project, stored in the SQLite file ``path``
+    and looked up by name, USR, kind and file.
+
+    Each file is recorded with a digest of its content and compiler arguments,
+    and with the digests of the files it includes, so ``update`` only parses
+    the files added or modified, or including a modified file, since the last
+    run.
+    Symbols are recorded for the file where they are written, so headers
+    should be passed to ``update`` as well to find what they define.
+    ``ingest_data_structures`` also fills the index passed as its
+    ``symbol_index``, from the translation units it parses for the models.
+
+    .. code-block:: python
+
+        index = SymbolIndex()
+        index.update("path/to/project")
+        record = index.find_definition("MyStruct", CursorKind.STRUCT_DECL)
+        print(record.file, record.line, record.model)
+    """
+
+    _schema = _SCHEMA
+    _file_tables = ("symbols",)
+
+    def __init__(self, path: str = ".PyBirdViewCode/symbols.sqlite3") -> None:
+        super().__init__(path)
+
+    def _insert(self, file: str, rows: List[_SymbolRow]):
+        self._conn.executemany(
+            "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def update(
+        self,
+        files: Union[str, Iterable[str], CompilationDatabase],
+        args: CompilerArgsType = None,
+        workers: Optional[int] = None,
+        name_filter: Optional[Callable[[str], bool]] = None,
+        function_bodies: bool = True,
+    ) -> List[str]:
+        """
+        Parse the files added or modified since the last update across worker
+        processes, and replace their symbols in the index.
+
+        :files: The same as ``ingest_data_structures``. All files added,
+            modified or depending on a modified header in a ``ChangeSet`` are
+            parsed again, and files deleted are removed from the index.
+        :function_bodies: The same as ``data_structure_from_file``. Set to False
+            if callings, locals and referenced globals of the function models
+            are not needed, which makes parsing much faster.
+        :return: Files that are updated.
+        """
+        return self._update(
+            _file_symbols,
+            files,
+            args,
+            workers,
+            name_filter,
+            str(function_bodies),
+            function_bodies=function_bodies,
+        )
+
+    def _store_ingested(
+        self,
+        result: FileTaskResult[Tuple[List[Dict[str, Any]], Any]],
+        args: CompilerArgsType,
+        function_bodies: bool,
+    ) -> FileTaskResult[List[Dict[str, Any]]]:
+        # Store the symbols extracted by `ingest_data_structures` with the
+        # digest `update` would record, and keep only the models in the result
+        if result.ok:
+            models, (rows, dependencies) = result.result
+            if result.args is not None:
+                args = list(result.args)
+            digest = _file_digest(result.file, args, str(function_bodies))
+            if digest is not None:
+                self._store(result.file, digest, rows, dependencies)
+            result.result = models
+        return result
+
+    def _query(self, condition: str, params: tuple) -> List[SymbolRecord]:
+        rows = self._conn.execute(
+            f"SELECT * FROM symbols WHERE {condition} ORDER BY rowid", params
+        ).fetchall()
+        return [
+            SymbolRecord(
+                name, usr, kind, file, line, column, bool(is_definition), model
+            )
+            for name, usr, kind, file, line, column, is_definition, model in rows
+        ]
+
+    def lookup(
+        self,
+        name: str,
+        kind: Optional[CursorKind] = None,
+        definition_only: bool = False,
+    ) -> List[SymbolRecord]:
+        """
+        Get the records of symbols named ``name``
+        """
+        condition, params = "name = ?", (name,)
+        if kind is not None:
+            condition, params = condition + " AND kind = ?", params + (kind.name,)
+        if definition_only:
+            condition += " AND is_definition = 1"
+        return self._query(condition, params)
+
+    def lookup_usr(self, usr: str) -> List[SymbolRecord]:
+        """
+        Get the records of the symbol by its Unified Symbol Resolution, which
+        identifies the same entity across translation units.
+        """
+        return self._query("usr = ?", (usr,))
+
+    def symbols_in_file(self, file: str) -> List[SymbolRecord]:
+        return self._query("file = ?", (os.path.abspath(file),))
+
+    def find_definition(
+        self, name: str, kind: Optional[CursorKind] = None
+    ) -> Optional[SymbolRecord]:
+        """
+        Get the first definition named ``name``, or None if not defined
+        """
+        records = self.lookup(name, kind, definition_only=True)
+        return records[0] if len(records) > 0 else None
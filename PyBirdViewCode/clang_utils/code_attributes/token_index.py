@@ -0,0 +1,122 @@
+"""
+Tokens of a file tokenized once and indexed by source offset, so that the
+tokens of any cursor could be looked up without tokenizing it again.
+"""
+
+import bisect
+import ctypes
+import os
+from typing import List, Optional, Tuple
+
+from clang import cindex
+
+_get_file_contents = None
+
+
+def _contents_pointer(
+    tu: cindex.TranslationUnit, file: cindex.File
+) -> Tuple[Optional[int], int]:
+    global _get_file_contents
+    if _get_file_contents is None:
+        func = cindex.conf.lib.clang_getFileContents
+        func.argtypes = [
+            cindex.TranslationUnit,
+            cindex.File,
+            ctypes.POINTER(ctypes.c_size_t),
+        ]
+        func.restype = ctypes.c_void_p
+        _get_file_contents = func
+    size = ctypes.c_size_t(0)
+    pointer = _get_file_contents(tu, file, ctypes.byref(size))
+    return pointer, size.value
+
+
+def _file_size(tu: cindex.TranslationUnit, file: cindex.File) -> int:
+    # The size of the buffer seen by the translation unit, which differs
+    # from the file on disk when parsed with `unsaved_files`.
+    pointer, size = _contents_pointer(tu, file)
+    if pointer is None:
+        return os.path.getsize(file.name)
+    return size
+
+
+def file_contents(tu: cindex.TranslationUnit, file: cindex.File) -> bytes:
+    """
+    Get the content of ``file`` seen by ``tu``, which source offsets refer to.
+    It differs from the file on disk when parsed with ``unsaved_files``, e.g.
+    transcoded to UTF-8.
+    """
+    pointer, size = _contents_pointer(tu, file)
+    if pointer is None:
+        with open(file.name, "rb") as f:
+            return f.read()
+    return ctypes.string_at(pointer, size)
+
+
+class FileTokens:
+    """
+    All tokens of ``file`` in translation unit ``tu``, sorted by offset.
+
+    Only the tokens inside ``[start, end)`` are kept if given, see ``covers``.
+    """
+
+    def __init__(
+        self,
+        tu: cindex.TranslationUnit,
+        file: cindex.File,
+        start: int = 0,
+        end: Optional[int] = None,
+    ) -> None:
+        self.file_name: str = file.name
+        size = _file_size(tu, file)
+        self.start = start
+        self.end = size if end is None else min(end, size)
+        self._reaches_end = self.end == size
+        extent = cindex.SourceRange.from_locations(
+            cindex.SourceLocation.from_offset(tu, file, self.start),
+            cindex.SourceLocation.from_offset(tu, file, self.end),
+        )
+        self.offsets: List[int] = []
+        self.spellings: List[str] = []
+        token: cindex.Token
+        for token in tu.get_tokens(extent=extent):
+            self.offsets.append(token.location.offset)
+            self.spellings.append(token.spelling)
+
+    def covers(self, start: int, end: int) -> bool:
+        """
+        Whether the tokens in ``[start, end)``, and the first token after
+        ``end``, are all kept
+        """
+        if start < self.start:
+            return False
+        # The tokens kept are contiguous, so the first token after ``end`` is
+        # kept if any token kept starts there or later
+        return self._reaches_end or (
+            len(self.offsets) > 0 and self.offsets[-1] >= end
+        )
+
+    def spellings_between(self, start: int, end: int) -> List[str]:
+        """
+        Spellings of tokens starting in ``[start, end)``
+        """
+        lo = bisect.bisect_left(self.offsets, start)
+        hi = bisect.bisect_left(self.offsets, end, lo)
+        return self.spellings[lo:hi]
+
+    def offsets_between(self, start: int, end: int) -> List[int]:
+        """
+        Offsets of tokens starting in ``[start, end)``
+        """
+        lo = bisect.bisect_left(self.offsets, start)
+        hi = bisect.bisect_left(self.offsets, end, lo)
+        return self.offsets[lo:hi]
+
+    def first_from(self, offset: int, end: Optional[int] = None) -> Optional[str]:
+        """
+        Spelling of the first token starting in ``[offset, end)``
+        """
+        i = bisect.bisect_left(self.offsets, offset)
+        if i >= len(self.offsets) or (end is not None and self.offsets[i] >= end):
+            return None
+        return self.spellings[i]
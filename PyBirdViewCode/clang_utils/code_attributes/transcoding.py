@@ -0,0 +1,126 @@
+"""
+Transcode source files in legacy encodings, such as GB2312, to UTF-8 in
+memory, so they could be parsed without converting a copy of the files on
+disk by ``convert_encodings``.
+"""
+
+import codecs
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+#: The encoding of all files, or a function getting the encoding of a file from
+#: its path. None stands for UTF-8, i.e. no transcoding.
+EncodingPolicyType = Union[str, Callable[[str], Optional[str]], None]
+
+# Content digests of files indexed by (path, mtime_ns, size)
+_stat_digests: Dict[Tuple[str, int, int], str] = {}
+
+# UTF-8 contents indexed by (content digest, encoding, errors), None if the
+# file is the same in UTF-8. Files of the same content share one entry.
+_transcoded: "OrderedDict[Tuple[str, str, str], Optional[bytes]]" = OrderedDict()
+_MAX_TRANSCODED = 1024
+
+
+def resolve_encoding(file: str, policy: EncodingPolicyType) -> Optional[str]:
+    """
+    Get the encoding of ``file`` by ``policy``, or None if it needs no
+    transcoding.
+    """
+    if policy is None:
+        return None
+    encoding = policy(file) if callable(policy) else policy
+    if encoding is None or codecs.lookup(encoding).name == "utf-8":
+        return None
+    return encoding
+
+
+def transcode_file(
+    file: str, encoding: str, errors: str = "replace"
+) -> Optional[bytes]:
+    """
+    Get the content of ``file`` decoded from ``encoding`` and encoded in UTF-8,
+    or None if it is the same as the content on disk (e.g. ASCII files).
+
+    Results are cached by the digest of the file content, and the file is not
+    read again while its modification time and size are unchanged.
+
+    :errors: The same as in ``bytes.decode``
+    """
+    st = os.stat(file)
+    stat_key = (file, st.st_mtime_ns, st.st_size)
+    digest = _stat_digests.get(stat_key)
+    if digest is not None:
+        key = (digest, encoding, errors)
+        if key in _transcoded:
+            _transcoded.move_to_end(key)
+            return _transcoded[key]
+
+    with open(file, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    _stat_digests[stat_key] = digest
+    key = (digest, encoding, errors)
+    if key in _transcoded:
+        _transcoded.move_to_end(key)
+        return _transcoded[key]
+    content: Optional[bytes] = raw.decode(encoding, errors=errors).encode("utf8")
+    if content == raw:
+        content = None
+    _transcoded[key] = content
+    if len(_transcoded) > _MAX_TRANSCODED:
+        _transcoded.popitem(last=False)
+    return content
+
+
+def transcoded_unsaved_files(
+    files: Iterable[str], policy: EncodingPolicyType, errors: str = "replace"
+) -> List[Tuple[str, bytes]]:
+    """
+    Get the ``unsaved_files`` argument of libclang, holding UTF-8 contents of
+    ``files`` that need transcoding by ``policy``.
+    """
+    unsaved_files = []
+    for file in files:
+        encoding = resolve_encoding(file, policy)
+        if encoding is None:
+            continue
+        content = transcode_file(file, encoding, errors)
+        if content is not None:
+            unsaved_files.append((file, content))
+    return unsaved_files
+
+
+def read_source(
+    file: str, policy: EncodingPolicyType = None, errors: str = "replace"
+) -> str:
+    """
+    Read the text of ``file`` in the encoding given by ``policy``. If ``policy``
+    is None, the file is read in the default encoding of ``open``.
+    """
+    if policy is None:
+        with open(file, "r") as f:
+            return f.read()
+    encoding = resolve_encoding(file, policy)
+    content = transcode_file(file, encoding, errors) if encoding is not None else None
+    if content is None:
+        with open(file, "rb") as f:
+            content = f.read()
+    return content.decode("utf8", errors=errors)
+
+
+_default_encoding_policy: EncodingPolicyType = None
+
+
+def set_default_encoding_policy(policy: EncodingPolicyType):
+    """
+    Set the encoding policy used by ``parse_file`` and the UAST extractors when
+    no policy is passed explicitly. Pass None to disable transcoding.
+    """
+    global _default_encoding_policy
+    _default_encoding_policy = policy
+
+
+def get_default_encoding_policy() -> EncodingPolicyType:
+    return _default_encoding_policy
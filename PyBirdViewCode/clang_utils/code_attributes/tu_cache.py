@@ -0,0 +1,216 @@
+"""
+Content-addressed on-disk cache for Clang translation units.
+
+A parsed translation unit is serialized with ``TranslationUnit.save`` and
+loaded back through ``Index.read`` when neither the source file, the headers
+it includes, the compiler arguments nor the libclang version have changed.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from clang import cindex
+
+_LIBCLANG_VERSION: Optional[str] = None
+
+
+def libclang_version() -> str:
+    """
+    Get the version string of the loaded libclang, such as ``"clang version 16.0.6"``
+    """
+    global _LIBCLANG_VERSION
+    if _LIBCLANG_VERSION is None:
+        func = cindex.conf.lib.clang_getClangVersion
+        func.argtypes = []
+        func.restype = cindex._CXString
+        func.errcheck = cindex._CXString.from_result
+        _LIBCLANG_VERSION = func()
+    return _LIBCLANG_VERSION
+
+
+# Digests of files indexed by (path, mtime_ns, size), avoiding re-reading
+# unchanged headers that are shared by many translation units.
+_file_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_digest(path: str) -> Optional[str]:
+    """
+    Get the sha256 digest of a file's content. Return None if the file does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_mtime_ns, st.st_size)
+    digest = _file_digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _file_digests[key] = digest
+    return digest
+
+
+def _digest_of(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class TUCache:
+    """
+    Cache of serialized translation units inside ``cache_dir``.
+
+    For each (file, compiler arguments, libclang version) a small JSON manifest
+    records the digests of the included headers. The serialized AST is stored
+    under a digest combining all of them, so an edit to any header results in a
+    cache miss.
+
+    .. note:: Diagnostics are not serialized by libclang, so translation units
+        loaded from the cache carry no diagnostics.
+    """
+
+    def __init__(self, cache_dir: str = ".PyBirdViewCode/tu_cache") -> None:
+        self.cache_dir = os.path.abspath(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _manifest_path(self, manifest_key: str) -> str:
+        return os.path.join(self.cache_dir, manifest_key + ".json")
+
+    def _ast_path(self, ast_key: str) -> str:
+        return os.path.join(self.cache_dir, ast_key + ".ast")
+
+    def _manifest_key(
+        self, file: str, args: Sequence[str], options: int
+    ) -> Optional[str]:
+        digest = file_digest(file)
+        if digest is None:
+            return None
+        return _digest_of(libclang_version(), file, digest, str(options), *args)
+
+    @staticmethod
+    def _ast_key(manifest_key: str, includes: Dict[str, Optional[str]]) -> str:
+        return _digest_of(
+            manifest_key,
+            *(f"{path}:{digest}" for path, digest in sorted(includes.items())),
+        )
+
+    def lookup(
+        self, file: str, args: Sequence[str] = (), options: int = 0
+    ) -> Optional[str]:
+        """
+        Get the path of the serialized AST for ``file``, or None if it was not
+        cached or is out of date.
+        """
+        file = os.path.abspath(file)
+        manifest_key = self._manifest_key(file, args, options)
+        if manifest_key is None:
+            return None
+        manifest_path = self._manifest_path(manifest_key)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, "r") as f:
+                includes: Dict[str, Optional[str]] = json.load(f)["includes"]
+        except (OSError, ValueError, KeyError):
+            return None
+        for path, digest in includes.items():
+            if file_digest(path) != digest:
+                return None
+        ast_path = self._ast_path(self._ast_key(manifest_key, includes))
+        return ast_path if os.path.exists(ast_path) else None
+
+    def store(
+        self,
+        file: str,
+        args: Sequence[str],
+        tu: cindex.TranslationUnit,
+        options: int = 0,
+    ) -> Optional[str]:
+        """
+        Serialize the translation unit parsed from ``file`` with ``args`` and
+        parse ``options``.
+
+        :return: Path of the serialized AST, or None if libclang failed to save it.
+        """
+        file = os.path.abspath(file)
+        manifest_key = self._manifest_key(file, args, options)
+        if manifest_key is None:
+            return None
+        includes = {}
+        for inc in tu.get_includes():
+            path = os.path.abspath(inc.include.name)
+            includes[path] = file_digest(path)
+        ast_path = self._ast_path(self._ast_key(manifest_key, includes))
+        # Write to temporary files first, so that concurrent processes sharing
+        # one cache folder never observe a partially written entry.
+        tmp_suffix = f".{os.getpid()}.tmp"
+        try:
+            tu.save(ast_path + tmp_suffix)
+        except cindex.TranslationUnitSaveError:
+            return None
+        os.replace(ast_path + tmp_suffix, ast_path)
+        manifest_path = self._manifest_path(manifest_key)
+        with open(manifest_path + tmp_suffix, "w") as f:
+            json.dump({"file": file, "args": list(args), "includes": includes}, f)
+        os.replace(manifest_path + tmp_suffix, manifest_path)
+        return ast_path
+
+    def parse(
+        self,
+        file: str,
+        args: Optional[List[str]] = None,
+        index: Optional[cindex.Index] = None,
+        options: int = 0,
+    ) -> cindex.TranslationUnit:
+        """
+        Load the translation unit of ``file`` from cache, or parse and cache it.
+
+        :options: Bitwise-or of ``TranslationUnit.PARSE_*`` flags
+        """
+        args = list(args) if args is not None else []
+        index = index if index is not None else cindex.Index.create()
+        ast_path = self.lookup(file, args, options)
+        if ast_path is not None:
+            try:
+                tu = index.read(ast_path)
+                self.hits += 1
+                return tu
+            except cindex.TranslationUnitLoadError:
+                pass
+        self.misses += 1
+        tu = index.parse(file, args=args, options=options)
+        self.store(file, args, tu, options)
+        return tu
+
+    def clear(self):
+        """
+        Remove all cached entries
+        """
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+
+_default_tu_cache: Optional[TUCache] = None
+
+
+def set_default_tu_cache(cache: Optional[TUCache]):
+    """
+    Set the cache used by ``parse_file`` when no cache is passed explicitly.
+    Pass None to disable caching.
+    """
+    global _default_tu_cache
+    _default_tu_cache = cache
+
+
+def get_default_tu_cache() -> Optional[TUCache]:
+    return _default_tu_cache
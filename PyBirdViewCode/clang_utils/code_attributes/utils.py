@@ -1,42 +1,157 @@
+import contextlib
 import enum
 import json
 import os
 import sys
-from typing import Callable, Dict, Generator, List, Optional, Tuple, Union
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from clang import cindex
 
 from ...utils import MelodieGenerator
+from .cursor_index import get_cursor_index, in_macro_expansion
+from .pch import get_default_pch
+from .transcoding import (
+    EncodingPolicyType,
+    get_default_encoding_policy,
+    transcoded_unsaved_files,
+)
+from .tu_cache import TUCache, get_default_tu_cache
 
 CompilerArgsType = Union[List[str], Callable[[str], List[str]]]
 
+#: Parse options for extracting declarations only. Function bodies are skipped,
+#: so they contain no statements.
+SKELETON_PARSE_OPTIONS = (
+    cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
+    | cindex.TranslationUnit.PARSE_INCOMPLETE
+)
 
-def parse_file(file: str, args: CompilerArgsType = None) -> cindex.TranslationUnit:
+
+def resolve_compiler_args(file: str, args: CompilerArgsType = None) -> List[str]:
+    """
+    Get the concrete compiler arguments for ``file`` from ``args``
+    """
+    if args is None:
+        return []
+    elif isinstance(args, (list, tuple, set)):
+        return list(args)
+    elif callable(args):
+        return list(args(file))
+    else:
+        raise NotImplementedError(f"Cannot recognize args {args}")
+
+
+_shared_index: Optional[cindex.Index] = None
+
+
+@contextlib.contextmanager
+def reuse_index() -> Generator[cindex.Index, None, None]:
+    """
+    Within this context, ``parse_file`` parses all files with one shared
+    ``cindex.Index`` instead of creating a new one for each file.
+
+    .. code-block:: python
+
+        with reuse_index():
+            for file in files:
+                tu = parse_file(file, args)
+    """
+    global _shared_index
+    previous = _shared_index
+    if previous is None:
+        _shared_index = cindex.Index.create()
+    try:
+        yield _shared_index
+    finally:
+        _shared_index = previous
+
+
+def parse_file(
+    file: str,
+    args: CompilerArgsType = None,
+    cache: Optional[TUCache] = None,
+    options: int = 0,
+    encoding: EncodingPolicyType = None,
+) -> cindex.TranslationUnit:
     """
     Open a c/cpp file, and return the corresponding translation unit
 
     :file: Name of file
     :args: Arguments to be passed into clang compiler, such as
         ``['-xc++', '-std=c++11']`` to analyse C++ 11 file.
+    :cache: The ``TUCache`` to load the translation unit from. If None, the cache
+        set by ``set_default_tu_cache`` is used, and when there is no default cache,
+        the file is always parsed from scratch.
+    :options: Bitwise-or of ``cindex.TranslationUnit.PARSE_*`` flags, such as
+        ``SKELETON_PARSE_OPTIONS``.
+    :encoding: Encoding of the file and the headers it includes, such as
+        ``"gb2312"``, or a function getting the encoding from the path. Files
+        not in UTF-8 are transcoded in memory and passed to libclang as unsaved
+        files. If None, the policy set by ``set_default_encoding_policy`` is
+        used. Transcoded translation units are not cached by ``cache``.
+
+    If a ``PrecompiledHeader`` is set by ``set_default_pch`` and applies to the
+    file, it is loaded instead of parsing its headers again.
     """
     if not os.path.exists(file):
         raise FileNotFoundError(file)
-    index = cindex.Index.create()
-
-    if args is None:
-        return index.parse(file)
-    elif isinstance(args, (list, tuple, set)):
-        return index.parse(file, args=args)
-    elif callable(args):
-        return index.parse(file, args=args(file))
-    else:
-        raise NotImplementedError(f"Cannot recognize args {args}")
+    compiler_args = resolve_compiler_args(file, args)
+    pch = get_default_pch()
+    if pch is not None and pch.applies_to(file, compiler_args):
+        compiler_args = compiler_args + pch.compiler_args()
+    index = _shared_index if _shared_index is not None else cindex.Index.create()
+    encoding = encoding if encoding is not None else get_default_encoding_policy()
+    if encoding is not None:
+        return _parse_transcoded(index, file, compiler_args, options, encoding)
+    cache = cache if cache is not None else get_default_tu_cache()
+    if cache is not None:
+        return cache.parse(file, compiler_args, index, options)
+    return index.parse(file, args=compiler_args, options=options)
+
+
+def _parse_transcoded(
+    index: cindex.Index,
+    file: str,
+    compiler_args: List[str],
+    options: int,
+    encoding: EncodingPolicyType,
+) -> cindex.TranslationUnit:
+    unsaved_files = transcoded_unsaved_files([file], encoding)
+    tu = index.parse(
+        file, args=compiler_args, unsaved_files=unsaved_files, options=options
+    )
+    # Headers are only known after parsing, so reparse if any of them needs
+    # transcoding. Most headers are ASCII, which needs no reparse.
+    transcoded = {name for name, _ in unsaved_files}
+    includes = dict.fromkeys(
+        inc.include.name
+        for inc in tu.get_includes()
+        if inc.include.name not in transcoded
+    )
+    headers = transcoded_unsaved_files(includes, encoding)
+    if len(headers) > 0:
+        tu.reparse(unsaved_files=unsaved_files + headers)
+    return tu
 
 
 def get_func_decl(node: cindex.Cursor, func_name: str) -> Optional[cindex.Cursor]:
     """
     Get the function named `func_name` from Clang AST. If not exist, return None.
     """
+    if node.kind == cindex.CursorKind.TRANSLATION_UNIT:
+        return get_cursor_index(node).top_level_named(
+            cindex.CursorKind.FUNCTION_DECL, func_name
+        )
     for node in node.get_children():
         if node.kind == cindex.CursorKind.FUNCTION_DECL:
             if node.spelling == func_name:
@@ -49,12 +164,10 @@ def is_function_definition(node: cindex.Cursor) -> bool:
     Tell if this ``FUNCTION_DECL`` is definition (or only a declaration).
     """
     assert node.kind == cindex.CursorKind.FUNCTION_DECL
-    child: cindex.Cursor
-    is_definition = False
-    for child in node.get_children():
-        if child.kind == cindex.CursorKind.COMPOUND_STMT:
-            is_definition = True
-    return is_definition
+    return any(
+        child.kind == cindex.CursorKind.COMPOUND_STMT
+        for child in get_cursor_index(node).children(node)
+    )
 
 
 def get_func_decl_all(
@@ -85,6 +198,20 @@ class TraversalContext:
 
     def __init__(self) -> None:
         self.hierarchy: List[cindex.Cursor] = []
+        self._skip_children = False
+
+    @property
+    def depth(self) -> int:
+        """
+        Depth of the current node, 0 for the node where the traversal starts
+        """
+        return len(self.hierarchy) - 1
+
+    def skip_children(self):
+        """
+        Do not traverse into the children of the current node
+        """
+        self._skip_children = True
 
     def print_hierarchy(self):
         print([c.kind for c in self.hierarchy])
@@ -144,60 +271,109 @@ class TraversalContext:
         return len(self.hierarchy)
 
 
-TraversalCallbackType = Callable[[TraversalContext], None]
+class TraversalAction(enum.Enum):
+    """
+    Returned by traversal callbacks to control the traversal. Returning None is
+    the same as ``CONTINUE``.
+
+    * CONTINUE: Traverse into the children of the current node
+    * SKIP_CHILDREN: Skip the children of the current node, which are never
+      fetched from libclang
+    * STOP: Stop the whole traversal
+    """
+
+    CONTINUE = "continue"
+    SKIP_CHILDREN = "skip_children"
+    STOP = "stop"
+
 
+TraversalCallbackType = Callable[[TraversalContext], Optional[TraversalAction]]
 
-def _traversal_with_callback(
-    node: cindex.Cursor, ctx: TraversalContext, func: TraversalCallbackType
-) -> None:
-    for subnode in node.get_children():
-        ctx._push(subnode)
-        func(ctx)
-        _traversal_with_callback(subnode, ctx, func)
+
+def _iter_traversal(
+    node: cindex.Cursor,
+    ctx: TraversalContext,
+    max_depth: Optional[int] = None,
+    leave: Optional[TraversalCallbackType] = None,
+) -> Generator[TraversalContext, None, None]:
+    # Traverse with an explicit stack of children iterators instead of
+    # recursion, so deeply nested code never reaches the recursion limit.
+    # `ctx` is yielded on entering each node, and the consumer could call
+    # `ctx.skip_children()` before resuming.
+    ctx._push(node)
+    ctx._skip_children = False
+    yield ctx
+    if ctx._skip_children or max_depth == 0:
+        if leave is not None:
+            leave(ctx)
         ctx._pop()
-    return
+        return
+    stack = [node.get_children()]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            if leave is not None:
+                leave(ctx)
+            ctx._pop()
+            continue
+        ctx._push(child)
+        ctx._skip_children = False
+        yield ctx
+        if ctx._skip_children or (max_depth is not None and len(stack) >= max_depth):
+            if leave is not None:
+                leave(ctx)
+            ctx._pop()
+        else:
+            stack.append(child.get_children())
 
 
-def traversal_with_callback(node: cindex.Cursor, func: TraversalCallbackType):
+def traversal_with_callback(
+    node: cindex.Cursor,
+    func: Union[TraversalCallbackType, Dict[cindex.CursorKind, TraversalCallbackType]],
+    leave: Optional[TraversalCallbackType] = None,
+    max_depth: Optional[int] = None,
+):
     """
     Traverse the AST and for each node call `func` with callback
+
+    :func: Called on entering each node (pre-order). Could also be a dict
+        from ``CursorKind`` to callbacks, so each callback is only called on
+        the nodes of its kind. Callbacks could return a ``TraversalAction``
+        to skip the children of the current node or to stop.
+    :leave: Called on leaving each node (post-order), after its children
+    :max_depth: If provided, nodes deeper than ``max_depth`` are not traversed
     """
     ctx = TraversalContext()
-    ctx._push(node)
-    func(ctx)
-    _traversal_with_callback(node, ctx, func)
-    ctx._pop()
-
-
-def _traversal(
-    node: cindex.Cursor, ctx: TraversalContext
-) -> Generator[TraversalContext, None, None]:
-    for subnode in node.get_children():
-        ctx._push(subnode)
-        yield ctx
-        yield from _traversal(subnode, ctx)
-        ctx._pop()
-    return
+    for ctx in _iter_traversal(node, ctx, max_depth, leave):
+        if isinstance(func, dict):
+            callback = func.get(ctx.current_node.kind)
+            if callback is None:
+                continue
+            action = callback(ctx)
+        else:
+            action = func(ctx)
+        if action == TraversalAction.SKIP_CHILDREN:
+            ctx.skip_children()
+        elif action == TraversalAction.STOP:
+            break
 
 
 def traversal(
-    node: cindex.Cursor,
+    node: cindex.Cursor, max_depth: Optional[int] = None
 ) -> MelodieGenerator[TraversalContext]:
     """
     Traverse the AST and for each node, returning a ``TraversalContext``.
 
     Unlike ``Cursor.walk_preorder()``, TraversalContext also contains hierarchical information
     in which block or branch the ``Cursor`` is.
-    """
 
-    def _(node):
-        ctx = TraversalContext()
-        ctx._push(node)
-        yield ctx
-        yield from _traversal(node, ctx)
-        ctx._pop()
+    Call ``ctx.skip_children()`` on a yielded context to skip the children of
+    its current node.
 
-    return MelodieGenerator(_(node))
+    :max_depth: If provided, nodes deeper than ``max_depth`` are not traversed
+    """
+    return MelodieGenerator(_iter_traversal(node, TraversalContext(), max_depth))
 
 
 def iter_ast(node: cindex.Cursor) -> MelodieGenerator[cindex.Cursor]:
@@ -221,6 +397,28 @@ def iter_ast_from_file(
     return iter_ast(node)
 
 
+def get_token_spellings(node: cindex.Cursor) -> List[str]:
+    """
+    Get the spellings of all tokens of ``node``, looked up from the token
+    index of the translation unit instead of tokenizing ``node`` again.
+    """
+    return get_cursor_index(node).token_spellings(node)
+
+
+def _token_after(parent: cindex.Cursor, node: cindex.Cursor) -> str:
+    # The first token after `node` in `parent`, such as the operator after the
+    # left operand
+    if in_macro_expansion(parent.location):
+        # The operator is spelled in a macro, whose tokens are not located by
+        # offsets, but both token lists begin where the macro is spelled
+        n_tokens = len(list(node.get_tokens()))
+        return list(parent.get_tokens())[n_tokens].spelling
+    tokens, _, end = get_cursor_index(node).token_span(node)
+    symbol = tokens.first_from(end)
+    assert symbol is not None, f"No token after {node.kind} {node.spelling}"
+    return symbol
+
+
 def split_binary_operator(
     node: cindex.Cursor,
 ) -> Tuple[cindex.Cursor, str, cindex.Cursor]:
@@ -240,7 +438,7 @@ def split_binary_operator(
     assert node.kind == cindex.CursorKind.BINARY_OPERATOR, node.kind
     children_iterator = node.get_children()
     left = next(children_iterator)
-    symbol = list(node.get_tokens())[len(list(left.get_tokens()))].spelling
+    symbol = _token_after(node, left)
     right = next(children_iterator)
     return left, symbol, right
 
@@ -253,12 +451,7 @@ def split_compound_assignment(
 
     """
     l_value_ast, r_value_ast = list(cursor.get_children())
-    lvalue_length = len(list(l_value_ast.get_tokens()))
-    token: cindex.Token
-    for i, token in enumerate(cursor.get_tokens()):
-        if i == lvalue_length:
-            break
-    op = token.spelling
+    op = _token_after(cursor, l_value_ast)
     return l_value_ast, op, r_value_ast
 
 
@@ -274,13 +467,15 @@ def split_for_loop_conditions(
     Split for loop conditions to handle omitted conditions.
     """
     splitter_positions: List[int] = []
-    for tok in node.get_tokens():
-        if tok.spelling == ";":
-            loc: cindex.SourceLocation = tok.location
-            splitter_positions.append(loc.offset)
+    tokens, start, end = get_cursor_index(node).token_span(node)
+    for spelling, offset in zip(
+        tokens.spellings_between(start, end), tokens.offsets_between(start, end)
+    ):
+        if spelling == ";":
+            splitter_positions.append(offset)
         if len(splitter_positions) >= 2:
-            if tok.spelling == ")":
-                splitter_positions.append(tok.location.offset)
+            if spelling == ")":
+                splitter_positions.append(offset)
                 break
     assert len(splitter_positions) == 3, splitter_positions
     parts: List[Optional[cindex.Cursor]] = [None, None, None, None]
@@ -318,13 +513,23 @@ def split_unary_operator(
     :return: A tuple, (Unary Operator, operated expression, operator is before/after expression)
     """
     assert node.kind == cindex.CursorKind.UNARY_OPERATOR, node.kind
-    node_tokens = "".join([t.spelling for t in node.get_tokens()])
     child = next(node.get_children())
-    child_tokens = "".join([t.spelling for t in child.get_tokens()])
-    if node_tokens.startswith(child_tokens):  # unary operator is after child expression
-        return node_tokens[len(child_tokens) :], child, UnaryOpPos.AFTER
-    else:
+    if in_macro_expansion(node.location):
+        # The operator is spelled in a macro, see `_token_after`
+        node_tokens = "".join([t.spelling for t in node.get_tokens()])
+        child_tokens = "".join([t.spelling for t in child.get_tokens()])
+        if node_tokens.startswith(child_tokens):
+            return node_tokens[len(child_tokens) :], child, UnaryOpPos.AFTER
         return node_tokens[: -len(child_tokens)], child, UnaryOpPos.BEFORE
+    index = get_cursor_index(node)
+    tokens, node_start, node_end = index.token_span(node)
+    _, child_start, child_end = index.token_span(child)
+    if child_start == node_start:  # unary operator is after child expression
+        op = "".join(tokens.spellings_between(child_end, node_end))
+        return op, child, UnaryOpPos.AFTER
+    else:
+        op = "".join(tokens.spellings_between(node_start, child_start))
+        return op, child, UnaryOpPos.BEFORE
 
 
 def get_compound_assignment_operator(node: cindex.Cursor) -> str:
@@ -334,39 +539,83 @@ def get_compound_assignment_operator(node: cindex.Cursor) -> str:
     assert node.kind == cindex.CursorKind.COMPOUND_ASSIGNMENT_OPERATOR, node.kind
 
     left = next(node.get_children())
-    symbol = list(node.get_tokens())[len(list(left.get_tokens()))].spelling
-    return symbol
+    return _token_after(node, left)
+
+
+FileTypesType = Union[str, Tuple[str, ...], Callable[[str], bool]]
+
+
+def _file_name_filter(filetypes: FileTypesType) -> Callable[[str], bool]:
+    if callable(filetypes):
+        return filetypes
+    if filetypes != "":
+        return lambda s: s.endswith(filetypes)
+    return lambda s: True
+
+
+def scan_files(folder: str, filetypes: FileTypesType = "") -> Iterator[os.DirEntry]:
+    """
+    Iterate ``os.DirEntry`` of all files inside the folder in the order of
+    ``os.walk``. The entries carry their ``stat()`` results, so callers
+    checking modification times need no extra system calls on most platforms.
+
+    :filetypes: Suffixes of the file names, or a filter on the file names
+    """
+    filter_func = _file_name_filter(filetypes)
+    stack = [folder]
+    while stack:
+        subfolders = []
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                # Like `os.walk`, symbolic links to folders are not followed
+                if not entry.is_symlink():
+                    subfolders.append(entry.path)
+            elif filter_func(entry.name):
+                yield entry
+        stack.extend(reversed(subfolders))
 
 
 def iter_files(
     folder: str,
-    filetypes: Union[str, Tuple[str], Callable[[str], bool]] = "",
+    filetypes: FileTypesType = "",
     abspath=True,
 ) -> MelodieGenerator[str]:
     """
     Iterate all files inside the folder.
     """
-    if not callable(filetypes):
-        if filetypes != "":
-
-            def filter_func(s: str):
-                return s.endswith(filetypes)
-
-        else:
+    return MelodieGenerator(
+        entry.path if abspath else entry.name for entry in scan_files(folder, filetypes)
+    )
 
-            def filter_func(s):
-                return True
 
-    else:
-        filter_func = filetypes
-
-    def _():
-        for root, _, files in os.walk(folder):
-            for file in files:
-                if filter_func(file):
-                    yield os.path.join(root, file) if abspath else file
+def expand_files(
+    files: Union[str, Iterable[str]],
+    name_filter: Optional[Callable[[str], bool]] = None,
+) -> MelodieGenerator[str]:
+    """
+    Get the files to analyse from either a folder or an iterable of file names.
 
-    return MelodieGenerator(_())
+    :files: A folder, which is walked recursively, or an iterable of files,
+        such as the ``ChangeSet`` of a ``FileManifest`` to analyse only the
+        files changed since the last run.
+    :name_filter: If provided, only the files with ``name_filter(abspath) == True``
+        are kept.
+    """
+    if isinstance(files, str):
+        assert os.path.isdir(files), f"{files} is not a folder"
+        files = iter_files(files)
+    if name_filter is None:
+        return MelodieGenerator(files)
+    return MelodieGenerator(files).filter(name_filter)
 
 
 def is_literal_kind(node: cindex.Cursor):
@@ -383,11 +632,8 @@ def is_literal_kind(node: cindex.Cursor):
 def extract_literal_value(node: cindex.Cursor) -> Optional[str]:
     for node in node.walk_preorder():
         if is_literal_kind(node):
-            tokens = list(node.get_tokens())
-            if len(tokens) >= 1:
-                return tokens[0].spelling
-            else:
-                return None
+            spellings = get_cursor_index(node).token_spellings(node)
+            return spellings[0] if len(spellings) > 0 else None
 
 
 class ASTExtractor:
@@ -496,8 +742,7 @@ def beautified_print_ast(node: cindex.Cursor, filename=""):
 
 
 def print_tokens(node: cindex.Cursor) -> str:
-    tokens = (token.spelling for token in node.get_tokens())
-    return " ".join(tokens)
+    return " ".join(get_token_spellings(node))
 
 
 # def get_file_and_line(node: cindex.Cursor)->Tuple[str, int, int]:
@@ -16,4 +16,14 @@ from .universal_code_property_graphs import (
     CodePropertyGraphs,
 )
 from .builtin_converters import *
-from .uast_commands import get_file_uast, get_method_cpg, extract_cfg_from_method
+from .uast_commands import (
+    get_file_uast,
+    iter_file_declarations,
+    get_method_cpg,
+    extract_cfg_from_method,
+    ingest_file_uasts,
+)
+from .uast_session import ClangUASTSession
+from .uast_binary import UASTReader, dump_uast, dumps_uast, load_uast
+from .uast_dedupe import StructuralDeduplicator, group_identical
+from .uast_cache import UASTCache, get_default_uast_cache, set_default_uast_cache
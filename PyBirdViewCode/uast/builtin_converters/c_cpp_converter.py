@@ -4,11 +4,14 @@ Evaluate AST generated by libclang.
 The evaluation input can be either concrete value or z3 symbolic variable.
 """
 
+import collections
+import functools
 from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
     Dict,
+    Iterator,
     List,
     Literal,
     Optional,
@@ -35,6 +38,7 @@ from PyBirdViewCode.clang_utils.code_attributes.extract_data_structure import (
 from PyBirdViewCode.clang_utils.code_attributes import (
     UnaryOpPos,
     extract_literal_value,
+    get_token_spellings,
     split_binary_operator,
     split_for_loop_conditions,
     split_unary_operator,
@@ -43,7 +47,10 @@ from PyBirdViewCode.clang_utils.code_attributes import (
     is_function_definition,
     beautified_print_ast,
     parse_file,
+    EncodingPolicyType,
+    get_cursor_index,
 )
+from PyBirdViewCode.clang_utils.code_attributes.tu_cache import libclang_version
 from PyBirdViewCode.utils import MelodieGenerator
 from PyBirdViewCode.uast import (
     universal_ast_nodes as nodes,
@@ -87,8 +94,13 @@ class LabelDesc(TypedDict):
 
 
 class ClangASTExtractor(BaseASTExtractor):
-    def __init__(self, file: str, extra_args: List[str]) -> None:
-        super().__init__(file, extra_args)
+    def __init__(
+        self,
+        file: str,
+        extra_args: List[str],
+        encoding: EncodingPolicyType = None,
+    ) -> None:
+        super().__init__(file, extra_args, encoding)
 
     @classmethod
     def supported_file_types(cls) -> List[str]:
@@ -98,10 +110,17 @@ class ClangASTExtractor(BaseASTExtractor):
         """
         调用Libclang，抽取Clang AST
         """
-        tu = parse_file(self.file)
+        tu = parse_file(self.file, self.extra_args, encoding=self.encoding)
         cursor = tu.cursor
         return (cursor, {}), list(tu.diagnostics)
 
+    @classmethod
+    def tool_version(cls) -> str:
+        return libclang_version()
+
+    def dependencies(self, ast: Cursor) -> List[str]:
+        return [inc.include.name for inc in ast.translation_unit.get_includes()]
+
 
 class ClangASTConverter(BaseUASTConverter):
     def __init__(self, **kwargs) -> None:
@@ -276,6 +295,31 @@ class ClangASTConverter(BaseUASTConverter):
         """
         return self.eval(original_ast)
 
+    def iter_top_level(self, original_ast: Cursor) -> Iterator[nodes.SourceElement]:
+        """
+        逐个转换翻译单元的顶层声明。``source_location_filter``在转换前作用于游标
+
+        每次只对当前声明到下一个声明之间的源码做词法分析，不保留整个文件的词法单元
+        """
+        index = get_cursor_index(original_ast)
+        # 使用新的游标对象并在转换后丢弃，因为libclang会在游标对象上缓存位置、类型等
+        pending = collections.deque(original_ast.get_children())
+        while len(pending) > 0:
+            child = pending.popleft()
+            if self.source_location_filter is not None and (
+                not self.source_location_filter(child)
+            ):
+                continue
+            # 词法分析到下一个声明为止（若在同一文件中）
+            next_start: Optional[int] = None
+            file = child.extent.start.file
+            if file is not None and len(pending) > 0:
+                start = pending[0].extent.start
+                if start.file is not None and start.file.name == file.name:
+                    next_start = start.offset
+            index.restrict_tokens(child, next_start)
+            yield self.eval_single_cursor(child)
+
     def convert_type(self, t: CindexType) -> nodes.DATA_TYPE:
         if 4 <= t.kind.value <= 20:
             return self.integer_types_mapping.get(t.kind, nodes.UnknownType(t.spelling))
@@ -348,7 +392,7 @@ class ClangASTConverter(BaseUASTConverter):
         return nodes.InstanceCreationExpr(cursor.type.spelling, [])
 
     def _handle_cxx_access_spec_decl(self, cursor: Cursor) -> nodes.AccessSpecfier:
-        tokens = [t.spelling for t in cursor.get_tokens()]
+        tokens = get_token_spellings(cursor)
         assert tokens[0] in ("public", "private", "protected")
         return nodes.AccessSpecfier(tokens[0])
 
@@ -372,7 +416,13 @@ class ClangASTConverter(BaseUASTConverter):
         body_cursor = get_cursor_child(
             cursor, lambda c: c.kind == CursorKind.COMPOUND_STMT
         )
-        body_ast = self.eval_single_cursor_if_not_none(body_cursor)
+        if self.lazy and body_cursor is not None:
+            # 游标引用翻译单元，翻译单元在所有函数体都转换后才会释放
+            body_ast = nodes.LazyValue(
+                functools.partial(self.eval_single_cursor, body_cursor)
+            )
+        else:
+            body_ast = self.eval_single_cursor_if_not_none(body_cursor)
         return_type = self.convert_type(cursor.type.get_result())
         return nodes.MethodDecl(
             nodes.Name(cursor.spelling),
@@ -529,9 +579,7 @@ class ClangASTConverter(BaseUASTConverter):
         return nodes.CallExpr(callee_value, arg_values)
 
     def _handle_cxx_unary_expr(self, cursor: Cursor) -> nodes.SpecialExpr:
-        tokens = [
-            t.spelling for t in cursor.get_tokens() if t.spelling not in ("(", ")")
-        ]
+        tokens = [t for t in get_token_spellings(cursor) if t not in ("(", ")")]
 
         # handle sizeof
         if tokens[0] == "sizeof":
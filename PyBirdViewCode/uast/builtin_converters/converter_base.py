@@ -1,16 +1,33 @@
 import uuid
 from abc import ABCMeta, abstractmethod
-from typing import Any, Type
+from typing import Any, Callable, Iterator, Optional, Type
 from PyBirdViewCode import uast
+from PyBirdViewCode.clang_utils.code_attributes.transcoding import (
+    EncodingPolicyType,
+    get_default_encoding_policy,
+)
 
 
 class BaseASTExtractor(metaclass=ABCMeta):
     """Base class for loading programming language file
     and convert it to AST"""
 
-    def __init__(self, file: str, extra_args: list[str]) -> None:
+    def __init__(
+        self,
+        file: str,
+        extra_args: list[str],
+        encoding: EncodingPolicyType = None,
+    ) -> None:
+        """
+        :encoding: 代码文件的编码方式，如``"gb2312"``，或者以文件名为参数、返回编码方式的函数。
+            非UTF-8编码的文件在内存中转码，无需事先调用``convert_encodings``。
+            为None时，使用``set_default_encoding_policy``设置的编码方式
+        """
         self.file = file
         self.extra_args = extra_args
+        self.encoding = (
+            encoding if encoding is not None else get_default_encoding_policy()
+        )
 
     @classmethod
     @abstractmethod
@@ -33,10 +50,37 @@ class BaseASTExtractor(metaclass=ABCMeta):
         """
         pass
 
+    @classmethod
+    def tool_version(cls) -> str:
+        """
+        抽取AST所用工具的版本，如libclang的版本。版本变化时，缓存的UAST失效
+
+        :return: 版本字符串，没有外部工具时为空字符串
+        """
+        return ""
+
+    def dependencies(self, ast: Any) -> list[str]:
+        """
+        抽取AST时，除代码文件本身以外读取的文件，如C/C++代码包含的头文件。
+        这些文件变化时，缓存的UAST失效
+
+        :ast: ``extract_ast``抽取的AST对象
+        """
+        return []
+
 
 class BaseUASTConverter(metaclass=ABCMeta):
     """Base converter class from original AST to UAST"""
 
+    # 转换结果的版本，修改转换方式后须递增，使缓存的UAST失效
+    version: int = 1
+    # 为True时，临时变量名由计数器生成，同一份代码总是转换为相同的UAST
+    deterministic: bool = False
+    # 为True时，函数体在首次访问时才转换（见``LazyValue``），不支持的转换器忽略此项
+    lazy: bool = False
+    # 以原始AST的节点为参数，返回False的节点及其子节点不转换
+    source_location_filter: Optional[Callable[[Any], bool]] = None
+
     def __init__(self, **kwargs) -> None:
         pass
 
@@ -55,5 +99,23 @@ class BaseUASTConverter(metaclass=ABCMeta):
         """将某个语言的AST转换为UAST"""
         pass
 
+    def iter_top_level(self, original_ast: Any) -> Iterator[uast.SourceElement]:
+        """
+        逐个转换并产生顶层声明的UAST，不建立整个``CompilationUnit``
+
+        默认实现转换整个AST后再逐个产生，支持的转换器应重写为逐个转换
+        """
+        yield from self.convert_to_uast(original_ast).children
+
     def create_temporary_variable_name(self, prefix: str) -> str:
-        return prefix + str(uuid.uuid4())[:5]
+        """
+        生成转换时引入的临时变量名
+
+        :prefix: 变量名前缀
+        """
+        if not self.deterministic:
+            return prefix + str(uuid.uuid4())[:5]
+        # 子类的__init__未必调用基类的__init__，故计数器在此处初始化
+        count = getattr(self, "_temporary_variable_count", 0)
+        self._temporary_variable_count = count + 1
+        return f"{prefix}{count}"
@@ -1,11 +1,12 @@
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, Literal, Optional, Union, Type
+from typing import Any, Callable, Dict, Iterator, Literal, Optional, Union, Type
 import warnings
 import parso
 from parso.tree import NodeOrLeaf
 from parso.python.tree import PythonNode, Operator
 import parso.python.tree as parso_tree
 from PyBirdViewCode.uast import universal_ast_nodes as nodes
+from PyBirdViewCode.clang_utils.code_attributes.transcoding import read_source
 from .converter_base import BaseASTExtractor, BaseUASTConverter
 import ast
 from inspect import isclass
@@ -23,16 +24,15 @@ class ParsoASTExtractor(BaseASTExtractor):
         return [".py", ".pyi"]
 
     def extract_ast(self) -> tuple[tuple[ast.AST, dict], list[str]]:
-        with open(self.file, "r") as f:
-            file_content = f.read()
-            module: ast.AST = ast.parse(file_content)
-            globals_to_exec = {}
-            exec(file_content, globals_to_exec)
-            # import pdb;pdb.set_trace()
-            return (
-                module,
-                {"classes_names": extract_classes(globals_to_exec)},
-            ), []
+        file_content = read_source(self.file, self.encoding)
+        module: ast.AST = ast.parse(file_content)
+        globals_to_exec = {}
+        exec(file_content, globals_to_exec)
+        # import pdb;pdb.set_trace()
+        return (
+            module,
+            {"classes_names": extract_classes(globals_to_exec)},
+        ), []
 
 
 @dataclass
@@ -229,6 +229,21 @@ class ParsoASTConverter(BaseUASTConverter):
         """将某个语言的AST转换为UAST"""
         return self.eval(original_ast)
 
+    def iter_top_level(self, original_ast: ast.Module) -> Iterator[nodes.SourceElement]:
+        """
+        逐个转换模块的顶层语句。``source_location_filter``在转换前作用于语句的AST节点
+        """
+        for child in self._top_level_statements(original_ast):
+            yield self.eval(child)
+
+    def _top_level_statements(self, module: ast.Module) -> Iterator[ast.stmt]:
+        for child in module.body:
+            if self.source_location_filter is not None and (
+                not self.source_location_filter(child)
+            ):
+                continue
+            yield child
+
     def _handle_unary_op(self, expr: ast.UnaryOp) -> nodes.UnaryExpr:
         mapping = {ast.Not: ("!", True)}
         op, op_before_expr = mapping[type(expr.op)]
@@ -327,7 +342,9 @@ class ParsoASTConverter(BaseUASTConverter):
         return nodes.ImportDecl(name=name, path=".")
 
     def _handle_module(self, c: ast.Module) -> nodes.CompilationUnit:
-        return nodes.CompilationUnit([self.eval(child) for child in c.body])
+        return nodes.CompilationUnit(
+            [self.eval(child) for child in self._top_level_statements(c)]
+        )
 
     def _handle_keyword(self, c: parso_tree.ReturnStmt) -> nodes.ReturnStmt:
         if c.value == "return":
@@ -3,9 +3,9 @@ Storing information about the program
 """
 
 import collections
-from typing import Dict, Optional
+from typing import Dict, Optional, Set, Tuple
 
-from clang.cindex import Cursor
+from clang.cindex import Cursor, CursorKind
 
 from ..utils import MelodieFrozenGenerator
 from ..clang_utils.code_attributes import (
@@ -13,21 +13,81 @@ from ..clang_utils.code_attributes import (
     FieldDefModel,
     FunctionDefModel,
     StructDefModel,
+    SymbolIndex,
 )
 from .models import StructValue, Variable
 
+# Layout of a type: None for scalar types, or (field name, field layout) pairs
+# in the order of fields for structs.
+_Layout = Optional[Tuple[Tuple[str, "_Layout"], ...]]
+
+
+def _instantiate(layout: _Layout) -> Variable:
+    if layout is None:
+        return Variable(None)
+    fields: collections.OrderedDict[str, Variable] = collections.OrderedDict()
+    for name, field_layout in layout:
+        fields[name] = _instantiate(field_layout)
+    return Variable(StructValue(fields))
+
 
 class ProgramInfo:
+    """
+    Functions and data structures of the program.
+
+    :structures: Models of the program, looked up by name.
+    :symbol_index: If provided, definitions not in ``structures`` are looked
+        up from the project symbol index.
+    """
+
     def __init__(
         self,
         functions: Dict[str, Cursor],
         structures: Optional[MelodieFrozenGenerator[DefModel]] = None,
+        symbol_index: Optional[SymbolIndex] = None,
     ) -> None:
         self.functions = functions
-        self.structures = structures if structures else MelodieFrozenGenerator([])
+        self.symbol_index = symbol_index
+        self.structures = structures
+
+    @property
+    def structures(self) -> MelodieFrozenGenerator[DefModel]:
+        return self._structures
+
+    @structures.setter
+    def structures(self, structures: Optional[MelodieFrozenGenerator[DefModel]]):
+        # Replacing the structures invalidates all lookups derived from them
+        self._structures = structures if structures else MelodieFrozenGenerator([])
+        self._by_name: Dict[str, DefModel] = {}
+        self._structs_by_name: Dict[str, StructDefModel] = {}
+        for structure in self._structures:
+            self._by_name.setdefault(structure.spelling, structure)
+            if isinstance(structure, StructDefModel):
+                self._structs_by_name.setdefault(structure.spelling, structure)
+        self.invalidate_layouts()
+
+    def invalidate_layouts(self):
+        """
+        Drop the compiled struct layouts, which should be called if the
+        structure models or the symbol index are modified in place.
+        """
+        self._layouts: Dict[str, _Layout] = {}
+
+    def _find_in_symbol_index(
+        self, name: str, kind: Optional[CursorKind] = None
+    ) -> Optional[DefModel]:
+        if self.symbol_index is None:
+            return None
+        record = self.symbol_index.find_definition(name, kind)
+        return record.model if record is not None else None
 
     def get_function_structure(self, name: str) -> FunctionDefModel:
-        structure = self.structures.filter(lambda x: x.spelling == name).head()
+        structure = self._by_name.get(name)
+        if structure is None:
+            structure = self._find_in_symbol_index(name, CursorKind.FUNCTION_DECL)
+        if structure is None:
+            # The same as `head()` on an empty generator
+            raise StopIteration(name)
         return structure
 
     def get_function_ast(self, name: str) -> Cursor:
@@ -42,26 +102,39 @@ class ProgramInfo:
     #     """
     #     return self.structures.filter(lambda x: x.spelling == name).head().type
 
-    def allocate_memory(self, type_name: str) -> Variable:
-        """
-        Allocate struct by name
-        """
+    def _compile_layout(self, type_name: str, compiling: Set[str]) -> _Layout:
+        layout = self._layouts.get(type_name)
+        if layout is not None:
+            return layout
         # For standard types
         if type_name in ("int", "unsigned int", "float", "double"):
-            return Variable(None)
+            layout = None
         # For Non-standard Types
         else:
-            try:
-                stru_def: StructDefModel = self.structures.filter(
-                    lambda x: isinstance(x, (StructDefModel,))
-                    and x.spelling == type_name
-                ).head()
-            except StopIteration:
+            if type_name in compiling:
+                raise Exception(f"Type '{type_name}' contains itself")
+            stru_def = self._structs_by_name.get(type_name)
+            if stru_def is None:
+                stru_def = self._find_in_symbol_index(type_name, CursorKind.STRUCT_DECL)
+            if not isinstance(stru_def, StructDefModel):
                 raise Exception(f"Cannot handle type '{type_name}'")
-            fields: collections.OrderedDict[str, Variable] = collections.OrderedDict()
-            for field in stru_def.fields:
-                if isinstance(field, FieldDefModel):
-                    fields[field.spelling] = self.allocate_memory(field.type.spelling)
-            return Variable(StructValue(fields))
+            compiling.add(type_name)
+            layout = tuple(
+                (field.spelling, self._compile_layout(field.type.spelling, compiling))
+                for field in stru_def.fields
+                if isinstance(field, FieldDefModel)
+            )
+            compiling.discard(type_name)
             # elif isinstance(field.type, ArrayType):
             #     self.allocate_memory(field.type.element_type.spelling)
+        self._layouts[type_name] = layout
+        return layout
+
+    def allocate_memory(self, type_name: str) -> Variable:
+        """
+        Allocate struct by name
+
+        The field tree of each type is compiled once into a layout, and each
+        call only instantiates new variables from the layout.
+        """
+        return _instantiate(self._compile_layout(type_name, set()))
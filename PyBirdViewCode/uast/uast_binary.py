@@ -0,0 +1,559 @@
+"""
+Compact binary format of UASTs, written as a stream and read from a memory
+map, where any subtree could be decoded without decoding the rest.
+
+Layout of a file::
+
+    header      b"UAST" and the format version
+    nodes       the root node in preorder
+    strings     u32 count, u32 offsets of each string and the end, UTF-8 blob
+    classes     varint count, then for each class the string ids of its name
+                and of its fields
+    directory   u32 count, then u32 name id, u32 class id and u64 offset of
+                each node having a name, sorted by name for binary search
+    footer      u64 offsets of strings, classes and directory, and b"UAST"
+
+Values are tagged by one byte. Integers are zigzag varints, strings are
+varint ids into the string table, and lists hold a varint count followed by
+the items. A node is its class id, the u32 length of the rest of the node,
+and the values of the fields (and ``_attributes``) listed for the class, so a
+subtree is skipped by its length. All offsets are from the start of the
+header.
+"""
+
+import io
+import mmap
+import struct
+import sys
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from . import universal_ast_nodes as nodes
+
+_MAGIC = b"UAST"
+_VERSION = 1
+_HEADER = _MAGIC + bytes([_VERSION])
+_FOOTER = struct.Struct("<QQQ4s")
+_U32 = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+_DIRECTORY_ENTRY = struct.Struct("<IIQ")
+
+_T_NONE = 0
+_T_FALSE = 1
+_T_TRUE = 2
+_T_INT = 3
+_T_FLOAT = 4
+_T_STR = 5
+_T_LIST = 6
+_T_TUPLE = 7
+_T_NODE = 8
+
+
+def _append_varint(buf: bytearray, n: int):
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _read_varint(data, pos: int) -> Tuple[int, int]:
+    b = data[pos]
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    result = b & 0x7F
+    shift = 7
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(cls: type) -> Tuple[str, ...]:
+    # Attributes that are not fields are kept too, unlike in `to_dict`
+    return tuple(dict.fromkeys((*cls._fields, *cls._common_fields, *cls._attributes)))
+
+
+class _Encoder:
+    def __init__(self, file: BinaryIO, chunk_size: int) -> None:
+        self._file = file
+        self._start = file.tell()
+        self._chunk_size = chunk_size
+        self._buf = bytearray(_HEADER)
+        # Bytes already written to the file
+        self._flushed = 0
+        # Lengths of nodes written before their ends were reached
+        self._late_lengths: List[Tuple[int, int]] = []
+        self._strings: Dict[str, int] = {}
+        self._classes: Dict[type, Tuple[int, Callable[[Any], tuple]]] = {}
+        self._class_list: List[type] = []
+        self._directory: List[Tuple[int, int, int]] = []
+
+    def _string_id(self, s: str) -> int:
+        string_id = self._strings.get(s)
+        if string_id is None:
+            string_id = self._strings[s] = len(self._strings)
+        return string_id
+
+    def _class_entry(self, cls: type) -> Tuple[int, Callable[[Any], tuple]]:
+        entry = self._classes.get(cls)
+        if entry is None:
+            entry = (len(self._class_list), nodes._field_values_getter(_fields(cls)))
+            self._classes[cls] = entry
+            self._class_list.append(cls)
+        return entry
+
+    def _flush(self):
+        self._file.write(self._buf)
+        self._flushed += len(self._buf)
+        self._buf.clear()
+
+    def encode(self, root: nodes.SourceElement):
+        buf = self._buf
+        strings = self._strings
+        classes = self._classes
+        # Each frame holds the iterator of the values left in a node or a list,
+        # and the position of the length of the node
+        stack: List[Tuple[Iterator[Any], int]] = [(iter((root,)), -1)]
+        while stack:
+            values, length_pos = stack[-1]
+            for value in values:
+                t = type(value)
+                if t is str:
+                    string_id = strings.get(value)
+                    if string_id is None:
+                        string_id = strings[value] = len(strings)
+                    buf.append(_T_STR)
+                    if string_id < 0x80:
+                        buf.append(string_id)
+                    else:
+                        _append_varint(buf, string_id)
+                elif value is None:
+                    buf.append(_T_NONE)
+                elif t is int:
+                    buf.append(_T_INT)
+                    n = value << 1 if value >= 0 else (-value << 1) - 1
+                    if n < 0x80:
+                        buf.append(n)
+                    else:
+                        _append_varint(buf, n)
+                elif t is bool:
+                    buf.append(_T_TRUE if value else _T_FALSE)
+                elif isinstance(value, (list, tuple)):
+                    buf.append(_T_LIST if isinstance(value, list) else _T_TUPLE)
+                    _append_varint(buf, len(value))
+                    stack.append((iter(value), -1))
+                    break
+                elif isinstance(value, nodes.SourceElement):
+                    entry = classes.get(t)
+                    if entry is None:
+                        entry = self._class_entry(t)
+                    class_id, field_values = entry
+                    offset = self._flushed + len(buf)
+                    buf.append(_T_NODE)
+                    _append_varint(buf, class_id)
+                    if "name" in t._fields:
+                        name = nodes._node_name(value)
+                        if name is not None:
+                            self._directory.append(
+                                (class_id, self._string_id(name), offset)
+                            )
+                    stack.append((iter(field_values(value)), self._flushed + len(buf)))
+                    buf += b"\0\0\0\0"
+                    break
+                else:
+                    self._encode_other(value)
+            else:
+                stack.pop()
+                if length_pos >= 0:
+                    length = self._flushed + len(buf) - length_pos - _U32.size
+                    if length_pos >= self._flushed:
+                        _U32.pack_into(buf, length_pos - self._flushed, length)
+                    else:
+                        self._late_lengths.append((length_pos, length))
+            if len(buf) >= self._chunk_size:
+                self._flush()
+
+    def _encode_other(self, value: Any):
+        buf = self._buf
+        if isinstance(value, float):
+            buf.append(_T_FLOAT)
+            buf += _F64.pack(value)
+        elif isinstance(value, str):
+            buf.append(_T_STR)
+            _append_varint(buf, self._string_id(str(value)))
+        elif isinstance(value, int):
+            buf.append(_T_INT)
+            value = int(value)
+            _append_varint(buf, value << 1 if value >= 0 else (-value << 1) - 1)
+        else:
+            raise TypeError(f"Cannot serialize {value!r} of type {type(value)}")
+
+    def finish(self):
+        buf = self._buf
+        class_names = [
+            (self._string_id(cls.__name__), [self._string_id(f) for f in _fields(cls)])
+            for cls in self._class_list
+        ]
+
+        strings_offset = self._flushed + len(buf)
+        encoded = [s.encode("utf8", errors="surrogatepass") for s in self._strings]
+        buf += _U32.pack(len(encoded))
+        end = 0
+        for s in encoded:
+            buf += _U32.pack(end)
+            end += len(s)
+        buf += _U32.pack(end)
+        for s in encoded:
+            buf += s
+
+        classes_offset = self._flushed + len(buf)
+        _append_varint(buf, len(class_names))
+        for name_id, field_ids in class_names:
+            _append_varint(buf, name_id)
+            _append_varint(buf, len(field_ids))
+            for field_id in field_ids:
+                _append_varint(buf, field_id)
+
+        directory_offset = self._flushed + len(buf)
+        names = list(self._strings)
+        self._directory.sort(key=lambda entry: (names[entry[1]], entry[2]))
+        buf += _U32.pack(len(self._directory))
+        for class_id, name_id, offset in self._directory:
+            buf += _DIRECTORY_ENTRY.pack(name_id, class_id, offset)
+
+        buf += _FOOTER.pack(strings_offset, classes_offset, directory_offset, _MAGIC)
+        self._flush()
+        if len(self._late_lengths) > 0:
+            end = self._file.tell()
+            for length_pos, length in self._late_lengths:
+                self._file.seek(self._start + length_pos)
+                self._file.write(_U32.pack(length))
+            self._file.seek(end)
+
+
+def dump_uast(
+    uast: nodes.SourceElement,
+    file: Union[str, BinaryIO],
+    chunk_size: int = 1 << 20,
+):
+    """
+    Write ``uast`` in the binary format. The encoded nodes are written every
+    ``chunk_size`` bytes, so the whole encoding is never held in memory.
+
+    :file: Path of the file, or a seekable binary file object
+    """
+    if isinstance(file, str):
+        with open(file, "wb") as f:
+            dump_uast(uast, f, chunk_size)
+        return
+    encoder = _Encoder(file, chunk_size)
+    encoder.encode(uast)
+    encoder.finish()
+
+
+def dumps_uast(uast: nodes.SourceElement) -> bytes:
+    """
+    Encode ``uast`` in the binary format
+    """
+    f = io.BytesIO()
+    dump_uast(uast, f)
+    return f.getvalue()
+
+
+class _Frame:
+    # A node, list or tuple being decoded
+    __slots__ = ("cls", "fields", "values", "count")
+
+    def __init__(self, cls: type, fields: Tuple[str, ...], count: int) -> None:
+        self.cls = cls
+        self.fields = fields
+        self.values: List[Any] = []
+        self.count = count
+
+
+class UASTReader:
+    """
+    Reader of a UAST in the binary format, which is memory-mapped if given the
+    path of a file.
+
+    Nothing is decoded on opening except the class table. ``load`` decodes the
+    subtree at an offset, and ``find`` looks up named nodes, such as a
+    ``MethodDecl``, in the directory, decoding only their subtrees.
+
+    .. code-block:: python
+
+        with UASTReader("main.uast") as reader:
+            main = reader.find(MethodDecl, "main")[0]
+    """
+
+    def __init__(self, source: Union[str, bytes, bytearray, memoryview]) -> None:
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        if isinstance(source, str):
+            self._file = open(source, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            data = self._mmap
+        else:
+            data = source
+        self._data = data
+        if bytes(data[: len(_HEADER)]) != _HEADER:
+            raise ValueError("Not a UAST file of the supported version")
+        strings_offset, classes_offset, self._directory_offset, magic = (
+            _FOOTER.unpack_from(data, len(data) - _FOOTER.size)
+        )
+        if magic != _MAGIC:
+            raise ValueError("Truncated UAST file")
+
+        (n_strings,) = _U32.unpack_from(data, strings_offset)
+        self._string_offsets = strings_offset + _U32.size
+        self._string_blob = self._string_offsets + _U32.size * (n_strings + 1)
+        self._strings: List[Optional[str]] = [None] * n_strings
+
+        self._classes: List[Tuple[type, Tuple[str, ...]]] = []
+        n_classes, pos = _read_varint(data, classes_offset)
+        for _ in range(n_classes):
+            name_id, pos = _read_varint(data, pos)
+            n_fields, pos = _read_varint(data, pos)
+            fields = []
+            for _ in range(n_fields):
+                field_id, pos = _read_varint(data, pos)
+                fields.append(self._string(field_id))
+            cls = getattr(nodes, self._string(name_id))
+            self._classes.append((cls, tuple(fields)))
+        (self._directory_size,) = _U32.unpack_from(data, self._directory_offset)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+
+    def __enter__(self) -> "UASTReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def root_offset(self) -> int:
+        return len(_HEADER)
+
+    def _string(self, string_id: int) -> str:
+        s = self._strings[string_id]
+        if s is None:
+            start, end = struct.unpack_from(
+                "<II", self._data, self._string_offsets + _U32.size * string_id
+            )
+            s = sys.intern(
+                bytes(
+                    self._data[self._string_blob + start : self._string_blob + end]
+                ).decode("utf8", errors="surrogatepass")
+            )
+            self._strings[string_id] = s
+        return s
+
+    def node_class(self, offset: int) -> type:
+        """
+        Get the class of the node at ``offset`` without decoding it
+        """
+        if self._data[offset] != _T_NODE:
+            raise ValueError(f"No node at offset {offset}")
+        return self._classes[_read_varint(self._data, offset + 1)[0]][0]
+
+    def _skip(self, pos: int) -> int:
+        # Skip the value at `pos`, returning the position after it
+        data = self._data
+        pending = 1
+        while pending > 0:
+            pending -= 1
+            tag = data[pos]
+            pos += 1
+            if tag == _T_NODE:
+                _, pos = _read_varint(data, pos)
+                (length,) = _U32.unpack_from(data, pos)
+                pos += _U32.size + length
+            elif tag in (_T_INT, _T_STR):
+                _, pos = _read_varint(data, pos)
+            elif tag == _T_FLOAT:
+                pos += _F64.size
+            elif tag in (_T_LIST, _T_TUPLE):
+                count, pos = _read_varint(data, pos)
+                pending += count
+        return pos
+
+    def child_offsets(self, offset: Optional[int] = None) -> List[int]:
+        """
+        Get the offsets of the direct subnodes of the node at ``offset`` (the
+        root by default), the same as ``SourceElement.child_nodes``.
+        """
+        data = self._data
+        if offset is None:
+            offset = self.root_offset
+        self.node_class(offset)
+        class_id, pos = _read_varint(data, offset + 1)
+        pos += _U32.size
+        offsets = []
+        # Walk the values of the fields, entering lists but skipping nodes
+        pending = len(self._classes[class_id][1])
+        while pending > 0:
+            pending -= 1
+            tag = data[pos]
+            if tag == _T_NODE:
+                offsets.append(pos)
+                pos = self._skip(pos)
+            elif tag == _T_LIST:
+                count, pos = _read_varint(data, pos + 1)
+                pending += count
+            else:
+                pos = self._skip(pos)
+        return offsets
+
+    def load(self, offset: Optional[int] = None) -> Any:
+        """
+        Decode the value at ``offset``, usually a node, with its subtree. The
+        root is decoded by default.
+        """
+        data = self._data
+        classes = self._classes
+        strings = self._strings
+        pos = self.root_offset if offset is None else offset
+        root = _Frame(list, (), 1)
+        stack: List[_Frame] = [root]
+        while stack:
+            frame = stack[-1]
+            values = frame.values
+            left = frame.count - len(values)
+            while left > 0:
+                left -= 1
+                tag = data[pos]
+                if tag == _T_STR:
+                    string_id = data[pos + 1]
+                    if string_id < 0x80:
+                        pos += 2
+                    else:
+                        string_id, pos = _read_varint(data, pos + 1)
+                    value = strings[string_id]
+                    values.append(
+                        value if value is not None else self._string(string_id)
+                    )
+                elif tag == _T_NONE:
+                    pos += 1
+                    values.append(None)
+                elif tag == _T_INT:
+                    n = data[pos + 1]
+                    if n < 0x80:
+                        pos += 2
+                    else:
+                        n, pos = _read_varint(data, pos + 1)
+                    values.append(-((n + 1) >> 1) if n & 1 else n >> 1)
+                elif tag == _T_NODE:
+                    class_id = data[pos + 1]
+                    if class_id < 0x80:
+                        pos += 2
+                    else:
+                        class_id, pos = _read_varint(data, pos + 1)
+                    pos += _U32.size
+                    cls, fields = classes[class_id]
+                    stack.append(_Frame(cls, fields, len(fields)))
+                    break
+                elif tag == _T_LIST or tag == _T_TUPLE:
+                    n = data[pos + 1]
+                    if n < 0x80:
+                        pos += 2
+                    else:
+                        n, pos = _read_varint(data, pos + 1)
+                    stack.append(_Frame(list if tag == _T_LIST else tuple, (), n))
+                    break
+                elif tag == _T_FALSE or tag == _T_TRUE:
+                    pos += 1
+                    values.append(tag == _T_TRUE)
+                elif tag == _T_FLOAT:
+                    values.append(_F64.unpack_from(data, pos + 1)[0])
+                    pos += 1 + _F64.size
+                else:
+                    raise ValueError(f"Invalid tag {tag} at offset {pos}")
+            else:
+                stack.pop()
+                cls = frame.cls
+                if cls is list:
+                    value = values
+                elif cls is tuple:
+                    value = tuple(values)
+                else:
+                    value = cls.__new__(cls)
+                    for attr in cls._attributes:
+                        setattr(value, attr, None)
+                    for field, field_value in zip(frame.fields, values):
+                        setattr(value, field, field_value)
+                if len(stack) > 0:
+                    stack[-1].values.append(value)
+        return root.values[0]
+
+    def iter_top_level(self) -> Iterator[nodes.SourceElement]:
+        """
+        Decode the subnodes of the root one at a time, such as the top-level
+        declarations of a ``CompilationUnit``
+        """
+        for offset in self.child_offsets():
+            yield self.load(offset)
+
+    def _directory_entry(self, i: int) -> Tuple[int, int, int]:
+        return _DIRECTORY_ENTRY.unpack_from(
+            self._data, self._directory_offset + _U32.size + _DIRECTORY_ENTRY.size * i
+        )
+
+    def find_offsets(
+        self, node_type: Union[Type[nodes.SourceElement], tuple], name: str
+    ) -> List[int]:
+        """
+        Get the offsets of the nodes of ``node_type`` named ``name`` in
+        preorder, where names are matched as in ``NodeIndex.named``
+        """
+        # Binary search for the first entry of `name`
+        lo, hi = 0, self._directory_size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._string(self._directory_entry(mid)[0]) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        offsets: List[int] = []
+        for i in range(lo, self._directory_size):
+            name_id, class_id, offset = self._directory_entry(i)
+            if self._string(name_id) != name:
+                break
+            if issubclass(self._classes[class_id][0], node_type):
+                offsets.append(offset)
+        return offsets
+
+    def find(
+        self, node_type: Union[Type[nodes.SourceElement], tuple], name: str
+    ) -> List[nodes.SourceElement]:
+        """
+        Decode the nodes of ``node_type`` named ``name``, without decoding the
+        rest of the UAST
+        """
+        return [self.load(offset) for offset in self.find_offsets(node_type, name)]
+
+
+def load_uast(source: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """
+    Decode the whole UAST from the path of a file, or from the bytes returned by
+    ``dumps_uast``
+    """
+    with UASTReader(source) as reader:
+        return reader.load()
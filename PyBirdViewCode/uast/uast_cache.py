@@ -0,0 +1,155 @@
+"""
+Content-addressed on-disk cache for the UASTs of code files.
+
+A converted UAST is stored in the binary UAST format, and loaded back by
+``get_file_uast`` when neither the code file, the files it depends on (such
+as the headers included by a C/C++ file), the key given by the caller (the
+extra arguments, the encoding and the versions of the extractor and the
+converters) have changed.
+"""
+
+import json
+import os
+import shutil
+from typing import Dict, Optional, Sequence
+
+from ..clang_utils.code_attributes.tu_cache import _digest_of, file_digest
+from .uast_binary import _VERSION, dump_uast, load_uast
+from .universal_ast_nodes import CompilationUnit
+
+
+class UASTCache:
+    """
+    Cache of converted UASTs inside ``cache_dir``.
+
+    Like ``TUCache``, a small JSON manifest for each (file, key) records the
+    digests of the dependencies of the file, and the UAST is stored under a
+    digest combining all of them, so an edit to any dependency results in a
+    cache miss.
+
+    .. note:: Cached UASTs should be converted in the deterministic mode of
+        the converters, see ``BaseUASTConverter.deterministic``, so that
+        converting an unchanged file again gives the same UAST.
+    """
+
+    def __init__(self, cache_dir: str = ".PyBirdViewCode/uast_cache") -> None:
+        self.cache_dir = os.path.abspath(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _manifest_path(self, manifest_key: str) -> str:
+        return os.path.join(self.cache_dir, manifest_key + ".json")
+
+    def _uast_path(self, uast_key: str) -> str:
+        return os.path.join(self.cache_dir, uast_key + ".uast")
+
+    @staticmethod
+    def _manifest_key(file: str, key: Sequence[str]) -> Optional[str]:
+        digest = file_digest(file)
+        if digest is None:
+            return None
+        return _digest_of(str(_VERSION), file, digest, *key)
+
+    @staticmethod
+    def _uast_key(manifest_key: str, dependencies: Dict[str, Optional[str]]) -> str:
+        return _digest_of(
+            manifest_key,
+            *(f"{path}:{digest}" for path, digest in sorted(dependencies.items())),
+        )
+
+    def lookup(self, file: str, key: Sequence[str] = ()) -> Optional[str]:
+        """
+        Get the path of the cached UAST of ``file``, or None if it was not
+        cached or is out of date.
+        """
+        file = os.path.abspath(file)
+        manifest_key = self._manifest_key(file, key)
+        if manifest_key is None:
+            return None
+        manifest_path = self._manifest_path(manifest_key)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, "r") as f:
+                dependencies: Dict[str, Optional[str]] = json.load(f)["dependencies"]
+        except (OSError, ValueError, KeyError):
+            return None
+        for path, digest in dependencies.items():
+            if file_digest(path) != digest:
+                return None
+        uast_path = self._uast_path(self._uast_key(manifest_key, dependencies))
+        return uast_path if os.path.exists(uast_path) else None
+
+    def load(self, file: str, key: Sequence[str] = ()) -> Optional[CompilationUnit]:
+        """
+        Load the cached UAST of ``file``, or return None if it was not cached
+        or is out of date.
+        """
+        uast_path = self.lookup(file, key)
+        if uast_path is not None:
+            try:
+                uast = load_uast(uast_path)
+                self.hits += 1
+                return uast
+            except (OSError, ValueError, AttributeError):
+                # Unreadable, or written with node classes since removed
+                pass
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        file: str,
+        key: Sequence[str],
+        uast: CompilationUnit,
+        dependencies: Sequence[str] = (),
+    ) -> Optional[str]:
+        """
+        Store the UAST converted from ``file``.
+
+        :dependencies: Other files read when converting ``file``
+        :return: Path of the stored UAST, or None if ``file`` does not exist.
+        """
+        file = os.path.abspath(file)
+        manifest_key = self._manifest_key(file, key)
+        if manifest_key is None:
+            return None
+        digests = {}
+        for path in dependencies:
+            path = os.path.abspath(path)
+            digests[path] = file_digest(path)
+        uast_path = self._uast_path(self._uast_key(manifest_key, digests))
+        # Write to temporary files first, so that concurrent processes sharing
+        # one cache folder never observe a partially written entry.
+        tmp_suffix = f".{os.getpid()}.tmp"
+        dump_uast(uast, uast_path + tmp_suffix)
+        os.replace(uast_path + tmp_suffix, uast_path)
+        manifest_path = self._manifest_path(manifest_key)
+        with open(manifest_path + tmp_suffix, "w") as f:
+            json.dump({"file": file, "key": list(key), "dependencies": digests}, f)
+        os.replace(manifest_path + tmp_suffix, manifest_path)
+        return uast_path
+
+    def clear(self):
+        """
+        Remove all cached entries
+        """
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+
+_default_uast_cache: Optional[UASTCache] = None
+
+
+def set_default_uast_cache(cache: Optional[UASTCache]):
+    """
+    Set the cache used by ``get_file_uast`` when no cache is passed
+    explicitly. Pass None to disable caching.
+    """
+    global _default_uast_cache
+    _default_uast_cache = cache
+
+
+def get_default_uast_cache() -> Optional[UASTCache]:
+    return _default_uast_cache
@@ -2,9 +2,23 @@
 此文件中定义运用UAST进行代码分析的命令
 """
 
+import functools
 import os
-from typing import List, Type, Union, cast, Optional
-from .universal_ast_nodes import CompilationUnit, MethodDecl
+from typing import Any, Callable, Iterable, List, Tuple, Type, Union, cast, Optional
+
+from MelodieFuncFlow import MelodieGenerator
+
+from ..clang_utils import (
+    CompilationDatabase,
+    CompilerArgsType,
+    EncodingPolicyType,
+    expand_files,
+    get_default_encoding_policy,
+    resolve_compiler_args,
+    resolve_encoding,
+)
+from ..utils import FileTaskResult, parallel_map_files
+from .universal_ast_nodes import CompilationUnit, MethodDecl, SourceElement
 from .builtin_converters import (
     BaseASTExtractor,
     BaseUASTConverter,
@@ -15,6 +29,8 @@ from .builtin_converters import (
 )
 from .universal_cfg_extractor import CFGBuilder, CFG
 from .universal_code_property_graphs import CodePropertyGraphs
+from .uast_cache import UASTCache, get_default_uast_cache
+from .uast_dedupe import StructuralDeduplicator
 import logging
 
 logger = logging.getLogger("PBVC_DIAGNOSTICS")
@@ -41,17 +57,85 @@ def register_converter(
         _uast_converters[ast_type] = uast_converter_type
 
 
-def get_file_uast(file: str, extra_args: List[str] = []) -> CompilationUnit:
+def get_file_uast(
+    file: str,
+    extra_args: List[str] = [],
+    encoding: EncodingPolicyType = None,
+    cache: Optional[UASTCache] = None,
+    deterministic: bool = False,
+    lazy: bool = False,
+) -> CompilationUnit:
     """
     从文件中直接抽取UAST
     :file: 代码文件名
     :extra_args: 额外参数，直接传递给相应语言的AST解析器
+    :encoding: 代码文件的编码方式，与``BaseASTExtractor``中的相同
+    :cache: 从中加载UAST的``UASTCache``，未命中时转换并存入。为None时，使用
+        ``set_default_uast_cache``设置的缓存；没有默认缓存时，总是重新转换
+    :deterministic: 是否以确定性模式转换（见``BaseUASTConverter.deterministic``）。
+        使用缓存时总是以确定性模式转换
+    :lazy: 是否在首次访问函数体时才转换函数体（见``BaseUASTConverter.lazy``）。
+        存入缓存时会转换全部函数体
+    """
+    extractor_cls = _get_extractor_type(file)
+    cache = cache if cache is not None else get_default_uast_cache()
+    if cache is not None:
+        key = _uast_cache_key(file, extractor_cls, extra_args, encoding)
+        uast = cache.load(file, key)
+        if uast is not None:
+            return uast
+        deterministic = True
+
+    extractor = extractor_cls(file, extra_args, encoding)
+    ast, converter = _extract_ast(extractor)
+    converter.deterministic = deterministic
+    converter.lazy = lazy
+    uast = cast(CompilationUnit, converter.convert_to_uast(ast))
+    if cache is not None:
+        cache.store(file, key, uast, extractor.dependencies(ast))
+    return uast
+
+
+def iter_file_declarations(
+    file: str,
+    extra_args: List[str] = [],
+    encoding: EncodingPolicyType = None,
+    source_location_filter: Optional[Callable[[Any], bool]] = None,
+    lazy: bool = False,
+) -> MelodieGenerator[SourceElement]:
     """
+    从文件中逐个抽取顶层声明的UAST，而不建立整个``CompilationUnit``
+
+    每个顶层声明在产生之前才转换，已产生的声明不被引用，因此处理完即丢弃时，
+    占用的内存不随顶层声明的数量增长。适用于``.i``等预处理后的大文件。
+
+    :file: 代码文件名
+    :extra_args: 额外参数，直接传递给相应语言的AST解析器
+    :encoding: 代码文件的编码方式，与``get_file_uast``中的相同
+    :source_location_filter: 以原始AST的节点（如Clang的游标）为参数，返回False的
+        节点不转换，见``BaseUASTConverter.source_location_filter``
+    :lazy: 与``get_file_uast``中的相同
+    """
+
+    def _():
+        extractor = _get_extractor_type(file)(file, extra_args, encoding)
+        ast, converter = _extract_ast(extractor)
+        converter.lazy = lazy
+        converter.source_location_filter = source_location_filter
+        yield from converter.iter_top_level(ast)
+
+    return MelodieGenerator(_())
+
+
+def _get_extractor_type(file: str) -> Type[BaseASTExtractor]:
     # splitext产生的文件名一定会有.开头
     _, ext = os.path.splitext(file)
     if ext not in _ast_extractors:
         raise ValueError(f"Unsupported file extension: {ext}")
-    extractor = _ast_extractors[ext](file, extra_args)
+    return _ast_extractors[ext]
+
+
+def _extract_ast(extractor: BaseASTExtractor) -> Tuple[Any, BaseUASTConverter]:
     (ast, converter_kwargs), diags = extractor.extract_ast()
     # from ..clang_utils import beautified_print_ast
     # beautified_print_ast(ast)
@@ -59,37 +143,123 @@ def get_file_uast(file: str, extra_args: List[str] = []) -> CompilationUnit:
         logger.warning(item)
     for ast_type, converter_cls in _uast_converters.items():
         if isinstance(ast, ast_type):
-            uast = cast(
-                CompilationUnit, converter_cls(**converter_kwargs).convert_to_uast(ast)
-            )
-            return uast
+            return ast, converter_cls(**converter_kwargs)
     raise TypeError(f"No converter found for AST type: {type(ast)}")
 
 
+def _uast_cache_key(
+    file: str,
+    extractor_cls: Type[BaseASTExtractor],
+    extra_args: List[str],
+    encoding: EncodingPolicyType,
+) -> List[str]:
+    # 转换器由AST的类型决定，抽取前无法得知，故包含所有已注册转换器的版本
+    converters = sorted(
+        f"{cls.__module__}.{cls.__qualname__}:{cls.version}"
+        for cls in set(_uast_converters.values())
+    )
+    encoding = encoding if encoding is not None else get_default_encoding_policy()
+    return [
+        f"{extractor_cls.__module__}.{extractor_cls.__qualname__}",
+        extractor_cls.tool_version(),
+        *converters,
+        str(resolve_encoding(file, encoding)),
+        *extra_args,
+    ]
+
+
+def _file_uast_task(
+    file: str,
+    extra_args: CompilerArgsType = None,
+    encoding: EncodingPolicyType = None,
+    cache: Optional[UASTCache] = None,
+) -> CompilationUnit:
+    return get_file_uast(file, resolve_compiler_args(file, extra_args), encoding, cache)
+
+
+def ingest_file_uasts(
+    files: Union[str, Iterable[str], CompilationDatabase],
+    extra_args: CompilerArgsType = None,
+    workers: Optional[int] = None,
+    name_filter: Optional[Callable[[str], bool]] = None,
+    encoding: EncodingPolicyType = None,
+    cache: Optional[UASTCache] = None,
+) -> MelodieGenerator[FileTaskResult[CompilationUnit]]:
+    """
+    批量并行地从文件中抽取UAST
+
+    结果按完成的先后顺序逐个产生，每个文件对应一个``FileTaskResult``。
+    单个文件抽取失败时，其``error``字段记录异常信息，不影响其他文件。
+
+    :files: 文件夹、代码文件名的列表，或者``CompilationDatabase``（此时各文件的编译参数由其提供）
+    :extra_args: 额外参数，可以为列表或者以文件名为参数的函数（须可被pickle，不能是lambda）
+    :workers: 工作进程数，默认为``os.cpu_count()``
+    :name_filter: 按文件绝对路径过滤文件的函数
+    :encoding: 代码文件的编码方式，与``get_file_uast``中的相同。如果为函数，须可被pickle
+    :cache: 与``get_file_uast``中的相同。工作进程中不可见主进程设置的默认缓存，
+        故需在此传入。缓存的命中计数不会传回主进程
+    """
+    if isinstance(files, CompilationDatabase):
+        assert extra_args is None, "Arguments are provided by the compilation database"
+        if name_filter is not None:
+            files = CompilationDatabase([e for e in files if name_filter(e.file)])
+        return files.map(
+            functools.partial(get_file_uast, encoding=encoding, cache=cache), workers
+        )
+    return parallel_map_files(
+        functools.partial(
+            _file_uast_task, extra_args=extra_args, encoding=encoding, cache=cache
+        ),
+        expand_files(files, name_filter),
+        workers,
+    )
+
+
 def extract_cfg_from_method(
     method_or_func: MethodDecl,
     remove_empty_nodes=True,
     ensure_single_stmt_each_node=True,
+    dedupe: Optional[StructuralDeduplicator] = None,
 ) -> CFG:
     """
     从uast的Method中，抽取控制流图CFG
+
+    :dedupe: 传入时，结构相同的函数只抽取一次CFG。复用的CFG引用的是第一个此结构函数的节点。
     """
-    cfg_builder = CFGBuilder()
-    cfg = cfg_builder.build(
-        method_or_func, remove_empty_nodes, ensure_single_stmt_each_node
-    )
-    return cfg
+
+    def build(method: MethodDecl) -> CFG:
+        cfg_builder = CFGBuilder()
+        return cfg_builder.build(
+            method, remove_empty_nodes, ensure_single_stmt_each_node
+        )
+
+    if dedupe is not None:
+        return dedupe.get_or_compute(
+            method_or_func,
+            build,
+            ("cfg", remove_empty_nodes, ensure_single_stmt_each_node),
+        )
+    return build(method_or_func)
 
 
 def get_method_cpg(
-    method_or_func: MethodDecl, extra_variables: Optional[list[str]] = None
+    method_or_func: MethodDecl,
+    extra_variables: Optional[list[str]] = None,
+    dedupe: Optional[StructuralDeduplicator] = None,
 ) -> CodePropertyGraphs:
     """
     从uast的Method中，抽取代码属性图（Code Property Graphs, CPG），包含CFG、DDG、CDG and PDG
 
     :extra_variables: 在进行数据依赖分析时，除了函数的参数，还要额外考虑的变量。比如全局变量或者类的属性等。
+    :dedupe: 传入时，结构相同的函数只计算一次CPG。复用的CPG引用的是第一个此结构函数的节点。
     """
     extra_variables = extra_variables or []
+    if dedupe is not None:
+        return dedupe.get_or_compute(
+            method_or_func,
+            lambda method: CodePropertyGraphs(method, extra_variables),
+            ("cpg", tuple(extra_variables)),
+        )
     return CodePropertyGraphs(method_or_func, extra_variables)
 
 
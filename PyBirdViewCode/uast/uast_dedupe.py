@@ -0,0 +1,98 @@
+"""
+Deduplication of structurally identical UAST subtrees, so that results
+computed from a subtree, like the CFG or CPG of a method, can be reused for
+the identical subtrees of a whole project.
+"""
+
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple, TypeVar
+
+from .universal_ast_nodes import SourceElement
+
+NodeType = TypeVar("NodeType", bound=SourceElement)
+ResultType = TypeVar("ResultType")
+
+
+class StructuralDeduplicator:
+    """
+    Maps subtrees to the first structurally identical subtree seen, by their
+    structural hashes, and caches results computed from these canonical
+    subtrees.
+
+    The subtrees should not be modified after being added, as their cached
+    hashes would be stale.
+    """
+
+    def __init__(self, ignore_location: bool = True):
+        """
+        :ignore_location: Whether the same code at different places is
+            identical. This is the default, as results are mostly reused
+            across files and revisions.
+        """
+        self.ignore_location = ignore_location
+        self._buckets: Dict[int, List[SourceElement]] = {}
+        self._results: Dict[Tuple[int, Hashable], Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def canonical(self, node: NodeType) -> NodeType:
+        """
+        Get the first added subtree identical to ``node``, adding ``node``
+        if there is none.
+        """
+        bucket = self._buckets.setdefault(
+            node.structural_hash(self.ignore_location), []
+        )
+        for candidate in bucket:
+            if candidate is node or candidate._structure_equal(
+                node, self.ignore_location, True
+            ):
+                return candidate
+        bucket.append(node)
+        return node
+
+    def get_or_compute(
+        self,
+        node: NodeType,
+        func: Callable[[NodeType], ResultType],
+        key: Hashable = None,
+    ) -> ResultType:
+        """
+        Get the result of ``func`` for the canonical subtree of ``node``,
+        computing it only once for all identical subtrees.
+
+        The result references the nodes of the canonical subtree, not those
+        of ``node``.
+
+        :func: Function computing the result from a subtree
+        :key: Distinguishes the results of different functions, or of the
+            same function with different arguments
+        """
+        canonical = self.canonical(node)
+        result_key = (id(canonical), key)
+        if result_key in self._results:
+            self.hits += 1
+            return self._results[result_key]
+        self.misses += 1
+        result = self._results[result_key] = func(canonical)
+        return result
+
+    def __len__(self) -> int:
+        """
+        Number of distinct subtrees added
+        """
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+
+def group_identical(
+    nodes: Iterable[NodeType], ignore_location: bool = True
+) -> List[List[NodeType]]:
+    """
+    Group structurally identical subtrees, in the order they first appear.
+
+    :ignore_location: The same as in ``StructuralDeduplicator``
+    """
+    deduplicator = StructuralDeduplicator(ignore_location)
+    groups: Dict[int, List[NodeType]] = {}
+    for node in nodes:
+        groups.setdefault(id(deduplicator.canonical(node)), []).append(node)
+    return list(groups.values())
@@ -1,5 +1,7 @@
 from typing import Callable, List, Optional, Union
+from clang.cindex import CursorKind
 from MelodieFuncFlow import MelodieGenerator
+from ...clang_utils import SymbolIndex
 from .. import universal_ast_nodes as nodes
 
 
@@ -81,9 +83,41 @@ class UASTQuery:
         :return: MethodDecl
         """
 
+        if method_name is not None and isinstance(uast, nodes.CompilationUnit):
+            # 通过节点索引直接查找同名的函数，无需遍历整个UAST。索引不计算惰性的
+            # 函数体，故函数体内声明的同名函数只在其他地方都找不到时才查找
+            index = uast.node_index
+            methods = index.named(nodes.MethodDecl, method_name)
+            if len(methods) > 0 or index.complete:
+                return MelodieGenerator(methods).filter(
+                    create_method_name_filter(method_name)
+                )
         methods_generator = uast.filter_by(nodes.MethodDecl)
         if method_name is not None:
             methods_generator = methods_generator.filter(
                 create_method_name_filter(method_name)
             )
         return methods_generator
+
+    @classmethod
+    def get_method_in_project(
+        cls,
+        symbol_index: SymbolIndex,
+        method_name: str,
+        extra_args: Optional[List[str]] = None,
+    ) -> nodes.MethodDecl:
+        """
+        通过项目的符号索引找到函数定义所在的文件，只抽取该文件的UAST并获取函数的声明节点
+
+        :symbol_index: 项目的符号索引
+        :method_name: 函数的名称
+        :extra_args: 额外参数，直接传递给相应语言的AST解析器
+        :return: MethodDecl
+        """
+        from ..uast_commands import get_file_uast
+
+        record = symbol_index.find_definition(method_name, CursorKind.FUNCTION_DECL)
+        if record is None:
+            raise ValueError(f"No method named `{method_name}` found in the project")
+        uast = get_file_uast(record.file, extra_args if extra_args is not None else [])
+        return cls.get_method(uast, method_name)
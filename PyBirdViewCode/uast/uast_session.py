@@ -0,0 +1,183 @@
+"""
+Long-lived UAST session for a C/C++ file under editing.
+
+The session keeps the Clang translation unit alive, reparses it with the
+edited buffer through ``unsaved_files``, and only converts again the top-level
+declarations touched by the edit.
+"""
+
+import copy
+import os
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from clang.cindex import Cursor, Index, TranslationUnit
+
+from ..clang_utils import (
+    CompilerArgsType,
+    forget_cursor_index,
+    resolve_compiler_args,
+)
+from . import universal_ast_nodes as nodes
+from .builtin_converters import ClangASTConverter
+
+# (file name, start offset, end offset) of a top-level declaration
+_DeclKey = Tuple[Optional[str], int, int]
+
+
+def _shift_lines(node: nodes.SourceElement, delta: int) -> nodes.SourceElement:
+    # Shift a copy, as the node is still referenced by the UASTs returned
+    # before
+    node = copy.deepcopy(node)
+    for n in node.walk_preorder():
+        line, column = n.location
+        if line is not None:
+            n.location = (line + delta, column)
+    return node
+
+
+def _common_length(a: bytes, b: bytes, lo: int, hi: int, from_start: bool) -> int:
+    # Binary search on slice comparisons, which run in C instead of a
+    # per-byte Python loop.
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if from_start:
+            same = a[:mid] == b[:mid]
+        else:
+            same = a[len(a) - mid :] == b[len(b) - mid :]
+        if same:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class ClangUASTSession:
+    """
+    Keep the translation unit and the UAST of one C/C++ file, updating both on
+    each edit.
+
+    .. code-block:: python
+
+        session = ClangUASTSession("demo.c")
+        uast = session.uast
+        uast = session.update(edited_source_code)
+
+    On ``update``, the edited region is located by comparing the previous and
+    new buffers. Top-level declarations before the region are reused as-is,
+    those after it are copied with their line numbers shifted, so the UASTs
+    returned before are not modified, and only the declarations overlapping
+    the region are converted again. If the edit touches a preprocessor
+    directive, which may change the meaning of any declaration after it, the
+    whole file is converted again.
+
+    .. note:: Reused declarations are not re-checked semantically, which is
+        sound since UAST types refer to user-defined types only by name.
+        Declarations from included headers are always reused, so create a new
+        session when headers are modified.
+
+    :file: The C/C++ file
+    :extra_args: Arguments passed to libclang
+    :source_location_filter: The same as ``ClangASTConverter.source_location_filter``
+    """
+
+    def __init__(
+        self,
+        file: str,
+        extra_args: CompilerArgsType = None,
+        source_location_filter: Optional[Callable[[Cursor], bool]] = None,
+    ) -> None:
+        self.file = os.path.abspath(file)
+        self.args = resolve_compiler_args(self.file, extra_args)
+        self.source_location_filter = source_location_filter
+        with open(self.file, "rb") as f:
+            self._content: bytes = f.read()
+        self._index = Index.create()
+        self.tu: TranslationUnit = self._index.parse(
+            self.file,
+            args=self.args,
+            unsaved_files=[(self.file, self._content)],
+            options=TranslationUnit.PARSE_PRECOMPILED_PREAMBLE,
+        )
+        self._decls: Dict[_DeclKey, nodes.SourceElement] = {}
+        self.reconverted_count = 0
+        self.uast: nodes.CompilationUnit = self._convert(lambda key: None)
+
+    def _top_level_cursors(self):
+        for child in self.tu.cursor.get_children():
+            if self.source_location_filter is not None and (
+                not self.source_location_filter(child)
+            ):
+                continue
+            yield child
+
+    @staticmethod
+    def _key_of(cursor: Cursor) -> _DeclKey:
+        start, end = cursor.extent.start, cursor.extent.end
+        return (start.file.name if start.file else None, start.offset, end.offset)
+
+    def _convert(
+        self, reuse: Callable[[_DeclKey], Optional[nodes.SourceElement]]
+    ) -> nodes.CompilationUnit:
+        converter = ClangASTConverter()
+        converter.source_location_filter = self.source_location_filter
+        decls: Dict[_DeclKey, nodes.SourceElement] = {}
+        children: List[nodes.SourceElement] = []
+        self.reconverted_count = 0
+        for cursor in self._top_level_cursors():
+            key = self._key_of(cursor)
+            node = reuse(key)
+            if node is None:
+                node = converter.eval_single_cursor(cursor)
+                self.reconverted_count += 1
+            decls[key] = node
+            children.append(node)
+        self._decls = decls
+        cu = nodes.CompilationUnit(children)
+        cu.location = (self.tu.cursor.location.line, self.tu.cursor.location.column)
+        return cu
+
+    def update(self, content: Union[str, bytes]) -> nodes.CompilationUnit:
+        """
+        Reparse the file with the edited ``content`` and update the UAST.
+        """
+        new = content.encode("utf8") if isinstance(content, str) else content
+        old = self._content
+        # The edited region is old[prefix:len(old)-suffix], replaced by
+        # new[prefix:len(new)-suffix]
+        prefix = _common_length(old, new, 0, min(len(old), len(new)), True)
+        suffix = _common_length(old, new, 0, min(len(old), len(new)) - prefix, False)
+        old_end, new_end = len(old) - suffix, len(new) - suffix
+        offset_delta = new_end - old_end
+        line_delta = new.count(b"\n", prefix, new_end) - old.count(
+            b"\n", prefix, old_end
+        )
+        # Extend the region to whole lines to see if it touches a directive
+        line_start = old.rfind(b"\n", 0, prefix) + 1
+        touches_directive = (
+            b"#" in old[line_start:old_end] or b"#" in new[line_start:new_end]
+        )
+
+        self._content = new
+        self.tu.reparse(unsaved_files=[(self.file, self._content)])
+        forget_cursor_index(self.tu)
+        old_decls = self._decls
+
+        def reuse(key: _DeclKey) -> Optional[nodes.SourceElement]:
+            file, start, end = key
+            if touches_directive:
+                return None
+            if file != self.file:
+                return old_decls.get(key)
+            if end <= prefix:
+                return old_decls.get(key)
+            elif new.rfind(b"\n", 0, start) + 1 >= new_end:
+                # The line of this declaration starts after the edited region,
+                # so only line numbers have changed, not columns.
+                node = old_decls.get((file, start - offset_delta, end - offset_delta))
+                if node is not None and line_delta != 0:
+                    node = _shift_lines(node, line_delta)
+                return node
+            return None
+
+        self.uast = self._convert(reuse)
+        return self.uast
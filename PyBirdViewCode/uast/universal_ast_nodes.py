@@ -7,6 +7,7 @@ from typing import (
     Callable,
     Dict,
     Generator,
+    Iterator,
     List,
     Optional,
     Tuple,
@@ -16,8 +17,11 @@ from typing import (
     TYPE_CHECKING,
     Type as TypingType,
 )
+import sys
 import uuid
-from itertools import chain
+from collections import deque
+from itertools import chain, repeat
+from operator import attrgetter, is_
 from MelodieFuncFlow import MelodieGenerator
 
 
@@ -94,13 +98,172 @@ STANDARD_ASSIGNMENTS: set[str] = {
 
 LocationType = Tuple[Optional[int], Optional[int]]
 
+# Locations are shared by the nodes at the same position of all UASTs, since
+# most (line, column) pairs recur across nodes and files. The table is
+# emptied when full, so that it does not grow with the size of all code seen.
+_interned_locations: Dict[LocationType, LocationType] = {}
+_MAX_INTERNED_LOCATIONS = 1 << 15
 
-class SourceElement(object):
+
+def _intern_location(location: LocationType) -> LocationType:
+    if isinstance(location, list):
+        location = tuple(location)
+    if len(_interned_locations) >= _MAX_INTERNED_LOCATIONS:
+        _interned_locations.clear()
+    return _interned_locations.setdefault(location, location)
+
+
+# Fields never holding child nodes
+_LEAF_FIELDS = {"location"}
+# Types of most field values, skipped before checking for nodes
+_SCALAR_TYPES = {str, int, float, bool, type(None)}
+
+
+# Value of unset slots
+_UNSET = object()
+
+
+def _value_hash(value: Any, index: int) -> int:
+    if isinstance(value, SourceElement):
+        hashes = getattr(value, "_hashes", None)
+        if hashes is not None and hashes[index] is not None:
+            return hashes[index]
+        return value.structural_hash(index == 1)
+    elif isinstance(value, list):
+        return hash(tuple(_value_hash(v, index) for v in value))
+    try:
+        return hash(value)
+    except TypeError:
+        return hash(repr(value))
+
+
+class LazyValue:
+    """
+    Value of a lazy field of a node (see ``SourceElement._lazy_fields``),
+    computed by ``func`` on the first access of the field.
+
+    Anything ``func`` references, such as the cursors of a Clang translation
+    unit, is kept alive until the field is accessed.
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], Any]) -> None:
+        self.func = func
+
+
+def _lazy_field(field: str) -> property:
+    # The value is stored in the slot `_<field>`, replaced by the computed
+    # value on the first access
+    slot = "_" + field
+
+    def get(node):
+        value = getattr(node, slot)
+        if value.__class__ is LazyValue:
+            value = value.func()
+            setattr(node, slot, value)
+        return value
+
+    def set(node, value):
+        setattr(node, slot, value)
+
+    return property(get, set, doc=f"Lazy field `{field}`")
+
+
+def _field_values_getter(fields: Tuple[str, ...]) -> Callable[[Any], tuple]:
+    if len(fields) == 0:
+        return lambda node: ()
+    elif len(fields) == 1:
+        getter = attrgetter(fields[0])
+        return lambda node: (getter(node),)
+    else:
+        return attrgetter(*fields)
+
+
+class _SourceElementMeta(type):
+    """
+    Give each UAST node class ``__slots__`` for its ``_fields`` and
+    ``_attributes`` (attributes that are not fields) not defined by the base
+    classes, so that nodes carry no per-instance ``__dict__``.
+
+    Slots for ``_transient_attributes``, such as caches, are created as well,
+    but they are not part of the node, i.e. not compared or pickled.
+
+    A field in ``_lazy_fields`` is stored in the slot ``_<field>`` behind a
+    property, and may hold a ``LazyValue`` computed on the first access.
+
+    The fields which may hold child nodes are also computed once per class, so
+    traversals get the children of a node by one ``attrgetter`` call.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        lazy = set(namespace.get("_lazy_fields", ())).union(
+            *(getattr(base, "_lazy_fields", ()) for base in bases)
+        )
+        if "__slots__" not in namespace:
+            inherited = {
+                slot
+                for base in bases
+                for klass in base.__mro__
+                for slot in klass.__dict__.get("__slots__", ())
+            }
+            namespace["__slots__"] = tuple(
+                dict.fromkeys(
+                    "_" + f if f in lazy else f
+                    for f in chain(
+                        namespace.get("_fields", ()),
+                        namespace.get("_attributes", ()),
+                        namespace.get("_transient_attributes", ()),
+                    )
+                    if f not in inherited and "_" + f not in inherited
+                )
+            )
+        for field in namespace.get("_lazy_fields", ()):
+            namespace[field] = _lazy_field(field)
+        cls = super().__new__(mcs, name, bases, namespace)
+        transient = {
+            attr
+            for klass in cls.__mro__
+            for attr in klass.__dict__.get("_transient_attributes", ())
+        }
+        # Lazy fields are listed by their names, so they are computed when
+        # read through `_all_slots`
+        cls._all_slots = tuple(
+            dict.fromkeys(
+                slot[1:] if slot[1:] in lazy else slot
+                for klass in reversed(cls.__mro__)
+                for slot in klass.__dict__.get("__slots__", ())
+                if slot not in transient
+            )
+        )
+        cls._value_slots = tuple(s for s in cls._all_slots if s != "_location")
+        cls._value_slot_values = staticmethod(_field_values_getter(cls._value_slots))
+        cls._child_fields = tuple(
+            f for f in chain(cls._fields, cls._common_fields) if f not in _LEAF_FIELDS
+        )
+        cls._child_field_values = staticmethod(
+            _field_values_getter(cls._child_fields)
+        )
+        # Values of the child fields without computing lazy fields
+        cls._stored_child_field_values = staticmethod(
+            _field_values_getter(
+                tuple("_" + f if f in lazy else f for f in cls._child_fields)
+            )
+        )
+        return cls
+
+
+class SourceElement(object, metaclass=_SourceElementMeta):
     """
     A SourceElement is the base class for all elements that occur in a Java
     file parsed by plyj.
+
+    Nodes use ``__slots__`` instead of ``__dict__``, so attributes other than
+    ``_fields`` must be listed in ``_attributes`` of the node class.
     """
 
+    __slots__ = ("_location", "_hashes")
+
     class ApplyContext:
         def __init__(self) -> None:
             self.hierarchy: List[SourceElement] = []
@@ -164,6 +327,14 @@ class SourceElement(object):
 
     _common_fields: List[str] = ["location"]
     _fields: List[str] = []
+    _attributes: List[str] = []
+    # Fields which may hold a `LazyValue`, computed on the first access
+    _lazy_fields: List[str] = []
+    # Cached structural hashes, with and without locations
+    _transient_attributes: List[str] = ["_hashes"]
+    _all_slots: Tuple[str, ...] = ()
+    _value_slots: Tuple[str, ...] = ()
+    _child_fields: Tuple[str, ...] = ()
 
     def __init__(self):
         super(SourceElement, self).__init__()
@@ -173,6 +344,27 @@ class SourceElement(object):
         )  # line, column
         # self.id = uuid.uuid4().hex
 
+    @property
+    def location(self) -> LocationType:
+        return self._location
+
+    @location.setter
+    def location(self, location: LocationType):
+        self._location = _intern_location(location)
+        self._hashes = None
+
+    def _slot_values(self) -> Dict[str, Any]:
+        values = {}
+        for slot in self._all_slots:
+            try:
+                values[slot] = getattr(self, slot)
+            except AttributeError:
+                pass
+        return values
+
+    def __getstate__(self):
+        return None, self._slot_values()
+
     def __repr__(self):
         # try:
         equals = (
@@ -182,11 +374,136 @@ class SourceElement(object):
         args = ", ".join(equals)
         return "{0}({1})".format(self.__class__.__name__, args)
 
-    def __eq__(self, other):
+    def _values(self) -> tuple:
+        # Values of the slots except the location, `_UNSET` for unset slots
         try:
-            return self.__dict__ == other.__dict__
+            return self._value_slot_values(self)
         except AttributeError:
+            return tuple(getattr(self, slot, _UNSET) for slot in self._value_slots)
+
+    def structural_hash(self, ignore_location: bool = False) -> int:
+        """
+        Get the Merkle-style hash of the subtree, computed from the class and
+        the attributes of this node and the hashes of its subnodes. Equal
+        subtrees have equal hashes.
+
+        Hashes are cached on each node of the subtree, so hashing a tree once
+        makes hashing any of its subtrees free. The cache of a node is cleared
+        when its location is set, but not on other in-place modifications,
+        after which ``clear_structural_hashes`` should be called. Like
+        ``hash()`` of strings, the hashes differ between processes.
+
+        :ignore_location: Whether to ignore the locations, so that the same
+            code at different places has the same hash.
+        """
+        index = 1 if ignore_location else 0
+        stack: List[Tuple[SourceElement, bool]] = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            hashes = getattr(node, "_hashes", None)
+            if hashes is not None and hashes[index] is not None:
+                continue
+            if not expanded:
+                stack.append((node, True))
+                stack.extend(zip(node.child_nodes(), repeat(False)))
+                continue
+            # Subnodes are replaced by their hashes, the other values are
+            # hashed as they are
+            parts: List[Any] = [
+                node.__class__,
+                None if ignore_location else getattr(node, "_location", None),
+            ]
+            for value in node._values():
+                if value.__class__ in _SCALAR_TYPES:
+                    parts.append(value)
+                elif isinstance(value, SourceElement):
+                    # Hashed before in postorder
+                    parts.append(value._hashes[index])
+                else:
+                    parts.append(_value_hash(value, index))
+            if hashes is None:
+                hashes = node._hashes = [None, None]
+            hashes[index] = hash(tuple(parts))
+        return self._hashes[index]
+
+    def clear_structural_hashes(self):
+        """
+        Clear the cached structural hashes in the subtree
+        """
+        for node in self.walk_preorder():
+            node._hashes = None
+
+    def _structure_equal(
+        self, other: "SourceElement", ignore_location: bool, use_hashes: bool
+    ) -> bool:
+        index = 1 if ignore_location else 0
+        stack: List[Tuple[SourceElement, SourceElement]] = [(self, other)]
+        while stack:
+            a, b = stack.pop()
+            if a is b:
+                continue
+            if a.__class__ is not b.__class__:
+                return False
+            # Different hashes cached on both nodes prove the difference, as
+            # long as no cache is stale
+            hashes_a = getattr(a, "_hashes", None) if use_hashes else None
+            if hashes_a is not None:
+                hashes_b = getattr(b, "_hashes", None)
+                if hashes_b is not None:
+                    hash_a, hash_b = hashes_a[index], hashes_b[index]
+                    if hash_a is not None and hash_b is not None and hash_a != hash_b:
+                        return False
+            if not ignore_location and getattr(a, "_location", _UNSET) != getattr(
+                b, "_location", _UNSET
+            ):
+                return False
+            values_a, values_b = a._values(), b._values()
+            if values_a == values_b:
+                # Equal without subnodes, or with subnodes of the same identity
+                continue
+            for x, y in zip(values_a, values_b):
+                if x is y or x.__class__ in _SCALAR_TYPES and x == y:
+                    continue
+                elif isinstance(x, SourceElement):
+                    if not isinstance(y, SourceElement):
+                        return False
+                    stack.append((x, y))
+                elif isinstance(x, list):
+                    if not isinstance(y, list) or len(x) != len(y):
+                        return False
+                    for elem_x, elem_y in zip(x, y):
+                        if isinstance(elem_x, SourceElement) and isinstance(
+                            elem_y, SourceElement
+                        ):
+                            stack.append((elem_x, elem_y))
+                        elif elem_x != elem_y:
+                            return False
+                elif x != y:
+                    return False
+        return True
+
+    def structurally_equal(
+        self, other: "SourceElement", ignore_location: bool = False
+    ) -> bool:
+        """
+        Check whether the subtrees are equal, comparing the structural hashes
+        first, so that comparing a subtree with many others only walks the
+        subtrees of the same hash.
+
+        :ignore_location: The same as in ``structural_hash``
+        """
+        if self.structural_hash(ignore_location) != other.structural_hash(
+            ignore_location
+        ):
             return False
+        return self._structure_equal(other, ignore_location, True)
+
+    def __eq__(self, other):
+        # Compares the values only, as the cached hashes may be stale after
+        # in-place modifications
+        if not isinstance(other, SourceElement):
+            return False
+        return self._structure_equal(other, False, False)
 
     def __ne__(self, other):
         return not self == other
@@ -196,19 +513,22 @@ class SourceElement(object):
         default implementation that visit the subnodes in the order
         they are stored in self_field
         """
-        class_name = self.__class__.__name__
-        visit = getattr(visitor, "visit_" + class_name)
-        if visit(self):
-            for f in chain(self._fields, self._common_fields):
-                field = getattr(self, f)
-                if field:
-                    if isinstance(field, list):
-                        for elem in field:
-                            if isinstance(elem, SourceElement):
-                                elem.accept(visitor)
-                    elif isinstance(field, SourceElement):
-                        field.accept(visitor)
-        getattr(visitor, "leave_" + class_name)(self)
+
+        def delegated(node: SourceElement) -> bool:
+            # Subnodes overriding `accept` visit their own subtrees
+            return node is not self and type(node).accept is not SourceElement.accept
+
+        def enter(node: SourceElement) -> bool:
+            if delegated(node):
+                node.accept(visitor)
+                return False
+            return getattr(visitor, "visit_" + node.__class__.__name__)(node)
+
+        def leave(node: SourceElement):
+            if not delegated(node):
+                getattr(visitor, "leave_" + node.__class__.__name__)(node)
+
+        self._traverse(enter, leave)
 
     def _check_serializable(self, item, field_name):
         if not (isinstance(item, (int, float, str)) or item is None):
@@ -223,13 +543,17 @@ class SourceElement(object):
             raise KeyError("Invalid dictionary without key `_cls`")
         cls_name: str = dic["_cls"]
         node_cls = globals()[cls_name]
-        params_dict = {}
+        # Fields do not always match the parameters of `__init__` (e.g. `Name`
+        # stores its parameter `name` as `id`), so the node is filled directly.
+        node = node_cls.__new__(node_cls)
+        for attr in node_cls._attributes:
+            setattr(node, attr, None)
         for k, v in dic.items():
             if k == "_cls":
                 continue
             else:
                 if isinstance(v, dict) and "_cls" in v:
-                    params_dict[k] = cls.from_dict(v)
+                    v = cls.from_dict(v)
                 elif isinstance(v, list):
                     new_list = []
                     for elem in v:
@@ -237,11 +561,12 @@ class SourceElement(object):
                             new_list.append(cls.from_dict(elem))
                         else:
                             new_list.append(elem)
-                    params_dict[k] = new_list
-                else:
-                    params_dict[k] = v
+                    v = new_list
+                elif type(v) is str:
+                    v = sys.intern(v)
+                setattr(node, k, v)
 
-        return node_cls(**params_dict)
+        return node
 
     @classmethod
     def _single_item_to_serializable(
@@ -268,45 +593,154 @@ class SourceElement(object):
         """
         return self._single_item_to_serializable(self)
 
-    def _apply_func_to_uast(
-        self, walk_func: Callable[[ApplyContext], bool], ctx: ApplyContext
+    def child_nodes(self) -> List["SourceElement"]:
+        """
+        Get the direct subnodes in the order of the fields
+        """
+        children = []
+        for value in self._child_field_values(self):
+            if value.__class__ in _SCALAR_TYPES:
+                continue
+            elif isinstance(value, SourceElement):
+                children.append(value)
+            elif isinstance(value, list):
+                for elem in value:
+                    if isinstance(elem, SourceElement):
+                        children.append(elem)
+        return children
+
+    def _stored_child_nodes(self) -> Tuple[List["SourceElement"], bool]:
+        # Like `child_nodes`, but skipping the lazy fields not computed yet,
+        # and telling whether any was skipped
+        children = []
+        skipped = False
+        for value in self._stored_child_field_values(self):
+            if value.__class__ in _SCALAR_TYPES:
+                continue
+            elif isinstance(value, SourceElement):
+                children.append(value)
+            elif isinstance(value, list):
+                for elem in value:
+                    if isinstance(elem, SourceElement):
+                        children.append(elem)
+            elif isinstance(value, LazyValue):
+                skipped = True
+        return children, skipped
+
+    def is_resolved(self, field: str) -> bool:
+        """
+        Whether the lazy ``field`` has been computed. Other fields are always
+        resolved.
+        """
+        if field not in self._lazy_fields:
+            return True
+        return not isinstance(getattr(self, "_" + field, None), LazyValue)
+
+    def resolve_lazy_fields(self):
+        """
+        Compute all lazy fields in the subtree
+        """
+        for _ in self.walk_preorder():
+            pass
+
+    def _traverse(
+        self,
+        enter: Callable[["SourceElement"], bool],
+        leave: Callable[["SourceElement"], None],
     ):
-        ctx._push(self)
-
-        ret = walk_func(ctx)
-        if ret:
-            for f in chain(self._fields, self._common_fields):
-                field = getattr(self, f)
-                if field:
-                    if isinstance(field, list):
-                        for elem in field:
-                            if isinstance(elem, SourceElement):
-                                elem._apply_func_to_uast(walk_func, ctx)
-                    elif isinstance(field, SourceElement):
-                        field._apply_func_to_uast(walk_func, ctx)
-        ctx._pop()
+        """
+        Call ``enter`` on each node in preorder, and ``leave`` after the
+        subtree of the node. The subnodes are visited only if ``enter``
+        returns True.
+
+        The traversal keeps an explicit stack instead of recursion, so it does
+        not hit the recursion limit on deeply nested UASTs.
+        """
+        stack: List[Tuple[SourceElement, bool]] = [(self, False)]
+        while stack:
+            node, entered = stack.pop()
+            if entered:
+                leave(node)
+                continue
+            stack.append((node, True))
+            if enter(node):
+                children = node.child_nodes()
+                children.reverse()
+                stack.extend(zip(children, repeat(False)))
 
     def apply_with_hierarchy(self, walk_func: Callable[[ApplyContext], bool]):
         """
         Walk through the UAST applying the `walk_func` to each node
+
+        :walk_func: Called with the context holding the hierarchy from the root
+            to the current node, and returns whether to walk into the subnodes.
         """
         ctx = self.ApplyContext()
-        self._apply_func_to_uast(walk_func, ctx)
+        hierarchy = ctx.hierarchy
+        # Nodes with their depths, so the hierarchy is truncated to the parent
+        # of the next node instead of popping after each subtree.
+        stack: List[Tuple[SourceElement, int]] = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            del hierarchy[depth:]
+            hierarchy.append(node)
+            if walk_func(ctx):
+                children = node.child_nodes()
+                children.reverse()
+                stack.extend(zip(children, repeat(depth + 1)))
+        hierarchy.clear()
 
     def walk_preorder(self) -> Generator["SourceElement", None, None]:
-        for f in chain(self._fields, self._common_fields):
-            field = getattr(self, f)
-            if field:
-                if isinstance(field, list):
-                    for elem in field:
-                        if isinstance(elem, SourceElement):
-                            yield from elem.walk_preorder()
-                elif isinstance(field, SourceElement):
-                    yield from field.walk_preorder()
-        yield self
+        """
+        Walk through the UAST, yielding each node after its subnodes
+
+        Despite the name, this is the same as ``walk_postorder``, which callers
+        depend on. Use ``walk_top_down`` to yield each node before its subnodes.
+        """
+        return self.walk_postorder()
+
+    def walk_top_down(self) -> Generator["SourceElement", None, None]:
+        """
+        Walk through the UAST, yielding each node before its subnodes
+        """
+        stack: List[SourceElement] = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            children = node.child_nodes()
+            children.reverse()
+            stack.extend(children)
+
+    def walk_postorder(self) -> Generator["SourceElement", None, None]:
+        """
+        Walk through the UAST, yielding each node after its subnodes
+        """
+        stack: List[Tuple[SourceElement, bool]] = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                yield node
+                continue
+            stack.append((node, True))
+            children = node.child_nodes()
+            children.reverse()
+            stack.extend(zip(children, repeat(False)))
+
+    def walk_breadth_first(self) -> Generator["SourceElement", None, None]:
+        """
+        Walk through the UAST level by level
+        """
+        queue = deque([self])
+        while queue:
+            node = queue.popleft()
+            yield node
+            queue.extend(node.child_nodes())
 
     def iter_nodes(self) -> MelodieGenerator["SourceElement"]:
-        return MelodieGenerator(self.walk_preorder())
+        """
+        Iterate all nodes of the UAST, with subnodes before their parents
+        """
+        return MelodieGenerator(self.walk_postorder())
 
     def filter_by(
         self, _type: Optional[Union[TypingType["T"], Tuple]] = None, **props
@@ -325,12 +759,127 @@ class SourceElement(object):
 T = TypeVar("T", bound=SourceElement)
 
 
+def _node_name(node: SourceElement) -> Optional[str]:
+    # Names are strings in some nodes and `Name` nodes in others
+    name = getattr(node, "name", None)
+    if isinstance(name, str):
+        return name
+    elif isinstance(name, Name):
+        return name.id if isinstance(name.id, str) else None
+    return None
+
+
+class NodeIndex:
+    """
+    Index of all nodes in the UAST of ``root`` by class, and by class and name,
+    built in one traversal.
+
+    Nodes are stored in the order of ``iter_nodes``, so the results of queries
+    are in the same order as ``filter_by``.
+
+    Lazy fields not computed yet are not indexed, nor computed by the index.
+    In this case ``complete`` is False.
+    """
+
+    def __init__(self, root: SourceElement) -> None:
+        self.nodes: List[SourceElement] = []
+        self.complete = True
+        self._by_class: Dict[type, List[int]] = {}
+        self._by_name: Dict[Tuple[type, str], List[int]] = {}
+        self._subclasses: Dict[Any, List[type]] = {}
+        for pos, node in enumerate(self._walk_stored(root)):
+            self.nodes.append(node)
+            cls = node.__class__
+            self._by_class.setdefault(cls, []).append(pos)
+            if "name" in cls._fields:
+                name = _node_name(node)
+                if name is not None:
+                    self._by_name.setdefault((cls, name), []).append(pos)
+
+    def _walk_stored(self, root: SourceElement) -> Iterator[SourceElement]:
+        # `walk_postorder` without computing lazy fields
+        stack: List[Tuple[SourceElement, bool]] = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                yield node
+                continue
+            stack.append((node, True))
+            children, skipped = node._stored_child_nodes()
+            if skipped:
+                self.complete = False
+            children.reverse()
+            stack.extend(zip(children, repeat(False)))
+
+    def _classes(self, _type: Union[type, Tuple[type, ...]]) -> List[type]:
+        classes = self._subclasses.get(_type)
+        if classes is None:
+            classes = [c for c in self._by_class if issubclass(c, _type)]
+            self._subclasses[_type] = classes
+        return classes
+
+    def _nodes_at(self, position_lists: List[List[int]]) -> List[SourceElement]:
+        if len(position_lists) == 1:
+            positions = position_lists[0]
+        else:
+            positions = sorted(chain.from_iterable(position_lists))
+        return [self.nodes[pos] for pos in positions]
+
+    def of_type(
+        self, _type: Union[TypingType["T"], Tuple[type, ...]]
+    ) -> List["T"]:
+        """
+        Get the nodes which are instances of ``_type``
+        """
+        return self._nodes_at([self._by_class[c] for c in self._classes(_type)])
+
+    def named(
+        self, _type: Union[TypingType["T"], Tuple[type, ...]], name: str
+    ) -> List["T"]:
+        """
+        Get the nodes of ``_type`` whose ``name`` is the string ``name``, or a
+        ``Name`` node of identifier ``name``
+        """
+        return self._nodes_at(
+            [
+                self._by_name[(c, name)]
+                for c in self._classes(_type)
+                if (c, name) in self._by_name
+            ]
+        )
+
+    def filter_by(
+        self, _type: Union[TypingType["T"], Tuple[type, ...]], **props
+    ) -> List["T"]:
+        """
+        The same as ``SourceElement.filter_by`` on the root, with ``_type``
+        required.
+        """
+        name = props.get("name")
+        if isinstance(name, str):
+            candidates = self.named(_type, name)
+        else:
+            candidates = self.of_type(_type)
+        if len(props) == 0:
+            return candidates
+        return [
+            node
+            for node in candidates
+            if all(getattr(node, k) == v for k, v in props.items())
+        ]
+
+
 class CompilationUnit(SourceElement):
     """
     UAST表示每一个代码文件的节点
+
+    按照节点类型和名称对节点的查询（``filter_by``）使用节点索引，索引在第一次
+    查询时建立。索引不计算惰性字段（见``LazyValue``），若有未计算的惰性字段，
+    ``filter_by``会先计算全部惰性字段，再重新建立索引。
     """
 
     _fields = ["children"]
+    _transient_attributes = ["_node_index"]
 
     def __init__(
         self,
@@ -339,6 +888,43 @@ class CompilationUnit(SourceElement):
         super(CompilationUnit, self).__init__()
         self.children = children
 
+    @property
+    def node_index(self) -> NodeIndex:
+        """
+        获取节点索引，如果尚未建立或已经失效，则重新建立
+
+        替换``children``、在其中增删节点或替换其中的节点后，索引会自动失效；
+        原地修改更深层的节点后，需要调用``invalidate_index``。
+        """
+        cached = getattr(self, "_node_index", None)
+        if cached is not None:
+            index, children, indexed_children = cached
+            if (
+                children is self.children
+                and len(indexed_children) == len(children)
+                and all(map(is_, indexed_children, children))
+            ):
+                return index
+        index = NodeIndex(self)
+        self._node_index = (index, self.children, tuple(self.children))
+        return index
+
+    def invalidate_index(self):
+        """
+        使节点索引失效，在下一次查询时重新建立
+        """
+        self._node_index = None
+
+    def filter_by(
+        self, _type: Optional[Union[TypingType["T"], Tuple]] = None, **props
+    ) -> MelodieGenerator["T"]:
+        if _type is None:
+            return super().filter_by(_type, **props)
+        if not self.node_index.complete:
+            self.resolve_lazy_fields()
+            self.invalidate_index()
+        return MelodieGenerator(self.node_index.filter_by(_type, **props))
+
 
 class PackageDecl(SourceElement):
     """
@@ -498,6 +1084,7 @@ class FieldDecl(SourceElement):
     """
 
     _fields = ["name", "type", "modifiers"]
+    _attributes = ["init_value"]
 
     def __init__(self, name: str, type: DATA_TYPE, init_value=None, modifiers=None):
         super(FieldDecl, self).__init__()
@@ -694,6 +1281,8 @@ class MethodDecl(SourceElement):
         "throws",
         "type_ref",
     ]
+    # The body may be converted on the first access, see `LazyValue`
+    _lazy_fields = ["body"]
 
     def __init__(
         self,
@@ -1481,7 +2070,8 @@ class Name(SourceElement):
 
     def __init__(self, name: str):
         super(Name, self).__init__()
-        self.id = name
+        # Identifiers recur across the UAST, so share one string for each
+        self.id = sys.intern(name) if type(name) is str else name
 
 
 class Null(SourceElement):
@@ -6,6 +6,7 @@ from .files import (
     parse_dataurl,
     FileManager,
     convert_encodings,
+    EncodingConversionStats,
     abspath_from_file,
 )
 from MelodieFuncFlow.functional import (
@@ -13,3 +14,9 @@ from MelodieFuncFlow.functional import (
     MelodieGenerator,
     melodie_generator,
 )
+from .parallel import (
+    FileTaskResult,
+    parallel_map,
+    parallel_map_files,
+    run_file_task,
+)
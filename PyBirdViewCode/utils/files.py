@@ -1,11 +1,17 @@
 import base64
+import codecs
+import hashlib
+import itertools
 import json
 import mimetypes
 import os
-import shutil
-from typing import Any, Callable, Union
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import networkx as nx
 
+from .parallel import FileTaskResult, parallel_map, run_file_task
+
 
 def parse_dataurl(dataurl: str):
     """
@@ -35,6 +41,96 @@ def file_to_dataurl(file_path: str):
         return f"data:{mimetype};base64,{data_url}"
 
 
+@dataclass
+class EncodingConversionStats:
+    """
+    转换编码的统计信息
+
+    :failed: 转换失败的文件，其``error``字段记录异常信息
+    :bytes_read: 读取的源文件字节数，不包括跳过的文件
+    """
+
+    converted: int = 0
+    copied: int = 0
+    skipped: int = 0
+    failed: List[FileTaskResult] = field(default_factory=list)
+    bytes_read: int = 0
+    seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        每秒处理的源文件字节数
+        """
+        return self.bytes_read / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.converted} converted, {self.copied} copied, "
+            f"{self.skipped} up to date, {len(self.failed)} failed, "
+            f"{self.bytes_read / (1 << 20):.1f}MB in {self.seconds:.2f}s "
+            f"({self.throughput / (1 << 20):.1f}MB/s)"
+        )
+
+
+_CONVERSION_MANIFEST = ".convert_encodings.json"
+
+# (源文件, 目标文件, 源编码, 目标编码, errors, 块大小, 上次记录的源文件摘要)
+_ConversionTask = Tuple[str, str, str, str, str, int, Optional[str]]
+
+
+def _read_chunks(path: str, chunk_size: int, digest):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+            yield chunk
+
+
+def _convert_file(task: _ConversionTask) -> Tuple[str, int, str, str]:
+    src, dst, src_encoding, dst_encoding, errors, chunk_size, last_digest = task
+    src_digest = hashlib.sha256()
+    if last_digest is not None:
+        # 修改时间变化但内容未变的文件无需再次转换
+        size = sum(len(c) for c in _read_chunks(src, chunk_size, src_digest))
+        if src_digest.hexdigest() == last_digest:
+            return "skipped", size, last_digest, last_digest
+        src_digest = hashlib.sha256()
+
+    if os.path.abspath(src) == os.path.abspath(dst) and src_encoding == dst_encoding:
+        size = sum(len(c) for c in _read_chunks(src, chunk_size, src_digest))
+        return "skipped", size, src_digest.hexdigest(), src_digest.hexdigest()
+
+    out_digest = hashlib.sha256()
+    chunks = _read_chunks(src, chunk_size, src_digest)
+    if src_encoding != dst_encoding:
+        action = "converted"
+        encoder = codecs.getincrementalencoder(dst_encoding)(errors)
+        outputs = itertools.chain(
+            (
+                encoder.encode(text)
+                for text in codecs.iterdecode(chunks, src_encoding, errors)
+            ),
+            [encoder.encode("", final=True)],
+        )
+    else:
+        action = "copied"
+        outputs = chunks
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    # 先写入临时文件，避免中断时留下不完整的目标文件；也使得原地转换成为可能
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        for output in outputs:
+            out_digest.update(output)
+            f.write(output)
+    size = os.path.getsize(src)
+    os.replace(tmp_path, dst)
+    return action, size, src_digest.hexdigest(), out_digest.hexdigest()
+
+
+def _run_conversion(task: _ConversionTask) -> FileTaskResult:
+    return run_file_task(lambda _: _convert_file(task), task[0])
+
+
 def convert_encodings(
     src_folder: str,
     file_filter: Callable[[str], bool],
@@ -42,12 +138,18 @@ def convert_encodings(
     dst_encoding: Union[str, Callable[[str], str]],
     dst_folder: str,
     errors: str = "replace",
-):
+    workers: Optional[int] = None,
+    chunk_size: int = 1 << 20,
+) -> EncodingConversionStats:
     """
     中文：
 
     将``src_folder``文件夹下指定类型的文件，转换为指定的编码方式。
 
+    文件被分块流式地解码与编码，因此大文件不会被整个读入内存；各文件在多个进程中并行转换。
+    每个文件转换后，其修改时间、大小与内容摘要记录在目标文件夹的``.convert_encodings.json``中，
+    再次转换时跳过源文件未变、且目标文件未被改动的文件。
+
     :src_folder: 待转换的文件所在的文件夹
     :file_filter: 一个函数，输入为文件名(str)，输出True或者False，代表是否转换此文件的编码方式。
         例如输入``lambda name: name.endswith('.c')``，可以过滤出所有以``.c``结尾的文件
@@ -58,53 +160,93 @@ def convert_encodings(
         也可以输入一个函数，通过原文件的绝对路径，选择该文件的编码方式
     :dst_folder:  目标文件夹路径。如果值与src_folder相等，则代表在原文件上直接更改编码方式
     :errors: 处理编码方式错误的方法。默认为``"replace"``。可用的取值与``open``中的``errors``参数相同
+    :workers: 工作进程数，默认为``os.cpu_count()``；为1时在当前进程中转换
+    :chunk_size: 每次读取的字节数
+    :return: 转换的统计信息，包括吞吐量
     """
+    start = time.perf_counter()
+    stats = EncodingConversionStats()
 
     # 如果目标文件夹为空，则使用源文件夹作为目标文件夹
     if not dst_folder:
         dst_folder = src_folder
+    in_place = os.path.abspath(dst_folder) == os.path.abspath(src_folder)
     get_src_encoding = (
         src_encoding if callable(src_encoding) else (lambda _: src_encoding)
     )
     get_dst_encoding = (
         dst_encoding if callable(dst_encoding) else (lambda _: dst_encoding)
     )
-
-    # 遍历源文件夹中的所有文件
+    manifest_path = os.path.join(dst_folder, _CONVERSION_MANIFEST)
+    try:
+        with open(manifest_path, "r") as f:
+            records: Dict[str, Dict[str, Any]] = json.load(f)
+    except (OSError, ValueError):
+        records = {}
+
+    # 遍历源文件夹中的所有文件。编码方式在当前进程中确定，因为回调函数可能无法被pickle
+    tasks: List[_ConversionTask] = []
     for root, _, files in os.walk(src_folder):
         for file in files:
             file_path = os.path.join(root, file)
-            relpath = os.path.relpath(root, src_folder)
-            dst_file_dir = os.path.join(dst_folder, relpath)
-            dst_file_path = os.path.join(dst_file_dir, file)
-
             # 使用文件过滤器判断是否需要转换编码
-            if file_filter(file_path):
-                # 获取文件的原始编码
-                _src_encoding = get_src_encoding(file_path)
-                # 获取期望输出的编码方式
-                _dst_encoding = get_dst_encoding(file_path)
-
-                # 转换文件编码
-                if _src_encoding != _dst_encoding:
-                    with open(file_path, "rb") as f:
-                        raw_data = f.read()
-
-                    converted_data = raw_data.decode(
-                        _src_encoding, errors=errors
-                    ).encode(_dst_encoding, errors=errors)
-
-                    # 若输出路径不存在，则创建
-                    if not os.path.exists(dst_file_dir):
-                        os.makedirs(dst_file_dir)
-
-                    # 保存转换后的文件到目标文件夹
-                    with open(dst_file_path, "wb") as f:
-                        f.write(converted_data)
-                else:
-                    # 如果源编码和目标编码相同，则直接复制文件到目标文件夹
-                    dst_file_path = os.path.join(dst_folder, file)
-                    shutil.copy(file_path, dst_file_path)
+            if not file_filter(file_path):
+                continue
+            dst_file_path = os.path.join(
+                dst_folder, os.path.relpath(file_path, src_folder)
+            )
+            encodings = [get_src_encoding(file_path), get_dst_encoding(file_path)]
+            last_digest = None
+            record = records.get(os.path.relpath(file_path, src_folder))
+            if record is not None and record["encodings"] == encodings:
+                st = os.stat(file_path)
+                try:
+                    dst_st = os.stat(dst_file_path)
+                except OSError:
+                    dst_st = None
+                if dst_st is not None and record["dst"] == [
+                    dst_st.st_mtime_ns,
+                    dst_st.st_size,
+                ]:
+                    if record["src"] == [st.st_mtime_ns, st.st_size]:
+                        stats.skipped += 1
+                        continue
+                    last_digest = record["digest"]
+            tasks.append(
+                (file_path, dst_file_path, *encodings, errors, chunk_size, last_digest)
+            )
+
+    for result in parallel_map(_run_conversion, tasks, workers):
+        relpath = os.path.relpath(result.file, src_folder)
+        if not result.ok:
+            stats.failed.append(result)
+            records.pop(relpath, None)
+            continue
+        action, size, src_digest, out_digest = result.result
+        stats.bytes_read += size
+        if action == "converted":
+            stats.converted += 1
+        elif action == "copied":
+            stats.copied += 1
+        else:
+            stats.skipped += 1
+        st = os.stat(result.file)
+        dst_st = os.stat(os.path.join(dst_folder, relpath))
+        records[relpath] = {
+            "encodings": [get_src_encoding(result.file), get_dst_encoding(result.file)],
+            "src": [st.st_mtime_ns, st.st_size],
+            "dst": [dst_st.st_mtime_ns, dst_st.st_size],
+            # 原地转换后，源文件即为转换结果
+            "digest": out_digest if in_place else src_digest,
+        }
+
+    if len(tasks) > 0:
+        os.makedirs(dst_folder, exist_ok=True)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(records, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+    stats.seconds = time.perf_counter() - start
+    return stats
 
 
 def abspath_from_current_file(rel_path: str, current_file: str) -> str:
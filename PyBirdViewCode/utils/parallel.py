@@ -0,0 +1,107 @@
+"""
+Run per-file analysis tasks over a pool of worker processes
+"""
+
+import functools
+import os
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Iterable, Optional, Tuple, TypeVar
+
+from MelodieFuncFlow.functional import MelodieGenerator
+
+T = TypeVar("T")
+
+
+@dataclass
+class FileTaskResult(Generic[T]):
+    """
+    Result of a task executed on one file.
+
+    :file: The file processed
+    :result: Return value of the task, None if the task failed
+    :error: Formatted traceback if the task raised an exception, otherwise None
+    :args: Compiler arguments the file was processed with, if the task was
+        run on an entry of a ``CompilationDatabase``, where a file may be
+        listed with several argument sets
+    """
+
+    file: str
+    result: Optional[T] = None
+    error: Optional[str] = None
+    args: Optional[Tuple[str, ...]] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_file_task(func: Callable[[str], T], file: str) -> FileTaskResult[T]:
+    """
+    Call ``func(file)``, capturing any exception into the returned result so that
+    one broken file never aborts a batch.
+    """
+    try:
+        return FileTaskResult(file, func(file))
+    except Exception:
+        return FileTaskResult(file, None, traceback.format_exc())
+
+
+def _iter_completed(
+    executor: Executor, func: Callable[[Any], Any], items: Iterable[Any], window: int
+):
+    items_iter = iter(items)
+    pending = set()
+    for item in items_iter:
+        pending.add(executor.submit(func, item))
+        if len(pending) >= window:
+            break
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+            for item in items_iter:
+                pending.add(executor.submit(func, item))
+                break
+
+
+def parallel_map(
+    func: Callable[[Any], T], items: Iterable[Any], workers: Optional[int] = None
+) -> MelodieGenerator[T]:
+    """
+    Apply ``func`` to each item across ``workers`` processes, yielding the return
+    values in completion order.
+
+    Only a bounded number of items are submitted ahead of the consumer, so
+    results are streamed rather than accumulated.
+
+    :func: A picklable callable (module-level function or ``functools.partial``
+        of one). Its return value must be picklable.
+    :workers: Number of worker processes, ``os.cpu_count()`` by default.
+        If ``workers == 1``, items are processed in the current process.
+    """
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+
+    def _():
+        if workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from _iter_completed(executor, func, items, workers * 4)
+
+    return MelodieGenerator(_())
+
+
+def parallel_map_files(
+    func: Callable[[str], T], files: Iterable[str], workers: Optional[int] = None
+) -> MelodieGenerator[FileTaskResult[T]]:
+    """
+    Apply ``func`` to each file across ``workers`` processes like ``parallel_map``,
+    yielding ``FileTaskResult`` in completion order.
+
+    :func: A picklable callable taking the file path.
+    :workers: Number of worker processes, ``os.cpu_count()`` by default.
+    """
+    return parallel_map(functools.partial(run_file_task, func), files, workers)
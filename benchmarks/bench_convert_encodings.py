@@ -0,0 +1,66 @@
+"""
+Benchmark of convert_encodings against the previous sequential version.
+
+Generates a folder of GB2312 files, converts it to UTF-8 with the previous
+implementation (one file at a time, each read fully into memory), with the
+parallel streaming implementation, and again when everything is up to date.
+
+Usage: python benchmarks/bench_convert_encodings.py [number_of_files]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from PyBirdViewCode.utils import convert_encodings
+
+LINE = "/* 这里是函数的注释 */ int f(int a) { return a + 1; }\n"
+
+
+def sequential_convert(src_folder, file_filter, src_encoding, dst_encoding, dst_folder):
+    for root, _, files in os.walk(src_folder):
+        for file in files:
+            file_path = os.path.join(root, file)
+            dst_file_dir = os.path.join(dst_folder, os.path.relpath(root, src_folder))
+            if file_filter(file_path):
+                with open(file_path, "rb") as f:
+                    raw_data = f.read()
+                converted_data = raw_data.decode(src_encoding, errors="replace").encode(
+                    dst_encoding, errors="replace"
+                )
+                os.makedirs(dst_file_dir, exist_ok=True)
+                with open(os.path.join(dst_file_dir, file), "wb") as f:
+                    f.write(converted_data)
+
+
+def generate(folder: str, count: int):
+    content = (LINE * 2000).encode("gb2312")
+    for i in range(count):
+        sub = os.path.join(folder, f"mod{i % 20}")
+        os.makedirs(sub, exist_ok=True)
+        with open(os.path.join(sub, f"f{i}.c"), "wb") as f:
+            f.write(content)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    is_c = lambda f: f.endswith(".c")
+    with tempfile.TemporaryDirectory() as folder:
+        src = os.path.join(folder, "src")
+        generate(src, count)
+
+        start = time.perf_counter()
+        sequential_convert(src, is_c, "gb2312", "utf8", os.path.join(folder, "old"))
+        elapsed = time.perf_counter() - start
+        print(f"sequential:          {elapsed:6.2f}s")
+
+        dst = os.path.join(folder, "new")
+        stats = convert_encodings(src, is_c, "gb2312", "utf8", dst)
+        print(f"parallel streaming:  {stats.seconds:6.2f}s  {stats}")
+        stats = convert_encodings(src, is_c, "gb2312", "utf8", dst)
+        print(f"up to date:          {stats.seconds:6.2f}s  {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark of ``data_structure_from_file`` on generated files with a growing
+number of functions, whose time should grow linearly with the number of
+functions, as each of them is indexed by its own ``CursorIndex``.
+
+Usage: python benchmarks/bench_cursor_index_scaling.py [functions ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from PyBirdViewCode.clang_utils import data_structure_from_file
+
+FUNCTION = """
+int global_{i};
+
+int function_{i}(int a)
+{{
+    int s = global_{i};
+    if (a > {i})
+        s += function_{i}(a - 1);
+    return s;
+}}
+"""
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 4000, 12000]
+    with tempfile.TemporaryDirectory() as folder:
+        for count in counts:
+            file = os.path.join(folder, f"generated_{count}.c")
+            with open(file, "w") as f:
+                for i in range(count):
+                    f.write(FUNCTION.format(i=i))
+            start = time.perf_counter()
+            n_models = sum(1 for _ in data_structure_from_file(file))
+            elapsed = time.perf_counter() - start
+            print(
+                f"{count:6} functions: {elapsed * 1e3:9.1f}ms,"
+                f" {elapsed / count * 1e6:6.1f}us per function ({n_models} models)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark of change detection with FileManifest against hashing all files.
+
+Generates a project of many C files sharing a few headers, then measures a
+scan where nothing changed and one where a header changed.
+
+Usage: python benchmarks/bench_file_manifest.py [number_of_files]
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from PyBirdViewCode.clang_utils import FileManifest
+
+HEADERS = 10
+
+
+def generate(folder: str, count: int):
+    for i in range(HEADERS):
+        with open(os.path.join(folder, f"h{i}.h"), "w") as f:
+            f.write(f"struct S{i} {{ int x; }};\n")
+    for i in range(count):
+        sub = os.path.join(folder, f"mod{i % 50}")
+        os.makedirs(sub, exist_ok=True)
+        with open(os.path.join(sub, f"f{i}.c"), "w") as f:
+            f.write(f'#include "../h{i % HEADERS}.h"\n')
+            f.write(f"int f{i}(int a) {{ return a + {i}; }}\n" * 200)
+
+
+def hash_all(folder: str) -> dict:
+    digests = {}
+    for root, _, files in os.walk(folder):
+        for file in files:
+            path = os.path.join(root, file)
+            with open(path, "rb") as f:
+                digests[path] = hashlib.sha256(f.read()).hexdigest()
+    return digests
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as folder:
+        generate(folder, count)
+        manifest_path = os.path.join(folder, "manifest.json")
+        filetypes = (".c", ".h")
+        manifest = FileManifest(manifest_path)
+        manifest.detect_changes(folder, filetypes)
+        manifest.save()
+
+        elapsed, _ = timed(lambda: hash_all(folder))
+        print(f"{count} files, hashing all:         {elapsed * 1000:8.1f}ms")
+
+        manifest = FileManifest(manifest_path)
+        elapsed, changes = timed(lambda: manifest.detect_changes(folder, filetypes))
+        print(f"manifest, no change:               {elapsed * 1000:8.1f}ms")
+        assert len(changes.changed) == 0
+
+        with open(os.path.join(folder, "h0.h"), "a") as f:
+            f.write("struct T { int y; };\n")
+        manifest = FileManifest(manifest_path)
+        elapsed, changes = timed(lambda: manifest.detect_changes(folder, filetypes))
+        print(
+            f"manifest, one header modified:    {elapsed * 1000:8.1f}ms "
+            f"({len(changes.dependents)} dependents)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark of bulk cursor queries on a ``FlatTU`` snapshot.
+
+Finds all BINARY_OPERATOR cursors whose type starts with ``unsigned`` in a
+generated file, by reading the attributes of each cursor and by querying the
+columnar snapshot.
+
+Usage: python benchmarks/bench_flat_tu.py [number_of_functions]
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from clang.cindex import CursorKind
+
+from PyBirdViewCode.clang_utils import FlatTU, parse_file
+
+
+def generate_file(path: str, functions_count: int):
+    with open(path, "w") as f:
+        for i in range(functions_count):
+            f.write(f"unsigned int f{i}(unsigned int a, int b)\n{{\n")
+            for j in range(20):
+                f.write(f"    a = a * {j}u + (unsigned int)b; b = b - {j};\n")
+            f.write("    return a + b;\n}\n")
+
+
+def main():
+    functions_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "large.c")
+        generate_file(path, functions_count)
+        tu = parse_file(path)
+
+        start = time.perf_counter()
+        expected = [
+            (c.location.line, c.location.column)
+            for c in tu.cursor.walk_preorder()
+            if c.kind == CursorKind.BINARY_OPERATOR
+            and c.type.spelling.startswith("unsigned")
+        ]
+        cursor_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        flat = FlatTU.from_tu(tu)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        positions = flat.select(
+            CursorKind.BINARY_OPERATOR,
+            type_spelling=lambda s: s.startswith("unsigned"),
+        )
+        result = [(flat.line[i], flat.column[i]) for i in positions]
+        query_time = time.perf_counter() - start
+        assert result == expected
+
+        start = time.perf_counter()
+        data = pickle.dumps(flat)
+        pickle.loads(data)
+        pickle_time = time.perf_counter() - start
+
+    print(f"cursors: {len(flat)}, matches: {len(result)}")
+    print(f"query on cursors:          {cursor_time * 1000:8.2f}ms")
+    print(f"build snapshot:            {build_time * 1000:8.2f}ms")
+    print(f"query on snapshot:         {query_time * 1000:8.2f}ms")
+    print(
+        f"pickle round trip:         {pickle_time * 1000:8.2f}ms, "
+        f"{len(data) / 1024:.0f}KB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark of ``FunctionDefModel.from_cursor``.
+
+Compares the single-pass extractor with the previous implementation, which
+traversed each function body three times (declarations, call expressions and
+global references), on the ``extractor-demos`` assets and on a synthetic
+function with deeply nested blocks.
+
+Usage: python benchmarks/bench_function_extraction.py [nesting_depth]
+"""
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+from clang.cindex import Cursor, CursorKind
+
+from PyBirdViewCode.clang_utils import (
+    FunctionDefModel,
+    all_globals,
+    forget_cursor_index,
+    get_var_refs,
+    is_function_definition,
+    parse_file,
+)
+from PyBirdViewCode.clang_utils.code_attributes.extract_data_structure import (
+    ParamDefModel,
+    VarDefModel,
+    context,
+)
+
+ASSETS = os.path.join(os.path.dirname(__file__), "..", "tests", "assets")
+
+
+def multi_pass_extract(node: Cursor) -> FunctionDefModel:
+    # The extractor before the single-pass one, which traversed the function
+    # body for declarations, call expressions and global references in turn.
+    # Also the reference implementation in tests/test_clangutils.
+    fdm = FunctionDefModel(node.spelling, node.type)
+    fdm.update_common_info(node)
+    for child in list(node.walk_preorder()):
+        if child.kind == CursorKind.PARM_DECL:
+            fdm.params.append(ParamDefModel.from_cursor(child))
+        elif child.kind == CursorKind.VAR_DECL:
+            fdm.locals.append(VarDefModel.from_cursor(child))
+    for child in node.walk_preorder():
+        if child.kind == CursorKind.CALL_EXPR:
+            fdm.callings.append(child.spelling)
+    fdm.referenced_globals = list(
+        get_var_refs(node, False)
+        .filter(lambda var_ref: var_ref.spelling in context.global_vars)
+        .attributes("spelling")
+        .to_set()
+    )
+    return fdm
+
+
+def generate_deep_nesting(path: str, depth: int):
+    with open(path, "w") as f:
+        f.write("int g;\nint callee(int x) { return x; }\nint deep(int n)\n{\n")
+        for i in range(depth):
+            f.write(f"if (n > {i}) {{ int v{i} = callee(g + {i});\n")
+        f.write("g = n;\n" + "}\n" * depth + "return g;\n}\n")
+
+
+def function_definitions(file: str):
+    c = parse_file(file).cursor
+    context.global_vars = all_globals(c).attributes("spelling").to_set()
+    return [
+        child
+        for child in c.walk_preorder()
+        if child.kind == CursorKind.FUNCTION_DECL and is_function_definition(child)
+    ]
+
+
+def summary(fdm: FunctionDefModel):
+    return (
+        [p.spelling for p in fdm.params],
+        [v.spelling for v in fdm.locals],
+        fdm.callings,
+        set(fdm.referenced_globals),
+    )
+
+
+def time_extraction(extract, functions, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        # Measure from a cold cursor index
+        for function in functions:
+            forget_cursor_index(function.translation_unit)
+        start = time.perf_counter()
+        for function in functions:
+            extract(function)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(title: str, files):
+    functions = [f for file in files for f in function_definitions(file)]
+    for function in functions:
+        old, new = multi_pass_extract(function), FunctionDefModel.from_cursor(function)
+        assert summary(old) == summary(new), function.spelling
+    before = time_extraction(multi_pass_extract, functions)
+    after = time_extraction(FunctionDefModel.from_cursor, functions)
+    print(f"{title} ({len(functions)} functions)")
+    print(f"  multi-pass:   {before * 1000:8.2f}ms")
+    print(f"  single-pass:  {after * 1000:8.2f}ms")
+    print(f"  speedup:      {before / after:8.1f}x")
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    compare(
+        "extractor-demos",
+        sorted(glob.glob(os.path.join(ASSETS, "extractor-demos", "*.c"))),
+    )
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "deep.c")
+        generate_deep_nesting(path, depth)
+        compare(f"deep nesting, depth {depth}", [path])
+
+
+if __name__ == "__main__":
+    main()
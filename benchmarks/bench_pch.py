@@ -0,0 +1,74 @@
+"""
+Benchmark of per-file parse time with and without a precompiled header.
+
+Generates a project whose source files all include the same ~200KB header,
+then parses every file with ``parse_file``, first from scratch and then with
+the header precompiled by ``PrecompiledHeader``.
+
+Usage: python benchmarks/bench_pch.py [number_of_files]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from PyBirdViewCode.clang_utils import PrecompiledHeader, parse_file, set_default_pch
+
+
+def generate_project(folder: str, files_count: int):
+    header = os.path.join(folder, "platform.h")
+    with open(header, "w") as f:
+        f.write("#ifndef PLATFORM_H\n#define PLATFORM_H\n")
+        for i in range(1900):
+            f.write(
+                f"typedef struct S{i} {{ int a; double b; char c[16]; }} S{i};\n"
+                f"int func{i}(S{i} *p, int x);\n"
+                f"#define MACRO{i} {i}\n"
+            )
+        f.write("#endif\n")
+    sources = []
+    for i in range(files_count):
+        source = os.path.join(folder, f"file{i}.c")
+        with open(source, "w") as f:
+            f.write(
+                '#include "platform.h"\n'
+                f"int entry{i}(void) {{ S{i} s; return func{i}(&s, MACRO{i}); }}\n"
+            )
+        sources.append(source)
+    return header, sources
+
+
+def time_parse(sources) -> float:
+    start = time.perf_counter()
+    for source in sources:
+        parse_file(source)
+    return (time.perf_counter() - start) / len(sources)
+
+
+def main():
+    files_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.TemporaryDirectory() as folder:
+        header, sources = generate_project(folder, files_count)
+        print(
+            f"header size: {os.path.getsize(header) / 1024:.0f}KB, files: {files_count}"
+        )
+
+        before = time_parse(sources)
+
+        pch = PrecompiledHeader([header], cache_dir=os.path.join(folder, "pch"))
+        start = time.perf_counter()
+        pch.build()
+        build_time = time.perf_counter() - start
+        set_default_pch(pch)
+        after = time_parse(sources)
+        set_default_pch(None)
+
+    print(f"PCH build time:          {build_time * 1000:8.2f}ms")
+    print(f"parse per file, no PCH:  {before * 1000:8.2f}ms")
+    print(f"parse per file, PCH:     {after * 1000:8.2f}ms")
+    print(f"speedup:                 {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark of ``data_structure_from_file`` with and without function bodies.
+
+Generates a file with many structures and function definitions having large
+bodies, then extracts the data structures with the full parse and with the
+skeleton parse (``function_bodies=False``).
+
+Usage: python benchmarks/bench_skeleton_parse.py [number_of_functions]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from PyBirdViewCode.clang_utils import data_structure_from_file
+
+
+def generate_file(path: str, functions_count: int):
+    with open(path, "w") as f:
+        for i in range(functions_count):
+            f.write(f"typedef struct S{i} {{ int a; double b; char c[16]; }} S{i};\n")
+            f.write(f"int func{i}(S{i} *p, int x)\n{{\n    int total = 0;\n")
+            for j in range(40):
+                f.write(
+                    f"    if (x > {j}) {{ total += p->a * {j} + (int)p->b; "
+                    f"p->c[{j % 16}] = (char)total; }}\n"
+                )
+            f.write("    return total;\n}\n")
+
+
+def time_extraction(path: str, function_bodies: bool, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data_structure_from_file(path, function_bodies=function_bodies).l
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    functions_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "large.c")
+        generate_file(path, functions_count)
+        print(
+            f"file size: {os.path.getsize(path) / 1024:.0f}KB, "
+            f"functions: {functions_count}"
+        )
+        full = time_extraction(path, True)
+        skeleton = time_extraction(path, False)
+
+    print(f"full parse:      {full * 1000:8.2f}ms")
+    print(f"skeleton parse:  {skeleton * 1000:8.2f}ms")
+    print(f"speedup:         {full / skeleton:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
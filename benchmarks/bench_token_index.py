@@ -0,0 +1,90 @@
+"""
+Benchmark of operator splitting with the token index.
+
+Splits every binary and unary operator and extracts every literal of a long
+expression, tokenizing each cursor as before and with the per-TU token index.
+
+Usage: python benchmarks/bench_token_index.py [number_of_terms]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from clang.cindex import Cursor, CursorKind
+
+from PyBirdViewCode.clang_utils import (
+    extract_literal_value,
+    forget_cursor_index,
+    parse_file,
+    split_binary_operator,
+    split_unary_operator,
+)
+
+
+def tokenizing_split(node: Cursor):
+    if node.kind == CursorKind.BINARY_OPERATOR:
+        left = next(node.get_children())
+        return list(node.get_tokens())[len(list(left.get_tokens()))].spelling
+    elif node.kind == CursorKind.UNARY_OPERATOR:
+        node_tokens = "".join([t.spelling for t in node.get_tokens()])
+        child = next(node.get_children())
+        child_tokens = "".join([t.spelling for t in child.get_tokens()])
+        if node_tokens.startswith(child_tokens):
+            return node_tokens[len(child_tokens) :]
+        return node_tokens[: -len(child_tokens)]
+    else:
+        return list(node.get_tokens())[0].spelling
+
+
+def indexed_split(node: Cursor):
+    if node.kind == CursorKind.BINARY_OPERATOR:
+        return split_binary_operator(node)[1]
+    elif node.kind == CursorKind.UNARY_OPERATOR:
+        return split_unary_operator(node)[0]
+    else:
+        return extract_literal_value(node)
+
+
+def generate_file(path: str, terms: int):
+    with open(path, "w") as f:
+        f.write("int f(int a)\n{\n    return ")
+        f.write(" + ".join(f"-a * {i}" for i in range(terms)))
+        f.write(";\n}\n")
+
+
+def main():
+    terms = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "long_expr.c")
+        generate_file(path, terms)
+        tu = parse_file(path)
+        nodes = [
+            n
+            for n in tu.cursor.walk_preorder()
+            if n.kind
+            in (
+                CursorKind.BINARY_OPERATOR,
+                CursorKind.UNARY_OPERATOR,
+                CursorKind.INTEGER_LITERAL,
+            )
+        ]
+        start = time.perf_counter()
+        expected = [tokenizing_split(n) for n in nodes]
+        before = time.perf_counter() - start
+
+        forget_cursor_index(tu)
+        start = time.perf_counter()
+        results = [indexed_split(n) for n in nodes]
+        after = time.perf_counter() - start
+        assert results == expected
+
+    print(f"terms: {terms}, cursors: {len(nodes)}")
+    print(f"tokenizing each cursor:  {before * 1000:8.2f}ms")
+    print(f"token index:             {after * 1000:8.2f}ms")
+    print(f"speedup:                 {before / after:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
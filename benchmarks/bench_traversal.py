@@ -0,0 +1,118 @@
+"""
+Benchmark of the traversal engine against the previous recursive traversal.
+
+Runs a callback on every cursor of the preprocessed Lua asset, then scans the
+binary operators of a file including system headers with and without pruning
+the declarations from headers. Finally traverses a deeply nested expression,
+where the recursive version hits the recursion limit inside the ctypes
+callback of ``get_children``, which swallows the error and truncates the
+traversal.
+
+Usage: python benchmarks/bench_traversal.py
+"""
+
+import os
+import tempfile
+import time
+
+from clang.cindex import Cursor, CursorKind
+
+from PyBirdViewCode.clang_utils import (
+    TraversalAction,
+    TraversalContext,
+    parse_file,
+    traversal_with_callback,
+)
+
+ASSETS = os.path.join(os.path.dirname(__file__), "..", "tests", "assets")
+
+
+def _recursive(node: Cursor, ctx: TraversalContext, func) -> None:
+    for subnode in node.get_children():
+        ctx._push(subnode)
+        func(ctx)
+        _recursive(subnode, ctx, func)
+        ctx._pop()
+
+
+def recursive_traversal_with_callback(node: Cursor, func):
+    ctx = TraversalContext()
+    ctx._push(node)
+    func(ctx)
+    _recursive(node, ctx, func)
+    ctx._pop()
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    tu = parse_file(os.path.join(ASSETS, "lua-preprocessed-code", "out.i"))
+    counts = {"recursive": 0, "iterative": 0}
+
+    def count(name):
+        def callback(ctx: TraversalContext):
+            counts[name] += 1
+
+        return callback
+
+    recursive = timed(
+        lambda: recursive_traversal_with_callback(tu.cursor, count("recursive"))
+    )
+    iterative = timed(lambda: traversal_with_callback(tu.cursor, count("iterative")))
+    assert counts["recursive"] == counts["iterative"]
+    print(f"full traversal of out.i ({counts['iterative']} cursors)")
+    print(f"  recursive:  {recursive * 1000:8.2f}ms")
+    print(f"  iterative:  {iterative * 1000:8.2f}ms")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "main.c")
+        with open(path, "w") as f:
+            f.write("#include <stdio.h>\n#include <stdlib.h>\n#include <string.h>\n")
+            f.write("int f(unsigned a, int b) { return a + b > 0; }\n")
+        tu = parse_file(path)
+        found = {"filtered": [], "pruned": []}
+
+        def filtered(ctx: TraversalContext):
+            node = ctx.current_node
+            if node.kind == CursorKind.BINARY_OPERATOR:
+                file = node.location.file
+                if file is not None and file.name == path:
+                    found["filtered"].append(node.location.line)
+
+        def pruned(ctx: TraversalContext):
+            node = ctx.current_node
+            if ctx.depth == 1:
+                file = node.location.file
+                if file is None or file.name != path:
+                    return TraversalAction.SKIP_CHILDREN
+            elif node.kind == CursorKind.BINARY_OPERATOR:
+                found["pruned"].append(node.location.line)
+
+        filtering = timed(lambda: traversal_with_callback(tu.cursor, filtered))
+        pruning = timed(lambda: traversal_with_callback(tu.cursor, pruned))
+        assert found["filtered"] == found["pruned"]
+        print("binary operators of a file including stdio.h, stdlib.h and string.h")
+        print(f"  filtered by location:  {filtering * 1000:8.2f}ms")
+        print(f"  header decls pruned:   {pruning * 1000:8.2f}ms")
+
+        depth = 1200
+        path = os.path.join(folder, "deep.c")
+        with open(path, "w") as f:
+            f.write("int f(int a) { return " + "(" * depth + "a" + ")" * depth + "; }")
+        deep = parse_file(path, [f"-fbracket-depth={depth + 10}"]).cursor
+        counts = {"recursive": 0, "iterative": 0}
+        recursive_traversal_with_callback(deep, count("recursive"))
+        elapsed = timed(lambda: traversal_with_callback(deep, count("iterative")))
+        print(f"expression nested {depth} levels deep")
+        print(f"  recursive:  {counts['recursive']} cursors visited")
+        print(
+            f"  iterative:  {counts['iterative']} cursors visited, {elapsed * 1000:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of the binary UAST format against ``to_dict``/``from_dict`` with
+JSON, and pickle.
+
+Round-trips the UAST of the preprocessed Lua asset, then decodes a single
+function from a memory-mapped file, which only decodes its subtree.
+
+Usage: python benchmarks/bench_uast_binary.py
+"""
+
+import json
+import os
+import pickle
+import tempfile
+import time
+
+from PyBirdViewCode.uast import get_file_uast
+from PyBirdViewCode.uast import universal_ast_nodes as nodes
+from PyBirdViewCode.uast.uast_binary import UASTReader, dump_uast, dumps_uast, load_uast
+
+ASSETS = os.path.join(os.path.dirname(__file__), "..", "tests", "assets")
+
+
+def timed(func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    uast = get_file_uast(
+        os.path.join(ASSETS, "universal-ast-extraction", "lua-preprocessed.i")
+    )
+    n_nodes = len(uast.iter_nodes().l)
+    print(f"lua-preprocessed.i ({n_nodes} nodes)")
+    print(f"  {'format':8} {'size':>10} {'encode':>10} {'decode':>10}")
+
+    encoded, encode = timed(lambda: json.dumps(uast.to_dict()))
+    _, decode = timed(lambda: nodes.SourceElement.from_dict(json.loads(encoded)))
+    print(
+        f"  {'json':8} {len(encoded):10d} {encode * 1e3:8.1f}ms {decode * 1e3:8.1f}ms"
+    )
+
+    encoded, encode = timed(lambda: pickle.dumps(uast))
+    _, decode = timed(lambda: pickle.loads(encoded))
+    print(
+        f"  {'pickle':8} {len(encoded):10d} {encode * 1e3:8.1f}ms {decode * 1e3:8.1f}ms"
+    )
+
+    encoded, encode = timed(lambda: dumps_uast(uast))
+    decoded, decode = timed(lambda: load_uast(encoded))
+    assert decoded == uast
+    print(
+        f"  {'binary':8} {len(encoded):10d} {encode * 1e3:8.1f}ms {decode * 1e3:8.1f}ms"
+    )
+
+    methods = sorted(
+        uast.filter_by(nodes.MethodDecl).l, key=lambda m: len(m.iter_nodes().l)
+    )
+    # A function of median size
+    method = methods[len(methods) // 2]
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "lua.uast")
+        dump_uast(uast, path)
+
+        def find():
+            with UASTReader(path) as reader:
+                return reader.find(nodes.MethodDecl, method.name.id)
+
+        found, lazy = timed(find)
+        assert method in found
+        _, full = timed(lambda: load_uast(path))
+    print(
+        f"decode `{method.name.id}` ({len(method.iter_nodes().l)} nodes) from a"
+        f" memory-mapped file of {len(methods)} functions"
+    )
+    print(f"  whole file:   {full * 1e3:8.2f}ms")
+    print(f"  subtree only: {lazy * 1e3:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
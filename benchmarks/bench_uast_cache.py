@@ -0,0 +1,45 @@
+"""
+Benchmark of ``get_file_uast`` with a cold and a warm ``UASTCache``.
+
+Converts the C assets of the UAST tests, as a nightly pipeline converting an
+unchanged project twice would do.
+
+Usage: python benchmarks/bench_uast_cache.py
+"""
+
+import glob
+import os
+import tempfile
+import time
+
+from PyBirdViewCode.uast import UASTCache, get_file_uast
+
+ASSETS = os.path.join(os.path.dirname(__file__), "..", "tests", "assets")
+
+
+def convert_all(files, cache=None):
+    start = time.perf_counter()
+    uasts = [get_file_uast(file, cache=cache, deterministic=True) for file in files]
+    return uasts, time.perf_counter() - start
+
+
+def main():
+    files = sorted(
+        glob.glob(os.path.join(ASSETS, "universal-ast-extraction", "*.[ci]"))
+    )
+    _, uncached = convert_all(files)
+    with tempfile.TemporaryDirectory() as folder:
+        cache = UASTCache(folder)
+        expected, cold = convert_all(files, cache)
+        uasts, warm = convert_all(files, cache)
+        assert uasts == expected
+        assert cache.hits == len(files)
+
+    print(f"convert {len(files)} files")
+    print(f"  no cache:   {uncached * 1e3:8.1f}ms")
+    print(f"  cold cache: {cold * 1e3:8.1f}ms")
+    print(f"  warm cache: {warm * 1e3:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark of the lazy conversion of function bodies against the eager one.
+
+Opens the preprocessed Lua asset, whose headers define dozens of functions,
+and builds the CPG of a single function.
+
+Usage: python benchmarks/bench_uast_lazy.py [function]
+"""
+
+import os
+import sys
+import time
+
+from PyBirdViewCode.uast import UASTQuery, get_file_uast, get_method_cpg
+from PyBirdViewCode.uast import universal_ast_nodes as nodes
+
+ASSETS = os.path.join(os.path.dirname(__file__), "..", "tests", "assets")
+
+
+def method_cpg(file: str, name: str, lazy: bool):
+    start = time.perf_counter()
+    uast = get_file_uast(file, lazy=lazy)
+    converted = time.perf_counter()
+    method = next(m for m in UASTQuery.iter_methods(uast, name) if m.body is not None)
+    get_method_cpg(method)
+    done = time.perf_counter()
+    methods = uast.node_index.of_type(nodes.MethodDecl)
+    n_resolved = sum(m.is_resolved("body") and m.body is not None for m in methods)
+    return converted - start, done - converted, n_resolved
+
+
+def main():
+    name = sys.argv[1] if len(sys.argv) > 1 else "luaV_lessthan"
+    file = os.path.join(ASSETS, "universal-ast-extraction", "lua-preprocessed.i")
+    print(f"CPG of `{name}` in lua-preprocessed.i")
+    for lazy in (False, True):
+        convert, query, n_resolved = method_cpg(file, name, lazy)
+        label = "lazy" if lazy else "eager"
+        print(
+            f"  {label:6} convert {convert * 1e3:8.1f}ms,"
+            f" find and CPG {query * 1e3:7.1f}ms,"
+            f" {n_resolved} bodies converted"
+        )
+
+
+if __name__ == "__main__":
+    main()
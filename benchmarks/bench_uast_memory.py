@@ -0,0 +1,106 @@
+"""
+Benchmark of the memory held by UAST nodes with ``__slots__`` against the
+previous nodes keeping their attributes in ``__dict__``.
+
+Converts the C assets of ``universal-ast-extraction`` a number of times, as if
+they were the files of a larger project, and measures the memory allocated by
+the UASTs with ``tracemalloc``. The previous representation is emulated by
+copying each UAST into instances of plain classes, with a fresh location tuple
+and fresh strings for each node, as the converter used to create them.
+
+Usage: python benchmarks/bench_uast_memory.py [copies]
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from PyBirdViewCode.uast import get_file_uast
+from PyBirdViewCode.uast import universal_ast_nodes as nodes
+
+ASSETS = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "assets", "universal-ast-extraction"
+)
+FILES = [
+    "c-types.c",
+    "control-flow-multi-stmt.c",
+    "dataflow-demo.c",
+    "demo1.c",
+    "demo2.c",
+    "demo3.c",
+    "error-handling.c",
+    "global-variables.c",
+    "local-variables.c",
+    "lua-preprocessed.i",
+    "test_operators.c",
+    "variable-types.c",
+]
+
+_dict_classes = {}
+
+
+def _fresh(value):
+    if type(value) is str:
+        return (value + ".")[:-1]
+    if type(value) is tuple:
+        return tuple(list(value))
+    return value
+
+
+def dict_based_copy(value):
+    if isinstance(value, list):
+        return [dict_based_copy(v) for v in value]
+    if not isinstance(value, nodes.SourceElement):
+        return _fresh(value)
+    cls = _dict_classes.get(type(value))
+    if cls is None:
+        cls = _dict_classes[type(value)] = type(type(value).__name__, (), {})
+    copy = cls()
+    for slot, v in value._slot_values().items():
+        setattr(copy, slot.lstrip("_"), dict_based_copy(v))
+    return copy
+
+
+def measured(func):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    sys.setrecursionlimit(100000)
+    paths = [os.path.join(ASSETS, f) for f in FILES]
+    # Warm up the caches of the parser, which are not part of the UASTs
+    for path in paths:
+        get_file_uast(path)
+    nodes._interned_locations.clear()
+
+    uasts, slots_size, slots_time = measured(
+        lambda: [get_file_uast(p) for _ in range(copies) for p in paths]
+    )
+    n_nodes = sum(len(uast.filter_by(nodes.SourceElement).l) for uast in uasts)
+    _, dict_size, _ = measured(lambda: [dict_based_copy(u) for u in uasts])
+
+    print(f"{copies} copies of {len(paths)} files, {n_nodes} nodes")
+    print(
+        f"  __dict__:  {dict_size / 2**20:8.2f}MiB"
+        f"  {dict_size / n_nodes:6.1f}B/node"
+    )
+    print(
+        f"  __slots__: {slots_size / 2**20:8.2f}MiB"
+        f"  {slots_size / n_nodes:6.1f}B/node  (converted in {slots_time:.2f}s)"
+    )
+    print(f"  {len(nodes._interned_locations)} distinct locations")
+
+
+if __name__ == "__main__":
+    main()
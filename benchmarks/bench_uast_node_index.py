@@ -0,0 +1,74 @@
+"""
+Benchmark of the node index of ``CompilationUnit`` against walking the whole
+UAST on each query.
+
+Generates a C file with thousands of functions, each calling the previous
+one, and looks up the definition of the callee of every call expression by
+``UASTQuery.get_method``, as the system dependence graph example does.
+
+Usage: python benchmarks/bench_uast_node_index.py [functions]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from PyBirdViewCode.uast import UASTQuery, get_file_uast
+from PyBirdViewCode.uast import universal_ast_nodes as nodes
+from PyBirdViewCode.uast.uast_queries.queries import create_method_name_filter
+
+
+def walking_get_method(uast: nodes.SourceElement, method_name: str):
+    # The previous implementation, filtering all nodes of the UAST
+    return (
+        nodes.SourceElement.filter_by(uast, nodes.MethodDecl)
+        .filter(create_method_name_filter(method_name))
+        .head()
+    )
+
+
+def main():
+    n_functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "many_functions.c")
+        with open(path, "w") as f:
+            f.write("int f0(int x) { return x; }\n")
+            for i in range(1, n_functions):
+                f.write(f"int f{i}(int x) {{ int y = x + {i}; return f{i - 1}(y); }}\n")
+        uast = get_file_uast(path)
+
+    calls = nodes.SourceElement.filter_by(uast, nodes.CallExpr).l
+    callees = [call.name.id for call in calls]
+    n_nodes = len(uast.iter_nodes().l)
+    print(f"{n_functions} functions, {n_nodes} nodes, {len(calls)} calls")
+
+    # Walking is quadratic, so only a sample of the calls is timed
+    sample = callees[:: max(1, len(callees) // 100)]
+    start = time.perf_counter()
+    expected = [walking_get_method(uast, name) for name in sample]
+    walking = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    found = [UASTQuery.get_method(uast, name) for name in callees]
+    indexed = (time.perf_counter() - start) / len(callees)
+    assert all(a is found[callees.index(name)] for a, name in zip(expected, sample))
+
+    start = time.perf_counter()
+    uast.invalidate_index()
+    uast.node_index
+    build = time.perf_counter() - start
+
+    print(f"  walking:  {walking * 1e3:10.3f}ms per lookup")
+    print(
+        f"  indexed:  {indexed * 1e3:10.3f}ms per lookup"
+        f" (index built in {build * 1e3:.1f}ms)"
+    )
+    print(
+        f"  all {len(callees)} lookups: {walking * len(callees):.2f}s"
+        f" -> {indexed * len(callees) + build:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark of the peak memory of streaming the top-level declarations of a
+file with ``iter_file_declarations`` against converting the whole file with
+``get_file_uast``.
+
+Generates C files with a growing number of functions, as a preprocessed
+translation unit would have, and visits the declarations of each file once.
+
+Usage: python benchmarks/bench_uast_streaming.py [functions ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PyBirdViewCode.uast import get_file_uast, iter_file_declarations
+
+FUNCTION = """
+int global_{i} = {i};
+
+int function_{i}(int a, int b)
+{{
+    int s = global_{i};
+    for (int k = 0; k < a; k++) {{
+        if (k % 3 == 0)
+            s += k * b;
+        else
+            s -= (k + b) / 2;
+    }}
+    return s;
+}}
+"""
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def stream(file: str) -> int:
+    return sum(1 for _ in iter_file_declarations(file))
+
+
+def convert(file: str) -> int:
+    return len(get_file_uast(file).children)
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [250, 1000, 4000]
+    with tempfile.TemporaryDirectory() as folder:
+        for count in counts:
+            file = os.path.join(folder, f"generated_{count}.c")
+            with open(file, "w") as f:
+                for i in range(count):
+                    f.write(FUNCTION.format(i=i))
+            print(f"{count} functions, {os.path.getsize(file) // 1024}KB")
+            for label, func in (("streamed", stream), ("whole", convert)):
+                n, peak, elapsed = peak_memory(lambda: func(file))
+                assert n == 2 * count
+                print(
+                    f"  {label:8} peak {peak / 1e6:7.1f}MB,"
+                    f" {elapsed * 1e3:8.1f}ms (traced)"
+                )
+
+
+if __name__ == "__main__":
+    main()
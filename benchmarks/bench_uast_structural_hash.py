@@ -0,0 +1,118 @@
+"""
+Benchmark of deduplicating UAST subtrees by structural hashes against
+pairwise comparisons with ``==``.
+
+Groups the identical functions, ignoring locations, of a project made of
+the preprocessed Lua asset and a copy of it moved by a few lines, as if
+the same header were included in two files. Then builds the CPGs of all
+functions, reusing those of identical functions.
+
+Usage: python benchmarks/bench_uast_structural_hash.py
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from PyBirdViewCode.uast import (
+    StructuralDeduplicator,
+    get_file_uast,
+    get_method_cpg,
+    group_identical,
+)
+from PyBirdViewCode.uast import universal_ast_nodes as nodes
+
+ASSETS = os.path.join(os.path.dirname(__file__), "..", "tests", "assets")
+
+
+def pairwise_groups(methods):
+    # Without hashes, each function is compared with the first function of
+    # every group found before
+    groups = []
+    for method in methods:
+        for group in groups:
+            if group[0]._structure_equal(method, True):
+                group.append(method)
+                break
+        else:
+            groups.append([method])
+    return groups
+
+
+def compare(label, subtrees):
+    for subtree in subtrees:
+        subtree.clear_structural_hashes()
+    start = time.perf_counter()
+    expected = pairwise_groups(subtrees)
+    pairwise = time.perf_counter() - start
+
+    for subtree in subtrees:
+        subtree.clear_structural_hashes()
+    start = time.perf_counter()
+    groups = group_identical(subtrees)
+    hashed = time.perf_counter() - start
+    assert [[id(m) for m in g] for g in groups] == [
+        [id(m) for m in g] for g in expected
+    ]
+
+    print(f"{len(subtrees)} {label}, {len(groups)} distinct")
+    print(f"  pairwise: {pairwise * 1e3:10.1f}ms")
+    print(f"  hashed:   {hashed * 1e3:10.1f}ms")
+
+
+def main():
+    lua = os.path.join(ASSETS, "universal-ast-extraction", "lua-preprocessed.i")
+    with tempfile.TemporaryDirectory() as folder:
+        moved = os.path.join(folder, "lua-moved.i")
+        with open(moved, "w") as f:
+            f.write("\n\n\n")
+        with open(moved, "a") as f, open(lua) as original:
+            shutil.copyfileobj(original, f)
+        uasts = [get_file_uast(lua), get_file_uast(moved)]
+
+    compare(
+        "binary expressions in lua-preprocessed.i",
+        uasts[0].filter_by(nodes.BinaryExpr).l,
+    )
+    methods = [
+        method
+        for uast in uasts
+        for method in uast.filter_by(nodes.MethodDecl)
+        if method.body is not None
+    ]
+    compare("function definitions in 2 copies of lua-preprocessed.i", methods)
+
+    def supported(method):
+        # The analyses do not support some constructs yet, like asm
+        # statements
+        try:
+            get_method_cpg(method)
+            return True
+        except Exception:
+            return False
+
+    half = len(methods) // 2
+    sample = [m for m in methods[:half] if supported(m)]
+    sample += [methods[half + methods.index(m)] for m in sample]
+
+    start = time.perf_counter()
+    for method in sample:
+        get_method_cpg(method)
+    plain = time.perf_counter() - start
+
+    dedupe = StructuralDeduplicator()
+    start = time.perf_counter()
+    for method in sample:
+        get_method_cpg(method, dedupe=dedupe)
+    deduped = time.perf_counter() - start
+    print(f"CPGs of {len(sample)} functions, half of them copies")
+    print(f"  plain:    {plain * 1e3:10.1f}ms")
+    print(
+        f"  deduped:  {deduped * 1e3:10.1f}ms"
+        f" ({dedupe.misses} computed, {dedupe.hits} reused)"
+    )
+
+
+if __name__ == "__main__":
+    main()
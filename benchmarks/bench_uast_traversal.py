@@ -0,0 +1,96 @@
+"""
+Benchmark of the UAST traversals against the previous recursive generators.
+
+Iterates all nodes of the UAST of the preprocessed Lua asset, and walks it
+with ``apply_with_hierarchy``. Then builds an expression chain nested
+10000 deep, on which the recursive versions raise ``RecursionError``.
+
+Usage: python benchmarks/bench_uast_traversal.py
+"""
+
+import os
+import time
+from itertools import chain
+
+from PyBirdViewCode.uast import get_file_uast
+from PyBirdViewCode.uast import universal_ast_nodes as nodes
+
+ASSETS = os.path.join(os.path.dirname(__file__), "..", "tests", "assets")
+
+
+def recursive_walk(node: nodes.SourceElement):
+    for f in chain(node._fields, node._common_fields):
+        field = getattr(node, f)
+        if field:
+            if isinstance(field, list):
+                for elem in field:
+                    if isinstance(elem, nodes.SourceElement):
+                        yield from recursive_walk(elem)
+            elif isinstance(field, nodes.SourceElement):
+                yield from recursive_walk(field)
+    yield node
+
+
+def recursive_apply(node: nodes.SourceElement, walk_func, ctx):
+    ctx._push(node)
+    if walk_func(ctx):
+        for f in chain(node._fields, node._common_fields):
+            field = getattr(node, f)
+            if field:
+                if isinstance(field, list):
+                    for elem in field:
+                        if isinstance(elem, nodes.SourceElement):
+                            recursive_apply(elem, walk_func, ctx)
+                elif isinstance(field, nodes.SourceElement):
+                    recursive_apply(field, walk_func, ctx)
+    ctx._pop()
+
+
+def timed(func, repeat=5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    uast = get_file_uast(
+        os.path.join(ASSETS, "universal-ast-extraction", "lua-preprocessed.i")
+    )
+    n_nodes = len(uast.iter_nodes().l)
+    assert [id(n) for n in recursive_walk(uast)] == [
+        id(n) for n in uast.walk_postorder()
+    ]
+
+    print(f"iterate all nodes of lua-preprocessed.i ({n_nodes} nodes)")
+    print(f"  recursive:  {timed(lambda: list(recursive_walk(uast))) * 1000:8.2f}ms")
+    print(f"  iterative:  {timed(lambda: uast.iter_nodes().l) * 1000:8.2f}ms")
+
+    def walk_func(ctx):
+        return True
+
+    print("apply_with_hierarchy")
+    recursive = timed(
+        lambda: recursive_apply(uast, walk_func, nodes.SourceElement.ApplyContext())
+    )
+    print(f"  recursive:  {recursive * 1000:8.2f}ms")
+    iterative = timed(lambda: uast.apply_with_hierarchy(walk_func))
+    print(f"  iterative:  {iterative * 1000:8.2f}ms")
+
+    expr = nodes.Name("x")
+    for _ in range(10000):
+        expr = nodes.BinaryExpr("+", expr, nodes.Name("y"))
+    print("expression chain nested 10000 deep")
+    try:
+        list(recursive_walk(expr))
+        print("  recursive:  ok")
+    except RecursionError:
+        print("  recursive:  RecursionError")
+    iterative = timed(lambda: expr.filter_by(nodes.Name).l)
+    print(f"  iterative:  {iterative * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
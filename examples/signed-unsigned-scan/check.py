@@ -1,6 +1,7 @@
 import json
 import sys
 import time
+from typing import List
 
 from PyBirdViewCode.clang_utils import *
 from PyBirdViewCode.utils.service import Position, Problem
@@ -15,11 +16,12 @@ def find_hidden_conversions(node: Cursor) -> bool:
 
     def callback(ctx: TraversalContext):
         nonlocal has_unsigned, has_signed
-        print(ctx.current_node.type.spelling)
         if ctx.current_node.type.spelling.startswith("unsigned"):
             has_unsigned = True
-        if not ctx.current_node.type.spelling.startswith("unsigned"):
+        else:
             has_signed = True
+        if has_unsigned and has_signed:
+            return TraversalAction.STOP
 
     traversal_with_callback(node, callback)
     return has_unsigned and has_signed
@@ -47,16 +49,27 @@ def check_signed_unsigned(node: Cursor):
                 # )
 
 
+def scan_file(file_name: str) -> List[Problem]:
+    tu = parse_file(file_name)
+    problems: List[Problem] = []
+
+    def callback(ctx: TraversalContext):
+        node = ctx.current_node
+        if ctx.depth == 1:
+            # Never cross into declarations from headers
+            if node.location.file is None or node.location.file.name != tu.spelling:
+                return TraversalAction.SKIP_CHILDREN
+        elif node.kind == CursorKind.BINARY_OPERATOR:
+            problem = check_signed_unsigned(node)
+            if problem is not None:
+                problems.append(problem)
+
+    traversal_with_callback(tu.cursor, callback)
+    return problems
+
+
 def check(file_name: str):
-    problems = (
-        iter_ast_from_file(file_name)
-        .filter(lambda c: c.kind == CursorKind.BINARY_OPERATOR)
-        .map(check_signed_unsigned)
-        .filter(lambda item: item is not None)
-        .cast(Problem)
-        .map(lambda item: item.to_json())
-        .l
-    )
+    problems = [problem.to_json() for problem in scan_file(file_name)]
 
     with open("problems.json", "w") as f:
         json.dump(problems, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,128 @@
+from PyBirdViewCode.clang_utils import ProjectCallGraph
+
+
+def _write_project(folder):
+    (folder / "lib.h").write_text("int compute(int n);\nint is_even(int n);\n")
+    (folder / "lib.c").write_text(
+        "#include <stdlib.h>\n"
+        '#include "lib.h"\n'
+        "static int helper(int n) { return abs(n); }\n"
+        "int is_odd(int n) { return n == 0 ? 0 : is_even(n - 1); }\n"
+        "int is_even(int n) { return n == 0 ? 1 : is_odd(n - 1); }\n"
+        "int compute(int n) { return helper(n) + is_even(n); }\n"
+    )
+    (folder / "main.c").write_text(
+        '#include "lib.h"\n'
+        "static int helper(int n) { return n; }\n"
+        "int main() { return compute(helper(1)) + compute(2); }\n"
+    )
+
+
+def test_project_call_graph(tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    _write_project(folder)
+    call_graph = ProjectCallGraph(str(tmp_path / "call_graph.sqlite3"))
+    assert sorted(call_graph.update(str(folder), workers=2)) == [
+        str(folder / "lib.c"),
+        str(folder / "lib.h"),
+        str(folder / "main.c"),
+    ]
+
+    (main,) = call_graph.usrs_named("main")
+    (compute,) = call_graph.usrs_named("compute")
+    # The static helpers are different functions
+    helpers = call_graph.usrs_named("helper")
+    assert len(helpers) == 2
+    main_helper = [u for u in helpers if "main.c" in u][0]
+    lib_helper = [u for u in helpers if "lib.c" in u][0]
+
+    g = call_graph.graph()
+    assert sorted(call_graph.callees(main)) == sorted([compute, main_helper])
+    assert g.edges[main, compute]["sites"] == [
+        (str(folder / "main.c"), 3, 21),
+        (str(folder / "main.c"), 3, 42),
+    ]
+    assert g.nodes[compute]["file"] == str(folder / "lib.c")
+    (abs_usr,) = call_graph.callees(lib_helper)
+    assert g.nodes[abs_usr] == {"name": "abs", "defined": False}
+    assert abs_usr not in call_graph.graph(include_external=False)
+
+    (is_odd,) = call_graph.usrs_named("is_odd")
+    (is_even,) = call_graph.usrs_named("is_even")
+    assert {is_odd, is_even} in call_graph.strongly_connected_components()
+    order = call_graph.topological_order()
+    position = {usr: i for i, component in enumerate(order) for usr in component}
+    assert position[is_odd] == position[is_even]
+    assert position[is_even] < position[compute] < position[main]
+    assert position[lib_helper] < position[compute]
+    assert call_graph.topological_order(callees_first=False)[0] == [main]
+
+    # Only the modified file is extracted again, even after reopening
+    call_graph.close()
+    call_graph = ProjectCallGraph(str(tmp_path / "call_graph.sqlite3"))
+    assert call_graph.update(str(folder), workers=1) == []
+    (folder / "main.c").write_text(
+        '#include "lib.h"\nint main() { return is_even(3); }\n'
+    )
+    assert call_graph.update(str(folder), workers=1) == [str(folder / "main.c")]
+    assert call_graph.callees(main) == [is_even]
+    assert call_graph.callers(compute) == []
+
+    call_graph.remove_file(str(folder / "lib.c"))
+    assert call_graph.usrs_named("compute") == []
+    assert not call_graph.graph().nodes[is_even]["defined"]
+
+
+def test_call_graph_update_after_header_edit(tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    (folder / "lib.h").write_text("int foo(void);\nint bar(void);\n#define CALL foo\n")
+    (folder / "main.c").write_text('#include "lib.h"\nint main() { return CALL(); }\n')
+    call_graph = ProjectCallGraph(str(tmp_path / "call_graph.sqlite3"))
+    call_graph.update(str(folder), workers=1)
+    (main,) = call_graph.usrs_named("main")
+    assert call_graph.callees(main) == ["c:@F@foo"]
+
+    (folder / "lib.h").write_text("int foo(void);\nint bar(void);\n#define CALL bar\n")
+    assert sorted(call_graph.update(str(folder), workers=1)) == [
+        str(folder / "lib.h"),
+        str(folder / "main.c"),
+    ]
+    assert call_graph.callees(main) == ["c:@F@bar"]
+
+
+def test_call_graph_of_cpp_methods(tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    (folder / "a.cpp").write_text(
+        "int helper(int n) { return n; }\n"
+        "namespace ns {\n"
+        "struct A {\n"
+        "    A(int n) : n(helper(n)) {}\n"
+        "    ~A() { reset(); }\n"
+        "    int get() const { return n; }\n"
+        "    void reset();\n"
+        "    int n;\n"
+        "};\n"
+        "void A::reset() { n = helper(0); }\n"
+        "}\n"
+        "template <typename T> T twice(T t) { return t * helper(2); }\n"
+        "int main() { ns::A a(1); return a.get() + twice(2); }\n"
+    )
+    call_graph = ProjectCallGraph(str(tmp_path / "call_graph.sqlite3"))
+    assert call_graph.update(str(folder), ["-xc++"], workers=1) == [
+        str(folder / "a.cpp")
+    ]
+    for name in ("A", "~A", "get", "reset", "twice", "main"):
+        assert len(call_graph.usrs_named(name)) == 1, name
+    (helper,) = call_graph.usrs_named("helper")
+    (reset,) = call_graph.usrs_named("reset")
+    (destructor,) = call_graph.usrs_named("~A")
+    assert sorted(call_graph.callers(helper)) == sorted(
+        call_graph.usrs_named("A") + [reset] + call_graph.usrs_named("twice")
+    )
+    assert call_graph.callees(destructor) == [reset]
+    (main,) = call_graph.usrs_named("main")
+    (get,) = call_graph.usrs_named("get")
+    assert get in call_graph.callees(main)
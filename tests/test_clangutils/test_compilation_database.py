@@ -0,0 +1,90 @@
+import json
+import warnings
+
+import pytest
+
+import tests.base as base
+from PyBirdViewCode.clang_utils import (
+    CompilationDatabase,
+    FunctionDefModel,
+    ingest_data_structures,
+    normalize_compile_args,
+    parse_file,
+)
+from PyBirdViewCode.uast import ingest_file_uasts, universal_ast_nodes as nodes
+
+
+def _write_database(tmp_path, commands):
+    path = tmp_path / "compile_commands.json"
+    with open(path, "w") as f:
+        json.dump(commands, f)
+    return str(path)
+
+
+def test_normalize_compile_args():
+    args = normalize_compile_args(
+        ["gcc", "-c", "-Iinc", "-I", "../other", "-DX=1", "-o", "a.o", "a.c"],
+        "/proj/src/a.c",
+        "/proj/src",
+    )
+    assert args == ("-I/proj/src/inc", "-I", "/proj/other", "-DX=1")
+
+
+def test_compilation_database(tmp_path):
+    folder = base.asset_path("structure-demo")
+    commands = [
+        {
+            "directory": folder,
+            "command": "cc -c -I. global-use.c",
+            "file": "global-use.c",
+        },
+        # Identical translation unit, should be merged
+        {
+            "directory": folder,
+            "arguments": ["cc", "-c", "-I.", "global-use.c"],
+            "file": "global-use.c",
+        },
+        {
+            "directory": folder,
+            "command": "cc -c -I. global-use2.c",
+            "file": "global-use2.c",
+        },
+        # Same file compiled with different flags
+        {
+            "directory": folder,
+            "command": "cc -c -DVARIANT global-use2.c",
+            "file": "global-use2.c",
+        },
+    ]
+    with pytest.warns(UserWarning, match="compiled with different arguments"):
+        db = CompilationDatabase.from_json(_write_database(tmp_path, commands))
+    assert len(db) == 3
+    assert db.files == [
+        base.asset_path(f"structure-demo/{f}")
+        for f in ("global-use.c", "global-use2.c")
+    ]
+    assert list(db.conflicting_files().keys()) == [db.files[1]]
+    assert len(db.groups()) == 2
+    assert db.get_args(db.files[0]) == ["-I" + folder]
+    parse_file(db.files[0], db.get_args)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        results = ingest_data_structures(db, workers=2).l
+    assert len(results) == 3 and all(r.ok for r in results)
+    assert sorted((r.file, r.args) for r in results) == sorted(
+        (entry.file, entry.args) for entry in db
+    )
+    funcs = {
+        m.spelling
+        for r in results
+        if r.file == db.files[0]
+        for m in r.result
+        if isinstance(m, FunctionDefModel)
+    }
+    assert {"fun", "fun2", "fun3", "main"} <= funcs
+
+    uasts = ingest_file_uasts(
+        db, workers=1, name_filter=lambda f: f.endswith("global-use.c")
+    ).l
+    assert len(uasts) == 1 and isinstance(uasts[0].result, nodes.CompilationUnit)
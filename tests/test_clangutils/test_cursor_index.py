@@ -0,0 +1,93 @@
+import gc
+import weakref
+
+from clang.cindex import CursorKind
+
+import tests.base as base
+from PyBirdViewCode.clang_utils import (
+    all_globals,
+    forget_cursor_index,
+    get_cursor_index,
+    get_func_decl,
+    parse_file,
+)
+
+
+def test_cursor_index_matches_traversal():
+    c = base.clangutils_load_ast("extractor-demos/control-structures.c")
+    index = get_cursor_index(c)
+    assert get_cursor_index(c) is index
+    for func in c.get_children():
+        if func.kind != CursorKind.FUNCTION_DECL:
+            continue
+        for kind in (CursorKind.CALL_EXPR, CursorKind.DECL_REF_EXPR):
+            expected = [n for n in func.walk_preorder() if n.kind == kind]
+            assert index.descendants(func, kind) == expected
+        for node in func.walk_preorder():
+            assert index.children(node) == list(node.get_children())
+            assert index.owner_function(node) == func
+            for child in node.get_children():
+                assert index.parent(child) == node
+        assert index.parent(func) == c
+
+    assert index.children(c) == list(c.get_children())
+    assert all_globals(c).l == [
+        n for n in c.get_children() if n.kind == CursorKind.VAR_DECL
+    ]
+
+
+def test_forget_cursor_index():
+    c = base.clangutils_load_ast("extractor-demos/globals.c")
+    func = get_func_decl(c, "use_global")
+    index = get_cursor_index(func)
+    forget_cursor_index(func.translation_unit)
+    assert get_cursor_index(func) is not index
+
+
+def test_cursor_index_releases_translation_unit():
+    c = base.clangutils_load_ast("extractor-demos/control-structures.c")
+    index = get_cursor_index(c)
+    func = get_func_decl(c, "for_demo_omitting_1_3")
+    calls = index.descendants(func, CursorKind.CALL_EXPR)
+    assert index.owner_function(calls[0]) == func
+    assert all(call.translation_unit is c.translation_unit for call in calls)
+
+    # Freed by reference counting, not by the cyclic garbage collector
+    tu = weakref.ref(c.translation_unit)
+    gc.disable()
+    try:
+        del c, func, calls
+        assert tu() is None
+    finally:
+        gc.enable()
+
+
+def test_get_func_decl_in_namespace(tmp_path):
+    file = tmp_path / "namespace.cpp"
+    file.write_text(
+        "int f() { return 0; }\n"
+        "namespace ns { int f() { return 1; } int g() { return 2; } }\n"
+    )
+    c = parse_file(str(file)).cursor
+    (ns,) = [n for n in c.get_children() if n.kind == CursorKind.NAMESPACE]
+    top_level_f = get_func_decl(c, "f")
+    assert top_level_f.semantic_parent == c
+    assert get_func_decl(c, "g") is None
+    assert get_func_decl(ns, "f").semantic_parent == ns
+    assert get_func_decl(ns, "g").semantic_parent == ns
+
+
+def test_restrict_tokens():
+    c = base.clangutils_load_ast("extractor-demos/control-structures.c")
+    index = get_cursor_index(c)
+    funcs = [f for f in c.get_children() if f.kind == CursorKind.FUNCTION_DECL]
+    expected = [[t.spelling for t in f.get_tokens()] for f in funcs]
+
+    index.restrict_tokens(funcs[0], funcs[1].extent.start.offset)
+    tokens, start, _ = index.token_span(funcs[0])
+    assert tokens.start == start
+    assert tokens.offsets[-1] <= funcs[1].extent.start.offset
+    assert index.token_spellings(funcs[0]) == expected[0]
+    # Tokens outside the kept range are looked up in the whole file
+    assert [index.token_spellings(f) for f in funcs] == expected
+    assert index.token_span(funcs[0])[0].start == 0
@@ -1,7 +1,13 @@
+import glob
 from typing import Generator
 
 from PyBirdViewCode.clang_utils.code_attributes.utils import parse_file
 import tests.base as base
+from benchmarks.bench_function_extraction import (
+    function_definitions,
+    multi_pass_extract,
+    summary,
+)
 from PyBirdViewCode import MelodieFrozenGenerator, MelodieGenerator
 from PyBirdViewCode.clang_utils import (
     ClassDefModel,
@@ -13,13 +19,39 @@ from PyBirdViewCode.clang_utils import (
     StructDefModel,
     TraversalContext,
     UnionDefModel,
+    all_globals,
     beautified_print_ast,
     build_call_graph,
     data_structure_from_file,
+    ingest_data_structures,
     iter_data_structures,
     program_model_unparse,
     traversal,
 )
+from PyBirdViewCode.clang_utils.code_attributes.extract_data_structure import context
+
+NESTED_SOURCE = """
+int g;
+int inc(int x) { return x + 1; }
+int twice(int x) { return inc(inc(x)); }
+int nested(int n)
+{
+    int total = inc(twice(n));
+    for (int i = 0; i < n; i++) {
+        int step = twice(i + g);
+        if (step > 2) {
+            static int calls;
+            calls = inc(calls);
+            total += step * calls;
+        }
+    }
+    {
+        int last = total;
+        g = last;
+    }
+    return total;
+}
+"""
 
 
 def extract_tasks(c: Cursor):
@@ -75,6 +107,28 @@ def test_iter_data_structures():
     print(g)
 
 
+def test_ingest_data_structures():
+    files = [
+        base.asset_path("structure-demo/global-use.c"),
+        base.asset_path("structure-demo/global-use2.c"),
+        base.asset_path("structure-demo/not-existing.c"),
+    ]
+    results = {r.file: r for r in ingest_data_structures(files, workers=2)}
+    assert set(results.keys()) == set(files)
+
+    assert not results[files[2]].ok and "FileNotFoundError" in results[files[2]].error
+
+    sequential = data_structure_from_file(files[0]).map(lambda m: m.spelling).l
+    assert results[files[0]].ok
+    assert [m.spelling for m in results[files[0]].result] == sequential
+    fun: FunctionDefModel = (
+        MelodieGenerator(results[files[0]].result)
+        .filter(lambda m: isinstance(m, FunctionDefModel) and m.spelling == "fun")
+        .head()
+    )
+    assert fun.referenced_globals == ["g_aaaa"]
+
+
 def test_data_structure():
     c = base.clangutils_load_ast("extractor-demos/data-structure.cpp")
     traversal(c).slice(
@@ -209,3 +263,68 @@ def test_structure_basics():
     except NotImplementedError:
         pass
     print(serializable_dict)
+
+
+def test_data_structure_without_function_bodies():
+    file = base.asset_path("extractor-demos/global-use.c")
+    full = data_structure_from_file(file).l
+    skeleton = data_structure_from_file(file, function_bodies=False).l
+    assert [(m.__class__, m.spelling) for m in skeleton] == [
+        (m.__class__, m.spelling) for m in full
+    ]
+    for full_model, model in zip(full, skeleton):
+        if isinstance(model, FunctionDefModel):
+            assert [p.spelling for p in model.params] == [
+                p.spelling for p in full_model.params
+            ]
+            assert model.callings == [] and model.locals == []
+        else:
+            assert model.to_serializable_dict() == full_model.to_serializable_dict()
+
+
+def test_skipped_function_bodies(tmp_path):
+    file = tmp_path / "attributes.c"
+    file.write_text(
+        "#define ATTR\n"
+        "#define FORMAT(a, b) ATTR\n"
+        "int g;\n"
+        "int declared(void) ATTR;\n"
+        "int empty_macro(void) ATTR { return g; }\n"
+        "int macro_args(const char *f, ...) FORMAT(1, 2) { return 0; }\n"
+        "int unknown(void) __attribute__((unknown_attr))\n"
+        "/* a comment longer than the tokenized window: %s */\n"
+        "{ return 1; }\n"
+        "int first(void), second(void);\n" % ("{ " * 100)
+    )
+    full = data_structure_from_file(str(file)).l
+    assert context.global_vars == {"g"}
+    skeleton = data_structure_from_file(str(file), function_bodies=False).l
+    assert context.global_vars == set()
+    assert [m.spelling for m in skeleton] == [m.spelling for m in full]
+    assert [m.spelling for m in skeleton] == ["empty_macro", "macro_args", "unknown"]
+
+
+def test_single_pass_function_extraction(tmp_path):
+    nested_file = tmp_path / "nested.c"
+    nested_file.write_text(NESTED_SOURCE)
+    files = sorted(glob.glob(base.asset_path("extractor-demos/*.c")))
+    n_functions = 0
+    for file in files + [str(nested_file)]:
+        for node in function_definitions(file):
+            expected = summary(multi_pass_extract(node))
+            assert summary(FunctionDefModel.from_cursor(node)) == expected, (
+                file,
+                node.spelling,
+            )
+            n_functions += 1
+    assert n_functions > len(files)
+
+    c = parse_file(str(nested_file)).cursor
+    context.global_vars = all_globals(c).attributes("spelling").to_set()
+    (nested,) = [n for n in c.get_children() if n.spelling == "nested"]
+    params, locals_, callings, referenced_globals = summary(
+        FunctionDefModel.from_cursor(nested)
+    )
+    assert locals_ == ["total", "i", "step", "calls", "last"]
+    assert callings == ["inc", "twice", "twice", "inc"]
+    assert referenced_globals == {"g"}
@@ -0,0 +1,139 @@
+import os
+
+from PyBirdViewCode.clang_utils import (
+    ChangeSet,
+    FileManifest,
+    ProjectCallGraph,
+    SymbolIndex,
+    iter_files,
+    scan_files,
+)
+
+
+def _write_project(folder):
+    (folder / "include").mkdir()
+    (folder / "src").mkdir()
+    (folder / "include" / "base.h").write_text("struct Base { int x; };\n")
+    (folder / "include" / "derived.h").write_text(
+        '#include "base.h"\nstruct Derived { struct Base b; };\n'
+    )
+    (folder / "src" / "a.c").write_text(
+        "#include <stdio.h>\n#include <base.h>\nint a(void) { return 0; }\n"
+    )
+    (folder / "src" / "b.c").write_text(
+        "#include <derived.h>\nint b(void) { return 1; }\n"
+    )
+    (folder / "src" / "c.c").write_text("int c(void) { return 2; }\n")
+    (folder / "README.md").write_text("demo\n")
+
+
+def test_iter_files_order(tmp_path):
+    _write_project(tmp_path)
+    walked = [
+        os.path.join(root, f)
+        for root, _, files in os.walk(tmp_path)
+        for f in files
+        if f.endswith((".c", ".h"))
+    ]
+    assert iter_files(str(tmp_path), (".c", ".h")).l == walked
+    assert sorted(iter_files(str(tmp_path), abspath=False).l) == sorted(
+        ["README.md", "base.h", "derived.h", "a.c", "b.c", "c.c"]
+    )
+    assert [e.name for e in scan_files(str(tmp_path), lambda s: s == "c.c")] == ["c.c"]
+
+
+def test_file_manifest(tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    _write_project(folder)
+    src, include = folder / "src", folder / "include"
+    manifest_path = str(tmp_path / "manifest.json")
+    manifest = FileManifest(manifest_path, include_dirs=[str(include)])
+
+    changes = manifest.detect_changes(str(folder), (".c", ".h"))
+    assert changes.added == sorted(
+        str(p)
+        for p in [
+            include / "base.h",
+            include / "derived.h",
+            src / "a.c",
+            src / "b.c",
+            src / "c.c",
+        ]
+    )
+    assert manifest.includes(str(src / "a.c")) == [str(include / "base.h")]
+    manifest.save()
+
+    # Nothing changed, even if touched
+    manifest = FileManifest(manifest_path, include_dirs=[str(include)])
+    os.utime(src / "c.c", ns=(0, 0))
+    changes = manifest.detect_changes(str(folder), (".c", ".h"))
+    assert not changes and list(changes) == []
+
+    (include / "base.h").write_text("struct Base { int x; int y; };\n")
+    changes = manifest.detect_changes(str(folder), (".c", ".h"))
+    assert changes.modified == [str(include / "base.h")]
+    assert changes.dependents == sorted(
+        [str(include / "derived.h"), str(src / "a.c"), str(src / "b.c")]
+    )
+    # Not saved, so the same changes are detected again
+    manifest = FileManifest(manifest_path, include_dirs=[str(include)])
+    assert manifest.detect_changes(str(folder), (".c", ".h")).modified == [
+        str(include / "base.h")
+    ]
+    manifest.save()
+
+    os.remove(include / "derived.h")
+    (src / "d.c").write_text("int d(void) { return 3; }\n")
+    changes = manifest.detect_changes(str(folder), (".c", ".h"))
+    assert changes.deleted == [str(include / "derived.h")]
+    assert changes.added == [str(src / "d.c")]
+    assert list(changes) == [str(src / "b.c"), str(src / "d.c")]
+
+    # A different include path invalidates the recorded includes
+    assert FileManifest(manifest_path).files == {}
+
+
+def test_change_set_as_batch_input(tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    _write_project(folder)
+    manifest = FileManifest(str(tmp_path / "manifest.json"))
+    index = SymbolIndex(str(tmp_path / "symbols.sqlite3"))
+    index.update(manifest.detect_changes(str(folder), ".c"), workers=1)
+    manifest.save()
+    assert index.find_definition("c") is not None
+
+    os.remove(folder / "src" / "c.c")
+    changes = manifest.detect_changes(str(folder), ".c")
+    assert index.update(changes, workers=1) == []
+    assert index.find_definition("c") is None
+
+
+def test_change_set_after_header_edit(tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    (folder / "lib.h").write_text("int foo(void);\nint bar(void);\n#define CALL foo\n")
+    (folder / "main.c").write_text('#include "lib.h"\nint main() { return CALL(); }\n')
+    (folder / "other.c").write_text("int other(void) { return 0; }\n")
+    manifest = FileManifest(str(tmp_path / "manifest.json"))
+    index = SymbolIndex(str(tmp_path / "symbols.sqlite3"))
+    call_graph = ProjectCallGraph(str(tmp_path / "call_graph.sqlite3"))
+    changes = manifest.detect_changes(str(folder), (".c", ".h"))
+    index.update(changes, workers=1)
+    call_graph.update(changes, workers=1)
+    manifest.save()
+    (main,) = call_graph.usrs_named("main")
+    assert call_graph.callees(main) == ["c:@F@foo"]
+
+    (folder / "lib.h").write_text("int foo(void);\nint bar(void);\n#define CALL bar\n")
+    changes = manifest.detect_changes(str(folder), (".c", ".h"))
+    assert changes.dependents == [str(folder / "main.c")]
+    updated = [str(folder / "lib.h"), str(folder / "main.c")]
+    assert sorted(index.update(changes, workers=1)) == updated
+    assert sorted(call_graph.update(changes, workers=1)) == updated
+    assert call_graph.callees(main) == ["c:@F@bar"]
+    assert index.find_definition("main").model.callings == ["bar"]
+    # Dependents are parsed again even if their digests are unchanged
+    other = str(folder / "other.c")
+    assert index.update(ChangeSet(dependents=[other]), workers=1) == [other]
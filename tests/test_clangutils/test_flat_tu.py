@@ -0,0 +1,46 @@
+import pickle
+
+from clang.cindex import CursorKind
+
+import tests.base as base
+from PyBirdViewCode.clang_utils import FlatTU, parse_file
+
+
+def test_flat_tu_matches_cursors():
+    tu = parse_file(base.asset_path("extractor-demos/control-structures.c"))
+    flat = FlatTU.from_tu(tu)
+    cursors = list(tu.cursor.walk_preorder())
+    assert len(flat) == len(cursors)
+    for pos, cursor in enumerate(cursors):
+        assert flat.get_kind(pos) == cursor.kind
+        assert flat.get_spelling(pos) == cursor.spelling
+        assert flat.get_type_spelling(pos) == cursor.type.spelling
+        assert flat.line[pos] == cursor.location.line
+        children = flat.children(pos)
+        assert [cursors[i] for i in children] == list(cursor.get_children())
+        for child in children:
+            assert flat.parent[child] == pos
+
+    binary_ops = flat.select(CursorKind.BINARY_OPERATOR, type_spelling="int")
+    assert binary_ops == [
+        i
+        for i, c in enumerate(cursors)
+        if c.kind == CursorKind.BINARY_OPERATOR and c.type.spelling == "int"
+    ]
+    assert len(binary_ops) > 0
+    assert flat.select(CursorKind.BINARY_OPERATOR, type_spelling="no-such-type") == []
+    in_main_file = flat.select(file=tu.spelling)
+    assert all(flat.get_location(i)[0] == tu.spelling for i in in_main_file)
+
+
+def test_flat_tu_pickle():
+    flat = FlatTU.from_file(base.asset_path("extractor-demos/globals.c"))
+    loaded: FlatTU = pickle.loads(pickle.dumps(flat))
+    assert len(loaded) == len(flat)
+    assert loaded.select(
+        CursorKind.VAR_DECL, spelling=lambda s: s.startswith("p")
+    ) == flat.select(CursorKind.VAR_DECL, spelling=lambda s: s.startswith("p"))
+    assert loaded.select(spelling="p") == flat.select(spelling="p")
+    assert len(loaded.select(spelling="p")) > 0
+    assert loaded.select(spelling="no-such-name") == []
+    assert loaded.subtree_end(0) == len(loaded)
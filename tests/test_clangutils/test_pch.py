@@ -0,0 +1,80 @@
+from clang.cindex import Diagnostic
+
+from PyBirdViewCode.clang_utils import (
+    CursorKind,
+    PrecompiledHeader,
+    get_func_decl,
+    parse_file,
+    set_default_pch,
+)
+
+HEADER = """#ifndef PLATFORM_H
+#define PLATFORM_H
+typedef struct Point { int x; int y; } Point;
+int distance(Point *a, Point *b);
+#define ORIGIN 0
+#endif
+"""
+
+SOURCE = """#include "platform.h"
+int main() { Point p = {ORIGIN, 1}; return distance(&p, &p); }
+"""
+
+
+def test_precompiled_header(tmp_path):
+    header = tmp_path / "platform.h"
+    header.write_text(HEADER)
+    source = tmp_path / "main.c"
+    source.write_text(SOURCE)
+
+    pch = PrecompiledHeader([str(header)], cache_dir=str(tmp_path / "pch"))
+    pch_path = pch.build()
+    assert pch.build() == pch_path
+    assert pch.applies_to(str(source), [])
+    assert not pch.applies_to(str(source), ["-DX"])
+
+    expected = [
+        (c.kind, c.spelling) for c in parse_file(str(source)).cursor.walk_preorder()
+    ]
+    set_default_pch(pch)
+    try:
+        tu = parse_file(str(source))
+        assert list(tu.diagnostics) == []
+        assert [(c.kind, c.spelling) for c in tu.cursor.walk_preorder()] == expected
+        main = get_func_decl(tu.cursor, "main")
+        assert main is not None and main.kind == CursorKind.FUNCTION_DECL
+    finally:
+        set_default_pch(None)
+
+    header.write_text(HEADER.replace("int y;", "int y; int z;"))
+    assert pch.build() != pch_path
+
+
+def test_precompiled_header_scope(tmp_path):
+    header = tmp_path / "platform.h"
+    header.write_text(HEADER)
+    (tmp_path / "other.h").write_text("int other;\n")
+    pch = PrecompiledHeader([str(header)], cache_dir=str(tmp_path / "pch"))
+
+    files = {
+        "main.c": SOURCE,
+        "comment.c": "// Header\n/* of\n   main */\n" + SOURCE,
+        "no_include.c": "int main() { return 0; }\n",
+        "other_first.c": '#include "other.h"\n' + SOURCE,
+        "main.cpp": SOURCE,
+    }
+    for name, text in files.items():
+        (tmp_path / name).write_text(text)
+    assert [name for name in files if pch.applies_to(str(tmp_path / name), [])] == [
+        "main.c",
+        "comment.c",
+    ]
+
+    set_default_pch(pch)
+    try:
+        tu = parse_file(str(tmp_path / "no_include.c"))
+        assert "Point" not in {c.spelling for c in tu.cursor.get_children()}
+        tu = parse_file(str(tmp_path / "main.cpp"))
+        assert [d for d in tu.diagnostics if d.severity >= Diagnostic.Error] == []
+    finally:
+        set_default_pch(None)
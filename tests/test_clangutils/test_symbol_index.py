@@ -0,0 +1,92 @@
+from clang.cindex import CursorKind
+
+from PyBirdViewCode.clang_utils import (
+    FunctionDefModel,
+    StructDefModel,
+    SymbolIndex,
+    ingest_data_structures,
+)
+from PyBirdViewCode.uast import MethodDecl, UASTQuery
+
+
+def _write_project(folder):
+    (folder / "point.h").write_text(
+        "struct Point { int x; int y; };\n"
+        "struct Line { struct Point a; struct Point b; };\n"
+        "extern int counter;\n"
+    )
+    (folder / "main.c").write_text(
+        '#include "point.h"\n'
+        "int counter;\n"
+        "int area(struct Line *l) { return l->a.x * counter; }\n"
+        "int main() { return area(0); }\n"
+    )
+
+
+def test_symbol_index(tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    _write_project(folder)
+    index = SymbolIndex(str(tmp_path / "symbols.sqlite3"))
+    assert sorted(index.update(str(folder), workers=1)) == [
+        str(folder / "main.c"),
+        str(folder / "point.h"),
+    ]
+
+    record = index.find_definition("Point", CursorKind.STRUCT_DECL)
+    assert record.file == str(folder / "point.h") and record.line == 1
+    assert isinstance(record.model, StructDefModel)
+    assert index.lookup_usr(record.usr) == [record]
+
+    counters = index.lookup("counter", CursorKind.VAR_DECL)
+    assert sorted((r.file, r.is_definition) for r in counters) == [
+        (str(folder / "main.c"), True),
+        (str(folder / "point.h"), False),
+    ]
+    area = index.find_definition("area")
+    assert isinstance(area.model, FunctionDefModel)
+    assert area.model.referenced_globals == ["counter"]
+
+    # Unchanged files are not parsed again, even after reopening
+    index.close()
+    index = SymbolIndex(str(tmp_path / "symbols.sqlite3"))
+    assert index.update(str(folder), workers=1) == []
+    with open(folder / "main.c", "a") as f:
+        f.write("int volume(void) { return 0; }\n")
+    assert index.update(str(folder), workers=1) == [str(folder / "main.c")]
+    assert index.find_definition("volume") is not None
+
+    index.remove_file(str(folder / "main.c"))
+    assert index.find_definition("area") is None
+    assert index.files() == [str(folder / "point.h")]
+
+
+def test_symbol_index_from_ingestion(tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    _write_project(folder)
+    index = SymbolIndex(str(tmp_path / "symbols.sqlite3"))
+    results = ingest_data_structures(str(folder), workers=1, symbol_index=index).l
+    assert sorted(r.file for r in results if r.ok) == [
+        str(folder / "main.c"),
+        str(folder / "point.h"),
+    ]
+    models = {m.spelling: m for r in results for m in r.result}
+    assert isinstance(models["area"], FunctionDefModel)
+
+    area = index.find_definition("area")
+    assert area.model.referenced_globals == ["counter"]
+    assert index.find_definition("Line", CursorKind.STRUCT_DECL) is not None
+    # The files ingested are up to date in the index
+    assert index.update(str(folder), workers=1) == []
+
+
+def test_symbol_index_lookups(tmp_path):
+    folder = tmp_path / "project"
+    folder.mkdir()
+    _write_project(folder)
+    index = SymbolIndex(str(tmp_path / "symbols.sqlite3"))
+    index.update(str(folder), workers=1)
+
+    method = UASTQuery.get_method_in_project(index, "area")
+    assert isinstance(method, MethodDecl) and method.name.id == "area"
@@ -0,0 +1,81 @@
+from clang.cindex import CursorKind
+
+import tests.base as base
+from PyBirdViewCode.clang_utils import (
+    UnaryOpPos,
+    extract_literal_value,
+    get_token_spellings,
+    is_literal_kind,
+    split_binary_operator,
+    split_compound_assignment,
+    split_unary_operator,
+)
+from PyBirdViewCode.clang_utils.code_attributes.utils import parse_file
+from PyBirdViewCode.uast import get_file_uast, universal_ast_nodes as nodes
+
+
+def _tokens(cursor):
+    return [t.spelling for t in cursor.get_tokens()]
+
+
+def test_token_index_matches_tokenization():
+    c = base.clangutils_load_ast("extractor-demos/control-structures.c")
+    checked = 0
+    for node in c.walk_preorder():
+        if node.location.file is None or node.location.file.name != c.spelling:
+            continue
+        assert get_token_spellings(node) == _tokens(node)
+        if node.kind == CursorKind.BINARY_OPERATOR:
+            left, op, _ = split_binary_operator(node)
+            assert op == _tokens(node)[len(_tokens(left))]
+        elif node.kind == CursorKind.COMPOUND_ASSIGNMENT_OPERATOR:
+            left, op, _ = split_compound_assignment(node)
+            assert op == _tokens(node)[len(_tokens(left))]
+        elif node.kind == CursorKind.UNARY_OPERATOR:
+            op, child, pos = split_unary_operator(node)
+            node_text, child_text = "".join(_tokens(node)), "".join(_tokens(child))
+            if pos == UnaryOpPos.AFTER:
+                assert node_text == child_text + op
+            else:
+                assert node_text == op + child_text
+        elif is_literal_kind(node):
+            assert extract_literal_value(node) == _tokens(node)[0]
+        else:
+            continue
+        checked += 1
+    assert checked > 10
+
+
+MACRO_SOURCE = """
+#define LIMIT 100
+#define ID(x) (x)
+int f(int a) {
+    int b = LIMIT;
+    int c = ID(7);
+    b += LIMIT;
+    if (a > LIMIT + 1)
+        return -LIMIT;
+    return b + c;
+}
+"""
+
+
+def test_token_index_in_macro_expansions(tmp_path):
+    file = tmp_path / "macros.c"
+    file.write_text(MACRO_SOURCE)
+    c = parse_file(str(file)).cursor
+    literals, operators = [], []
+    for node in c.walk_preorder():
+        if is_literal_kind(node):
+            literals.append(extract_literal_value(node))
+        elif node.kind == CursorKind.BINARY_OPERATOR:
+            operators.append(split_binary_operator(node)[1])
+        elif node.kind == CursorKind.COMPOUND_ASSIGNMENT_OPERATOR:
+            operators.append(split_compound_assignment(node)[1])
+        elif node.kind == CursorKind.UNARY_OPERATOR:
+            operators.append(split_unary_operator(node)[0])
+    assert literals == ["100", "7", "100", "100", "1", "100"]
+    assert operators == ["+=", ">", "+", "-", "+"]
+
+    uast = get_file_uast(str(file))
+    assert [lit.value for lit in uast.filter_by(nodes.Literal)] == literals
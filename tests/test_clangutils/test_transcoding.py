@@ -0,0 +1,80 @@
+import pytest
+from clang.cindex import CursorKind
+
+from PyBirdViewCode.clang_utils import (
+    FunctionDefModel,
+    data_structure_from_file,
+    get_token_spellings,
+    parse_file,
+    set_default_encoding_policy,
+    transcode_file,
+)
+from PyBirdViewCode.uast import get_file_uast
+
+
+def _write_gb2312(path, text: str):
+    path.write_bytes(text.encode("gb2312"))
+
+
+def _literals(tu):
+    return {
+        c.location.file.name.rsplit("/", 1)[-1]: get_token_spellings(c)[0]
+        for c in tu.cursor.walk_preorder()
+        if c.kind == CursorKind.STRING_LITERAL
+    }
+
+
+def test_parse_transcoded(tmp_path):
+    _write_gb2312(tmp_path / "names.h", 'static const char *world = "世界";\n')
+    _write_gb2312(
+        tmp_path / "main.c",
+        '#include "names.h"\n// 注释\nconst char *hello = "你好";\n',
+    )
+    tu = parse_file(str(tmp_path / "main.c"), encoding="gb2312")
+    assert _literals(tu) == {"main.c": '"你好"', "names.h": '"世界"'}
+
+    tu = parse_file(
+        str(tmp_path / "main.c"),
+        encoding=lambda f: "gb2312" if f.startswith(str(tmp_path)) else None,
+    )
+    assert _literals(tu) == {"main.c": '"你好"', "names.h": '"世界"'}
+
+    # Token spellings are not valid UTF-8 without transcoding
+    with pytest.raises(UnicodeDecodeError):
+        _literals(parse_file(str(tmp_path / "main.c")))
+
+    # Files on disk are untouched
+    assert (tmp_path / "main.c").read_bytes().decode("gb2312").endswith('"你好";\n')
+
+
+def test_transcode_file_cache(tmp_path):
+    _write_gb2312(tmp_path / "a.c", "// 中文\n")
+    _write_gb2312(tmp_path / "b.c", "// 中文\n")
+    (tmp_path / "ascii.c").write_text("int a;\n")
+    a = transcode_file(str(tmp_path / "a.c"), "gb2312")
+    assert a == "// 中文\n".encode("utf8")
+    # Files of the same content share the cached result
+    assert transcode_file(str(tmp_path / "b.c"), "gb2312") is a
+    assert transcode_file(str(tmp_path / "ascii.c"), "gb2312") is None
+
+
+def test_default_encoding_policy(tmp_path):
+    _write_gb2312(
+        tmp_path / "funcs.c",
+        "// 这里是函数一\nint one(void) { return 1; }\n"
+        "// 这里是函数二\nint two(void);\n",
+    )
+    _write_gb2312(tmp_path / "script.py", '# 注释\nname = "中文"\n')
+    set_default_encoding_policy("gb2312")
+    try:
+        # Offsets of the skeleton parse refer to the transcoded buffer
+        models = data_structure_from_file(
+            str(tmp_path / "funcs.c"), function_bodies=False
+        ).l
+        assert [m.spelling for m in models] == ["one"]
+        assert isinstance(models[0], FunctionDefModel)
+
+        uast = get_file_uast(str(tmp_path / "script.py"))
+        assert "中文" in repr(uast)
+    finally:
+        set_default_encoding_policy(None)
@@ -0,0 +1,88 @@
+from clang.cindex import CursorKind
+
+import tests.base as base
+from PyBirdViewCode.clang_utils import (
+    TraversalAction,
+    TraversalContext,
+    parse_file,
+    traversal,
+    traversal_with_callback,
+)
+
+
+def test_traversal_order_and_hierarchy():
+    c = base.clangutils_load_ast("extractor-demos/control-structures.c")
+    entered, left = [], []
+
+    def enter(ctx: TraversalContext):
+        assert ctx.hierarchy[0] == c and ctx.depth == len(ctx.hierarchy) - 1
+        entered.append(ctx.current_node)
+
+    traversal_with_callback(c, enter, leave=lambda ctx: left.append(ctx.current_node))
+    assert entered == list(c.walk_preorder())
+    assert left[-1] == c and len(left) == len(entered)
+
+    assert traversal(c).map(lambda ctx: ctx.current_node).l == entered
+    assert traversal(c, max_depth=1).map(lambda ctx: ctx.current_node).l == [c] + list(
+        c.get_children()
+    )
+
+
+def test_traversal_pruning_and_dispatch():
+    c = base.clangutils_load_ast("extractor-demos/control-structures.c")
+    # Skip function bodies from both styles of traversal
+    kinds = set()
+    for ctx in traversal(c):
+        kinds.add(ctx.current_node.kind)
+        if ctx.current_node.kind == CursorKind.FUNCTION_DECL:
+            ctx.skip_children()
+    assert CursorKind.COMPOUND_STMT not in kinds
+
+    calls = []
+    traversal_with_callback(
+        c,
+        {
+            CursorKind.CALL_EXPR: lambda ctx: calls.append(ctx.current_node),
+            CursorKind.VAR_DECL: lambda ctx: TraversalAction.SKIP_CHILDREN,
+        },
+    )
+    in_var_decls = {
+        n.hash
+        for var_decl in c.walk_preorder()
+        if var_decl.kind == CursorKind.VAR_DECL
+        for n in var_decl.walk_preorder()
+    }
+    expected = [
+        n
+        for n in c.walk_preorder()
+        if n.kind == CursorKind.CALL_EXPR and n.hash not in in_var_decls
+    ]
+    assert len(calls) > 0 and calls == expected
+
+    visited = []
+
+    def stop_at_first_call(ctx: TraversalContext):
+        visited.append(ctx.current_node)
+        if ctx.current_node.kind == CursorKind.CALL_EXPR:
+            return TraversalAction.STOP
+
+    traversal_with_callback(c, stop_at_first_call)
+    assert visited[-1].kind == CursorKind.CALL_EXPR
+    assert [n.kind for n in visited].count(CursorKind.CALL_EXPR) == 1
+
+
+def test_traversal_deep_nesting(tmp_path):
+    # Deeper than the default recursion limit of Python, while libclang
+    # itself overflows its stack when parsing much deeper nesting.
+    depth = 1200
+    file = tmp_path / "deep.c"
+    file.write_text("int f(int a) { return " + "(" * depth + "a" + ")" * depth + "; }")
+    c = parse_file(str(file), [f"-fbracket-depth={depth + 10}"]).cursor
+    max_depth = 0
+
+    def callback(ctx: TraversalContext):
+        nonlocal max_depth
+        max_depth = max(max_depth, ctx.depth)
+
+    traversal_with_callback(c, callback)
+    assert max_depth > depth
@@ -0,0 +1,53 @@
+import shutil
+
+import tests.base as base
+from PyBirdViewCode.clang_utils import (
+    TUCache,
+    data_structure_from_file,
+    parse_file,
+    set_default_tu_cache,
+)
+
+
+def _copy_structure_demo(tmp_path):
+    folder = tmp_path / "structure-demo"
+    shutil.copytree(base.asset_path("structure-demo"), folder)
+    return folder
+
+
+def test_tu_cache_hit_and_invalidation(tmp_path):
+    folder = _copy_structure_demo(tmp_path)
+    cache = TUCache(str(tmp_path / "cache"))
+    file = str(folder / "global-use2.c")
+
+    tu = parse_file(file, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    kinds = [c.kind for c in tu.cursor.walk_preorder()]
+
+    cached_tu = parse_file(file, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert [c.kind for c in cached_tu.cursor.walk_preorder()] == kinds
+
+    # Different compiler arguments use another entry
+    parse_file(file, ["-DSOME_MACRO"], cache=cache)
+    assert cache.misses == 2
+
+    # Modifying an included header invalidates the entry
+    with open(folder / "header.h", "a") as f:
+        f.write("\nint appended_global;\n")
+    parse_file(file, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_default_tu_cache(tmp_path):
+    folder = _copy_structure_demo(tmp_path)
+    cache = TUCache(str(tmp_path / "cache"))
+    set_default_tu_cache(cache)
+    try:
+        file = str(folder / "global-use2.c")
+        first = data_structure_from_file(file).map(lambda m: m.spelling).l
+        second = data_structure_from_file(file).map(lambda m: m.spelling).l
+        assert first == second
+        assert cache.hits == 1
+    finally:
+        set_default_tu_cache(None)
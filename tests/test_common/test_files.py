@@ -1,3 +1,5 @@
+import os
+
 from tests.base import asset_path
 from PyBirdViewCode.utils import convert_encodings, abspath_from_file, FileManager
 
@@ -13,3 +15,68 @@ def test_convert_encodings():
         "utf8",
         file_manager.get_abspath("utf8-encoding-folder"),
     )
+
+
+def test_convert_encodings_incremental(tmp_path):
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    (src / "sub").mkdir(parents=True)
+    text = "// 这里是很长的注释\n" * 1000
+    (src / "sub" / "big.c").write_bytes(text.encode("gb2312"))
+    (src / "sub" / "plain.h").write_text("int a;\n")
+    (src / "notes.txt").write_text("ignored\n")
+
+    def encoding_of(path: str) -> str:
+        return "utf8" if path.endswith(".h") else "gb2312"
+
+    def convert():
+        # A small chunk size splits multi-byte characters across chunks
+        return convert_encodings(
+            str(src),
+            lambda f: f.endswith((".c", ".h")),
+            encoding_of,
+            "utf8",
+            str(dst),
+            workers=2,
+            chunk_size=7,
+        )
+
+    stats = convert()
+    assert (stats.converted, stats.copied, stats.skipped) == (1, 1, 0)
+    assert stats.bytes_read == len(text.encode("gb2312")) + len("int a;\n")
+    assert stats.throughput > 0
+    assert (dst / "sub" / "big.c").read_text("utf8") == text
+    # Copied files keep the layout of the source folder
+    assert (dst / "sub" / "plain.h").read_text() == "int a;\n"
+    assert not (dst / "notes.txt").exists()
+
+    stats = convert()
+    assert (stats.converted, stats.copied, stats.skipped, stats.bytes_read) == (
+        0,
+        0,
+        2,
+        0,
+    )
+
+    # Touched but unchanged sources are checked by hash and skipped
+    os.utime(src / "sub" / "big.c", ns=(0, 0))
+    stats = convert()
+    assert (stats.converted, stats.skipped) == (0, 2)
+    # Modified destinations are converted again
+    (dst / "sub" / "big.c").write_text("broken")
+    stats = convert()
+    assert stats.converted == 1 and (dst / "sub" / "big.c").read_text("utf8") == text
+
+
+def test_convert_encodings_in_place(tmp_path):
+    (tmp_path / "a.c").write_bytes("// 中文\n".encode("gb2312"))
+    stats = convert_encodings(
+        str(tmp_path), lambda f: f.endswith(".c"), "gb2312", "utf8", "", workers=1
+    )
+    assert stats.converted == 1
+    assert (tmp_path / "a.c").read_text("utf8") == "// 中文\n"
+    # Converted files are not decoded again as GB2312
+    stats = convert_encodings(
+        str(tmp_path), lambda f: f.endswith(".c"), "gb2312", "utf8", "", workers=1
+    )
+    assert stats.skipped == 1
+    assert (tmp_path / "a.c").read_text("utf8") == "// 中文\n"
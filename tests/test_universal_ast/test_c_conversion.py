@@ -1,5 +1,15 @@
+import os
+
 from PyBirdViewCode.clang_utils.code_attributes.utils import parse_file
-from PyBirdViewCode.uast import ClangASTConverter
+from PyBirdViewCode.uast import (
+    ClangASTConverter,
+    UASTQuery,
+    extract_cfg_from_method,
+    get_file_uast,
+    ingest_file_uasts,
+    iter_file_declarations,
+)
+from PyBirdViewCode.uast.unparser import BaseUASTUnparser
 from PyBirdViewCode.uast import (
     universal_ast_nodes as nodes,
     universal_ast_types as types,
@@ -106,3 +116,58 @@ def test_variable_types():
         "a",
         "func",
     }
+
+
+def test_ingest_file_uasts():
+    folder = asset_path("universal-ast-extraction")
+    results = ingest_file_uasts(
+        folder, workers=2, name_filter=lambda f: f.endswith(("demo1.c", "demo2.c"))
+    ).l
+    assert len(results) == 2
+    for result in results:
+        assert result.ok, result.error
+        assert isinstance(result.result, nodes.CompilationUnit)
+        assert result.result == get_file_uast(result.file)
+
+
+def test_lazy_function_bodies():
+    file = asset_path("universal-ast-extraction/demo1.c")
+    eager = get_file_uast(file)
+    uast = get_file_uast(file, lazy=True)
+    methods = [m for m in uast.children if isinstance(m, nodes.MethodDecl)]
+    assert not any(m.is_resolved("body") for m in methods)
+
+    # Finding a method by name converts no body
+    method = UASTQuery.get_method(uast, "basic_control_structures")
+    assert not method.is_resolved("body")
+    eager_method = UASTQuery.get_method(eager, "basic_control_structures")
+    assert (
+        extract_cfg_from_method(method).to_networkx().nodes
+        == extract_cfg_from_method(eager_method).to_networkx().nodes
+    )
+    assert method.is_resolved("body")
+    assert sum(not m.is_resolved("body") for m in methods) == len(methods) - 1
+
+    assert uast.filter_by(nodes.Name).l == eager.filter_by(nodes.Name).l
+    assert all(m.is_resolved("body") for m in methods)
+    assert uast == eager
+
+    file = asset_path("universal-ast-extraction/dataflow-demo.c")
+    unparser = BaseUASTUnparser()
+    assert unparser.unparse(
+        UASTQuery.get_method(get_file_uast(file, lazy=True), "demo1")
+    ) == unparser.unparse(UASTQuery.get_method(get_file_uast(file), "demo1"))
+
+
+def test_iter_file_declarations():
+    file = asset_path("universal-ast-extraction/demo1.c")
+    declarations = iter_file_declarations(file)
+    first = next(declarations)
+    assert [first] + declarations.l == get_file_uast(file).children
+
+    # Skip the declarations in the included header before converting them
+    file = asset_path("structure-demo/global-use2.c")
+    in_main_file = lambda c: os.path.samefile(c.location.file.name, file)
+    declarations = iter_file_declarations(file, source_location_filter=in_main_file).l
+    assert [d.name.id for d in declarations] == ["myfun", "myfun"]
+    assert len(get_file_uast(file).children) == 4
@@ -0,0 +1,85 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+from PyBirdViewCode.clang_utils import data_structure_from_file
+from PyBirdViewCode.utils import MelodieFrozenGenerator
+
+SOURCE = """
+struct Point { int x; int y; };
+struct Line { Point a; Point b; };
+struct Node { int value; Node next; };
+"""
+
+
+class Variable:
+    def __init__(self, value) -> None:
+        self.value = value
+
+
+class StructValue:
+    def __init__(self, fields) -> None:
+        self.fields = fields
+
+
+@pytest.fixture
+def program_info(monkeypatch):
+    # `uast.models` is not in this tree, so its value classes are stubbed
+    models = types.ModuleType("PyBirdViewCode.uast.models")
+    models.Variable = Variable
+    models.StructValue = StructValue
+    monkeypatch.setitem(sys.modules, models.__name__, models)
+    name = "PyBirdViewCode.uast.program_info"
+    sys.modules.pop(name, None)
+    yield importlib.import_module(name)
+    sys.modules.pop(name, None)
+
+
+def _structures(tmp_path, source: str):
+    file = tmp_path / "structures.cpp"
+    file.write_text(source)
+    with pytest.warns(UserWarning, match="incomplete type"):
+        return MelodieFrozenGenerator(data_structure_from_file(str(file)).l)
+
+
+def _layout(variable: Variable):
+    if not isinstance(variable.value, StructValue):
+        return variable.value
+    return {name: _layout(v) for name, v in variable.value.fields.items()}
+
+
+def test_allocate_memory(tmp_path, program_info):
+    info = program_info.ProgramInfo({}, _structures(tmp_path, SOURCE))
+    line = info.allocate_memory("Line")
+    assert _layout(line) == {"a": {"x": None, "y": None}, "b": {"x": None, "y": None}}
+    assert info.allocate_memory("int").value is None
+
+    # Layouts are compiled once, and each call gets new variables
+    (point,) = [s for s in info.structures if s.spelling == "Point"]
+    point.fields.pop()
+    other = info.allocate_memory("Line")
+    assert _layout(other) == _layout(line)
+    assert other.value.fields["a"] is not line.value.fields["a"]
+    info.invalidate_layouts()
+    assert _layout(info.allocate_memory("Line")) == {"a": {"x": None}, "b": {"x": None}}
+
+    with pytest.raises(Exception, match="'Node' contains itself"):
+        info.allocate_memory("Node")
+    with pytest.raises(Exception, match="Cannot handle type 'Missing'"):
+        info.allocate_memory("Missing")
+
+
+def test_allocate_memory_after_redefinition(tmp_path, program_info):
+    info = program_info.ProgramInfo({}, _structures(tmp_path, SOURCE))
+    assert _layout(info.allocate_memory("Line"))["a"] == {"x": None, "y": None}
+
+    info.structures = _structures(
+        tmp_path, SOURCE.replace("int x; int y;", "int x; int y; int z;")
+    )
+    assert _layout(info.allocate_memory("Line"))["a"] == {
+        "x": None,
+        "y": None,
+        "z": None,
+    }
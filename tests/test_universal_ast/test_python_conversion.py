@@ -1,7 +1,12 @@
 from typing import Any, Callable, Dict
 
 import ast
-from PyBirdViewCode.uast import ParsoASTConverter, universal_ast_nodes as nodes
+from PyBirdViewCode.uast import (
+    ParsoASTConverter,
+    get_file_uast,
+    iter_file_declarations,
+    universal_ast_nodes as nodes,
+)
 
 
 def parse_py_code(code: str, version="3.9"):
@@ -36,3 +41,20 @@ def test_assignment():
     assert assignment.operator == "+="
     assert isinstance(assignment.rhs[0], nodes.Yield)
     assert assignment.rhs[0].value.id == "b"
+
+
+def test_iter_file_declarations(tmp_path):
+    file = tmp_path / "module.py"
+    file.write_text("N = 1\n\n\ndef f(a):\n    return a + N\n\n\nx = f(1)\n")
+    declarations = iter_file_declarations(str(file)).l
+    assert declarations == get_file_uast(str(file)).children
+    assert [type(d) for d in declarations] == [
+        nodes.Assignment,
+        nodes.MethodDecl,
+        nodes.Assignment,
+    ]
+
+    declarations = iter_file_declarations(
+        str(file), source_location_filter=lambda stmt: stmt.lineno > 1
+    ).l
+    assert declarations == get_file_uast(str(file)).children[1:]
@@ -0,0 +1,58 @@
+import io
+
+from PyBirdViewCode.uast import (
+    UASTReader,
+    dump_uast,
+    dumps_uast,
+    get_file_uast,
+    load_uast,
+)
+from PyBirdViewCode.uast import universal_ast_nodes as nodes
+from tests.base import asset_path
+
+
+def test_round_trip(tmp_path):
+    uast = get_file_uast(asset_path("universal-ast-extraction/demo1.c"))
+    data = dumps_uast(uast)
+    assert load_uast(data) == uast
+
+    # Streaming in small chunks gives the same bytes
+    f = io.BytesIO()
+    dump_uast(uast, f, chunk_size=16)
+    assert f.getvalue() == data
+
+    path = str(tmp_path / "demo1.uast")
+    dump_uast(uast, path)
+    with UASTReader(path) as reader:
+        assert reader.load() == uast
+        assert list(reader.iter_top_level()) == uast.children
+        assert reader.node_class(reader.root_offset) is nodes.CompilationUnit
+
+
+def test_values():
+    field = nodes.FieldDecl("字段", nodes.Name("int"), "6")
+    field.location = (3, 5)
+    literal = nodes.Literal(-(2**70), "int")
+    values = nodes.ArrayInitializer([literal, nodes.Literal(1.5, "float")])
+    decoded = load_uast(dumps_uast(nodes.CompilationUnit([field, values])))
+    assert decoded.children[0].name == "字段"
+    assert decoded.children[0].init_value == "6"
+    assert decoded.children[0].location is field.location
+    assert decoded.children[1] == values
+
+
+def test_find_subtree():
+    uast = get_file_uast(asset_path("universal-ast-extraction/demo1.c"))
+    method = uast.filter_by(nodes.MethodDecl).head()
+    reader = UASTReader(dumps_uast(uast))
+    assert reader.find(nodes.MethodDecl, method.name.id) == [method]
+    assert reader.find(nodes.VarDecl, method.name.id) == []
+    assert reader.find(nodes.MethodDecl, "no_such_function") == []
+
+
+def test_deep_expression_chain():
+    expr = nodes.Name("x")
+    for _ in range(10000):
+        expr = nodes.BinaryExpr("+", expr, nodes.Name("y"))
+    decoded = load_uast(dumps_uast(expr))
+    assert len(decoded.filter_by(nodes.Name).l) == 10001
@@ -0,0 +1,82 @@
+import shutil
+
+import tests.base as base
+from PyBirdViewCode.uast import (
+    UASTCache,
+    get_file_uast,
+    set_default_uast_cache,
+    universal_ast_nodes as nodes,
+)
+
+PYTHON_SOURCE = """
+def total(values):
+    s = 0
+    for v in values:
+        s += v
+    for v in values:
+        s -= v
+    return s
+"""
+
+
+def _copy_structure_demo(tmp_path):
+    folder = tmp_path / "structure-demo"
+    shutil.copytree(base.asset_path("structure-demo"), folder)
+    return folder
+
+
+def _temporary_names(uast: nodes.SourceElement):
+    names = (name.id for name in uast.walk_preorder() if isinstance(name, nodes.Name))
+    return list(
+        dict.fromkeys(n for n in names if n.startswith(("iterator_", "counter_")))
+    )
+
+
+def test_deterministic_conversion(tmp_path):
+    file = tmp_path / "loops.py"
+    file.write_text(PYTHON_SOURCE)
+    uast = get_file_uast(str(file), deterministic=True)
+    assert _temporary_names(uast) == [
+        "iterator_0",
+        "counter_1",
+        "iterator_2",
+        "counter_3",
+    ]
+    assert get_file_uast(str(file), deterministic=True) == uast
+    assert get_file_uast(str(file)) != uast
+
+
+def test_uast_cache_hit_and_invalidation(tmp_path):
+    folder = _copy_structure_demo(tmp_path)
+    cache = UASTCache(str(tmp_path / "cache"))
+    file = str(folder / "global-use2.c")
+
+    uast = get_file_uast(file, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert get_file_uast(file, cache=cache) == uast
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Different compiler arguments use another entry
+    get_file_uast(file, ["-DSOME_MACRO"], cache=cache)
+    assert cache.misses == 2
+
+    # Modifying an included header invalidates the entry
+    with open(folder / "header.h", "a") as f:
+        f.write("\nint appended_global;\n")
+    get_file_uast(file, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_default_uast_cache(tmp_path):
+    file = tmp_path / "loops.py"
+    file.write_text(PYTHON_SOURCE)
+    cache = UASTCache(str(tmp_path / "cache"))
+    set_default_uast_cache(cache)
+    try:
+        first = get_file_uast(str(file))
+        second = get_file_uast(str(file))
+        assert first == second
+        assert first == get_file_uast(str(file), cache=None, deterministic=True)
+        assert (cache.hits, cache.misses) == (2, 1)
+    finally:
+        set_default_uast_cache(None)
@@ -0,0 +1,79 @@
+from PyBirdViewCode.uast import (
+    StructuralDeduplicator,
+    extract_cfg_from_method,
+    get_file_uast,
+    get_method_cpg,
+    group_identical,
+)
+from PyBirdViewCode.uast import universal_ast_nodes as nodes
+from tests.base import asset_path
+
+SOURCE = """
+static inline int clamp(int x) { if (x < 0) { return 0; } return x; }
+int other(int y) { return y * 2; }
+"""
+
+
+def _methods(uast: nodes.SourceElement):
+    return {m.name.id: m for m in uast.filter_by(nodes.MethodDecl)}
+
+
+def test_structural_hash():
+    file = asset_path("universal-ast-extraction/demo1.c")
+    uast1, uast2 = get_file_uast(file), get_file_uast(file)
+    for ignore_location in (False, True):
+        assert uast1.structural_hash(ignore_location) == uast2.structural_hash(
+            ignore_location
+        )
+        assert uast1.structurally_equal(uast2, ignore_location)
+    assert uast1 == uast2
+
+    method = _methods(uast1)["basic_control_structures"]
+    name = method.filter_by(nodes.Name).l[-1]
+    name.id += "_renamed"
+    # The hashes cached before the modification are stale
+    method.clear_structural_hashes()
+    uast1.clear_structural_hashes()
+    assert uast1.structural_hash() != uast2.structural_hash()
+    assert not uast1.structurally_equal(uast2)
+    assert uast1 != uast2
+
+
+def test_equality_after_modification():
+    file = asset_path("universal-ast-extraction/demo1.c")
+    uast1, uast2 = get_file_uast(file), get_file_uast(file)
+    uast1.structural_hash()
+    for uast in (uast1, uast2):
+        uast.filter_by(nodes.Name).l[-1].id += "_renamed"
+    uast2.structural_hash()
+    # The hashes of uast1 are stale, which `==` does not depend on
+    assert uast1.structural_hash() != uast2.structural_hash()
+    assert uast1 == uast2
+
+
+def test_identical_methods_at_different_locations(tmp_path):
+    file1, file2 = tmp_path / "a.c", tmp_path / "b.c"
+    file1.write_text(SOURCE)
+    file2.write_text("\n\n// the same functions, moved\n" + SOURCE)
+    methods1 = _methods(get_file_uast(str(file1)))
+    methods2 = _methods(get_file_uast(str(file2)))
+
+    clamp1, clamp2 = methods1["clamp"], methods2["clamp"]
+    assert clamp1 != clamp2
+    assert clamp1.structural_hash() != clamp2.structural_hash()
+    assert clamp1.structural_hash(True) == clamp2.structural_hash(True)
+    assert clamp1.structurally_equal(clamp2, ignore_location=True)
+    assert not clamp1.structurally_equal(methods2["other"], ignore_location=True)
+
+    groups = group_identical([clamp1, methods1["other"], clamp2, methods2["other"]])
+    assert groups == [[clamp1, clamp2], [methods1["other"], methods2["other"]]]
+
+    dedupe = StructuralDeduplicator()
+    cpg1 = get_method_cpg(clamp1, dedupe=dedupe)
+    assert get_method_cpg(clamp2, dedupe=dedupe) is cpg1
+    assert get_method_cpg(clamp2, ["g"], dedupe=dedupe) is not cpg1
+    cfg = extract_cfg_from_method(clamp2, dedupe=dedupe)
+    assert extract_cfg_from_method(clamp1, dedupe=dedupe) is cfg
+    assert (dedupe.hits, dedupe.misses) == (2, 3)
+    assert len(dedupe) == 1
+    assert dedupe.canonical(clamp2) is clamp1
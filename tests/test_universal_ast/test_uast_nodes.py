@@ -0,0 +1,134 @@
+import copy
+import pickle
+
+import pytest
+
+from PyBirdViewCode.uast import UASTQuery, get_file_uast
+from PyBirdViewCode.uast import universal_ast_nodes as nodes
+from tests.base import asset_path
+
+
+def test_nodes_have_slots():
+    uast = get_file_uast(asset_path("universal-ast-extraction/demo1.c"))
+    names = uast.filter_by(nodes.Name).l
+    assert len(names) > 0
+    for node in uast.filter_by(nodes.SourceElement):
+        assert not hasattr(node, "__dict__")
+    with pytest.raises(AttributeError):
+        names[0].undeclared = 1
+
+
+def test_locations_and_names_are_interned():
+    file = asset_path("universal-ast-extraction/demo1.c")
+    uast1, uast2 = get_file_uast(file), get_file_uast(file)
+    for name1, name2 in zip(uast1.filter_by(nodes.Name), uast2.filter_by(nodes.Name)):
+        assert name1 is not name2
+        assert name1.location is name2.location
+        assert name1.id is name2.id
+
+
+def test_serialization_round_trip():
+    uast = get_file_uast(asset_path("universal-ast-extraction/c-types.c"))
+    assert nodes.SourceElement.from_dict(uast.to_dict()) == uast
+    assert pickle.loads(pickle.dumps(uast)) == uast
+    assert copy.deepcopy(uast) == uast
+
+    field = nodes.FieldDecl("a", nodes.Name("int"), "1")
+    assert field.init_value == "1"
+    assert nodes.SourceElement.from_dict(field.to_dict()).init_value is None
+
+
+def test_traversal_orders():
+    expr = nodes.BinaryExpr(
+        "+", nodes.Name("a"), nodes.BinaryExpr("*", nodes.Name("b"), nodes.Name("c"))
+    )
+
+    def labels(it):
+        return [n.operator if isinstance(n, nodes.BinaryExpr) else n.id for n in it]
+
+    assert labels(expr.walk_top_down()) == ["+", "a", "*", "b", "c"]
+    assert labels(expr.walk_postorder()) == ["a", "b", "c", "*", "+"]
+    assert labels(expr.walk_preorder()) == labels(expr.walk_postorder())
+    assert labels(expr.walk_breadth_first()) == ["+", "a", "*", "b", "c"]
+    assert labels(expr.iter_nodes()) == labels(expr.walk_postorder())
+
+    hierarchies = []
+
+    def walk_func(ctx: nodes.SourceElement.ApplyContext) -> bool:
+        hierarchies.append(labels(ctx.hierarchy))
+        return not isinstance(ctx.current_node, nodes.BinaryExpr) or (
+            ctx.current_node.operator == "+"
+        )
+
+    expr.apply_with_hierarchy(walk_func)
+    assert hierarchies == [["+"], ["+", "a"], ["+", "*"]]
+
+
+def test_deep_expression_chain():
+    depth = 10000
+    expr = nodes.Name("x")
+    for _ in range(depth):
+        expr = nodes.BinaryExpr("+", expr, nodes.Name("y"))
+
+    assert len(expr.filter_by(nodes.Name).l) == depth + 1
+    assert len(list(expr.walk_top_down())) == 2 * depth + 1
+    assert len(list(expr.walk_breadth_first())) == 2 * depth + 1
+
+    max_depth = 0
+
+    def walk_func(ctx: nodes.SourceElement.ApplyContext) -> bool:
+        nonlocal max_depth
+        max_depth = max(max_depth, len(ctx))
+        return True
+
+    expr.apply_with_hierarchy(walk_func)
+    assert max_depth == depth + 1
+
+    events = []
+
+    class CountingVisitor(nodes.Visitor):
+        def visit_Name(self, node):
+            events.append("visit")
+            return True
+
+        def leave_Name(self, node):
+            events.append("leave")
+
+    expr.accept(CountingVisitor())
+    assert events == ["visit", "leave"] * (depth + 1)
+
+
+def test_node_index():
+    uast = get_file_uast(asset_path("universal-ast-extraction/demo1.c"))
+    for node_type in (nodes.MethodDecl, nodes.Name, (nodes.VarDecl, nodes.ParamDecl)):
+        walked = nodes.SourceElement.filter_by(uast, node_type).l
+        indexed = uast.filter_by(node_type).l
+        assert len(walked) > 0
+        assert [id(n) for n in indexed] == [id(n) for n in walked]
+
+    method = UASTQuery.get_method(uast, "basic_control_structures")
+    assert uast.node_index.named(nodes.MethodDecl, "basic_control_structures") == [
+        method
+    ]
+    assert uast.filter_by(nodes.MethodDecl, name=method.name).l == [method]
+    assert pickle.loads(pickle.dumps(uast)) == uast
+
+    # Changing the top-level nodes invalidates the index automatically
+    uast.children.remove(method)
+    with pytest.raises(ValueError):
+        UASTQuery.get_method(uast, "basic_control_structures")
+    uast.children.append(method)
+    assert UASTQuery.get_method(uast, "basic_control_structures") is method
+
+    # So does replacing a top-level node
+    pos = uast.children.index(method)
+    replacement = copy.deepcopy(method)
+    uast.children[pos] = replacement
+    assert UASTQuery.get_method(uast, "basic_control_structures") is replacement
+    (found,) = uast.filter_by(nodes.MethodDecl, name=method.name).l
+    assert found is replacement
+    uast.children[pos] = method
+
+    method.name.id = "renamed"
+    uast.invalidate_index()
+    assert UASTQuery.get_method(uast, "renamed") is method
@@ -0,0 +1,70 @@
+from PyBirdViewCode.uast import ClangUASTSession, get_file_uast
+
+SOURCE = """int g = 1;
+
+int add(int a, int b)
+{
+    return a + b;
+}
+
+int sub(int a, int b)
+{
+    return a - b;
+}
+
+int main()
+{
+    return add(g, 2) + sub(3, g);
+}
+"""
+
+
+def _fresh_uast(tmp_path, content: str):
+    file = tmp_path / "fresh.c"
+    file.write_text(content)
+    return get_file_uast(str(file))
+
+
+def test_uast_session_incremental_update(tmp_path):
+    file = tmp_path / "demo.c"
+    file.write_text(SOURCE)
+    session = ClangUASTSession(str(file))
+    assert session.reconverted_count == 4
+    assert session.uast == _fresh_uast(tmp_path, SOURCE)
+
+    # Edit inside one function body
+    edited = SOURCE.replace("a - b", "a - b - 1")
+    uast = session.update(edited)
+    assert session.reconverted_count == 1
+    assert uast == _fresh_uast(tmp_path, edited)
+
+    # Insert lines before all declarations, shifting their line numbers
+    edited = "// comment\n\n" + edited
+    uast = session.update(edited)
+    assert session.reconverted_count == 0
+    assert uast == _fresh_uast(tmp_path, edited)
+
+    # Unchanged content reuses everything
+    session.update(edited)
+    assert session.reconverted_count == 0
+
+    # Preprocessor directives may change any declaration after them
+    edited = "#define X 1\n" + edited
+    uast = session.update(edited)
+    assert session.reconverted_count == 4
+    assert uast == _fresh_uast(tmp_path, edited)
+
+
+def test_uast_session_keeps_previous_results(tmp_path):
+    file = tmp_path / "demo.c"
+    file.write_text(SOURCE)
+    session = ClangUASTSession(str(file))
+    first = session.uast
+
+    edited = "// comment\n\n" + SOURCE
+    uast = session.update(edited)
+    assert session.reconverted_count == 0
+    assert uast == _fresh_uast(tmp_path, edited)
+    # Shifting the reused declarations does not modify the previous UAST
+    assert first == _fresh_uast(tmp_path, SOURCE)
+    assert first.children[-1].location != uast.children[-1].location